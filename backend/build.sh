@@ -7,5 +7,6 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
 python manage.py migrate
+python manage.py createcachetable
 python manage.py create_superuser_if_none_exists
 python manage.py create_superadmins
@@ -4,7 +4,7 @@ import json
 from django.contrib import admin
 from django.utils.html import format_html
 
-from .models import Conversation, CourseEmotionRecommendation, Message
+from .models import Conversation, CourseEmotionRecommendation, Message, SupportResourceTemplate
 
 # Los modelos de Conversation y Message NO se registran en el admin
 # para proteger la privacidad de los estudiantes.
@@ -75,4 +75,26 @@ class CourseEmotionRecommendationAdmin(admin.ModelAdmin):
 
     def has_add_permission(self, request):
         # Las recomendaciones se generan desde la API/servicio, no manualmente.
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(SupportResourceTemplate)
+class SupportResourceTemplateAdmin(admin.ModelAdmin):
+    """
+    Revisión del pool de recursos de apoyo que se muestra a los estudiantes.
+    Se llena con `python manage.py build_support_resource_pool`; aquí se pueden desactivar variantes.
+    """
+    list_display = ('emotion', 'intensity', 'sentiment', 'version', 'variant', 'source', 'is_active', 'created_at')
+    list_filter = ('version', 'source', 'is_active', 'emotion', 'intensity', 'sentiment')
+    list_editable = ('is_active',)
+    readonly_fields = ('emotion', 'intensity', 'sentiment', 'version', 'variant', 'source', 'resources_pretty', 'created_at')
+    exclude = ('resources',)
+    ordering = ('-version', 'emotion', 'intensity', 'sentiment', 'variant')
+
+    def resources_pretty(self, obj):
+        data = json.dumps(obj.resources, indent=2, ensure_ascii=False)
+        return format_html('<pre style="white-space: pre-wrap">{}</pre>', data)
+    resources_pretty.short_description = 'Recursos'
+
+    def has_add_permission(self, request):
+        # Las plantillas se generan con el comando de gestión, no manualmente.
+        return False
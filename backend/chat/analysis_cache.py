@@ -0,0 +1,165 @@
+# backend/chat/analysis_cache.py
+"""
+Caché direccionada por contenido para el análisis emocional híbrido.
+
+Los estudiantes envían muchas entradas cortas casi idénticas ("estoy cansado", "bien", "no sé").
+La clave es el hash del texto normalizado más los identificadores de los modelos, de modo que
+un cambio de modelo invalida automáticamente las entradas anteriores.
+
+Dos niveles:
+- Local: LRU acotado en memoria del proceso, con TTL.
+- Compartido (opcional): framework de caché de Django, para que todos los workers de gunicorn
+  aprovechen los resultados (requiere un backend compartido: DatabaseCache, Redis, Memcached...).
+
+Las respuestas por defecto/fallback nunca se guardan.
+"""
+import copy
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class AnalysisCache:
+    KEY_PREFIX = 'hybrid-analysis'
+
+    def __init__(self, model_ids: Iterable[str], version: str = '1'):
+        self.enabled = getattr(settings, 'EMOTION_CACHE_ENABLED', True)
+        self.max_entries = getattr(settings, 'EMOTION_CACHE_MAX_ENTRIES', 2048)
+        self.ttl = getattr(settings, 'EMOTION_CACHE_TTL_SECONDS', 24 * 60 * 60)
+        self.shared_enabled = getattr(settings, 'EMOTION_CACHE_SHARED', False)
+        self.shared_alias = getattr(settings, 'EMOTION_CACHE_ALIAS', 'default')
+
+        # Huella de los modelos: forma parte de cada clave
+        self.model_fingerprint = '|'.join(list(model_ids) + [f'v{version}'])
+
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            'local_hits': 0,
+            'shared_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'skipped_fallbacks': 0,
+            'evictions': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Claves
+    # ------------------------------------------------------------------
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normaliza unicode, mayúsculas y espacios; conserva la puntuación."""
+        normalized = unicodedata.normalize('NFC', text or '')
+        return ' '.join(normalized.lower().split())
+
+    def make_key(self, text: str) -> str:
+        payload = f"{self.model_fingerprint}\n{self.normalize(text)}".encode('utf-8')
+        return f"{self.KEY_PREFIX}:{hashlib.sha256(payload).hexdigest()}"
+
+    # ------------------------------------------------------------------
+    # Lectura / escritura
+    # ------------------------------------------------------------------
+    def get(self, text: str) -> Optional[Dict]:
+        """Devuelve una copia del resultado cacheado o None."""
+        if not self.enabled:
+            return None
+
+        key = self.make_key(text)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._local.move_to_end(key)
+                    self._counters['local_hits'] += 1
+                    return copy.deepcopy(value)
+                del self._local[key]
+
+        if self.shared_enabled:
+            try:
+                value = caches[self.shared_alias].get(key)
+            except Exception as e:
+                print(f"[CACHE] Error leyendo caché compartida: {e}")
+                value = None
+            if value is not None:
+                self._store_local(key, value)
+                with self._lock:
+                    self._counters['shared_hits'] += 1
+                return copy.deepcopy(value)
+
+        with self._lock:
+            self._counters['misses'] += 1
+        return None
+
+    def set(self, text: str, result: Dict) -> bool:
+        """Guarda el resultado salvo que provenga de una respuesta por defecto."""
+        if not self.enabled:
+            return False
+
+        if self.is_fallback(result):
+            with self._lock:
+                self._counters['skipped_fallbacks'] += 1
+            return False
+
+        key = self.make_key(text)
+        value = copy.deepcopy(result)
+        self._store_local(key, value)
+
+        if self.shared_enabled:
+            try:
+                caches[self.shared_alias].set(key, value, timeout=self.ttl)
+            except Exception as e:
+                print(f"[CACHE] Error escribiendo caché compartida: {e}")
+
+        with self._lock:
+            self._counters['stores'] += 1
+        return True
+
+    @staticmethod
+    def is_fallback(result: Dict) -> bool:
+        if result.get('used_fallback'):
+            return True
+        for part in ('pysentimiento_emotion', 'pysentimiento_sentiment'):
+            if (result.get(part) or {}).get('is_fallback'):
+                return True
+        return False
+
+    def _store_local(self, key: str, value: Dict):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._local[key] = (expires_at, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._local)
+        lookups = counters['local_hits'] + counters['shared_hits'] + counters['misses']
+        hits = counters['local_hits'] + counters['shared_hits']
+        return {
+            'enabled': self.enabled,
+            'shared_enabled': self.shared_enabled,
+            'local_size': size,
+            'local_max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hit_ratio': round(hits / lookups, 3) if lookups else 0.0,
+            **counters,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
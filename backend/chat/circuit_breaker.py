@@ -0,0 +1,211 @@
+# backend/chat/circuit_breaker.py
+"""
+Circuit breakers por endpoint externo (modelos de Hugging Face y Gemini).
+
+Cuando un proveedor se degrada, cada turno de chat agotaba los timeouts completos antes de caer
+en la respuesta por defecto, bloqueando hilos del worker. El breaker observa una ventana de las
+últimas llamadas y se abre si la tasa de errores o de llamadas lentas supera el umbral; mientras
+está abierto las llamadas se cortan al instante y el llamador usa su fallback existente.
+Tras OPEN_SECONDS pasa a semiabierto y deja pasar unas pocas llamadas de prueba: si salen bien
+se cierra, si fallan vuelve a abrirse.
+
+Los breakers viven en memoria del proceso (un estado por worker de gunicorn).
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+
+
+class CircuitOpenError(Exception):
+    """La llamada se cortó porque el circuito está abierto."""
+
+    def __init__(self, name: str):
+        super().__init__(f"Circuito '{name}' abierto")
+        self.name = name
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: Optional[float] = None,
+        slow_call_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)  # (falló, lenta)
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self._counters = {
+            'calls': 0,
+            'failures': 0,
+            'slow_calls': 0,
+            'short_circuited': 0,
+            'times_opened': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Estado
+    # ------------------------------------------------------------------
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def is_open(self) -> bool:
+        """Consulta sin consumir un turno de prueba (útil para saltar trabajo previo)."""
+        return self.state == self.OPEN
+
+    def _refresh_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+            self._half_open_successes = 0
+            print(f"[CircuitBreaker:{self.name}] Semiabierto, probando recuperación")
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._counters['times_opened'] += 1
+        print(f"[CircuitBreaker:{self.name}] ABIERTO durante {self.open_seconds}s")
+
+    def _close(self):
+        self._state = self.CLOSED
+        self._window.clear()
+        print(f"[CircuitBreaker:{self.name}] Cerrado, endpoint recuperado")
+
+    # ------------------------------------------------------------------
+    # Registro de llamadas
+    # ------------------------------------------------------------------
+    def allow_request(self) -> bool:
+        with self._lock:
+            self._refresh_state()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+            self._counters['short_circuited'] += 1
+            return False
+
+    def record_success(self, duration: float):
+        slow = self.slow_call_seconds is not None and duration >= self.slow_call_seconds
+        self._record(failed=False, slow=slow)
+
+    def record_failure(self, duration: float = 0.0):
+        slow = self.slow_call_seconds is not None and duration >= self.slow_call_seconds
+        self._record(failed=True, slow=slow)
+
+    def _record(self, failed: bool, slow: bool):
+        with self._lock:
+            self._counters['calls'] += 1
+            self._counters['failures'] += int(failed)
+            self._counters['slow_calls'] += int(slow)
+
+            if self._state == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                if failed or slow:
+                    self._open()
+                else:
+                    self._half_open_successes += 1
+                    if self._half_open_successes >= self.half_open_max_calls:
+                        self._close()
+                return
+
+            if self._state == self.OPEN:
+                return
+
+            self._window.append((failed, slow))
+            if len(self._window) < self.min_calls:
+                return
+            total = len(self._window)
+            failure_rate = sum(1 for f, _ in self._window if f) / total
+            slow_rate = sum(1 for _, s in self._window if s) / total
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._open()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Ejecuta func bajo el breaker; lanza CircuitOpenError si el circuito está abierto."""
+        if not self.allow_request():
+            raise CircuitOpenError(self.name)
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure(time.monotonic() - start)
+            raise
+        self.record_success(time.monotonic() - start)
+        return result
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    def snapshot(self) -> Dict:
+        with self._lock:
+            self._refresh_state()
+            total = len(self._window)
+            return {
+                'state': self._state,
+                'window_calls': total,
+                'window_failure_rate': round(sum(1 for f, _ in self._window if f) / total, 3) if total else 0.0,
+                'window_slow_rate': round(sum(1 for _, s in self._window if s) / total, 3) if total else 0.0,
+                'seconds_until_half_open': (
+                    max(0.0, round(self.open_seconds - (time.monotonic() - self._opened_at), 1))
+                    if self._state == self.OPEN else None
+                ),
+                **self._counters,
+            }
+
+
+_registry: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str, slow_call_seconds: Optional[float] = None) -> CircuitBreaker:
+    """Devuelve (creándolo si hace falta) el breaker del endpoint indicado"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = CircuitBreaker(
+                name,
+                failure_rate_threshold=getattr(settings, 'CIRCUIT_BREAKER_FAILURE_RATE', 0.5),
+                slow_call_seconds=slow_call_seconds,
+                slow_call_rate_threshold=getattr(settings, 'CIRCUIT_BREAKER_SLOW_CALL_RATE', 0.5),
+                window_size=getattr(settings, 'CIRCUIT_BREAKER_WINDOW_SIZE', 20),
+                min_calls=getattr(settings, 'CIRCUIT_BREAKER_MIN_CALLS', 5),
+                open_seconds=getattr(settings, 'CIRCUIT_BREAKER_OPEN_SECONDS', 30),
+                half_open_max_calls=getattr(settings, 'CIRCUIT_BREAKER_HALF_OPEN_CALLS', 1),
+            )
+        return _registry[name]
+
+
+def get_gemini_breaker() -> CircuitBreaker:
+    """Breaker compartido por todas las llamadas a model.generate_content"""
+    return get_breaker('gemini', slow_call_seconds=getattr(settings, 'CIRCUIT_BREAKER_GEMINI_SLOW_SECONDS', 30))
+
+
+def breakers_snapshot() -> Dict[str, Dict]:
+    with _registry_lock:
+        breakers = list(_registry.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
@@ -0,0 +1,82 @@
+# backend/chat/conditional.py
+"""
+GET condicionales (ETag / Last-Modified) para el historial del chat y el dashboard.
+
+La versión de cada recurso sale de marcas baratas en Conversation (updated_at, que cambia con
+cada turno guardado y con cada análisis que llega después, y message_count), leídas con una
+consulta indexada. Si el cliente ya tiene esa versión (If-None-Match / If-Modified-Since) se
+responde 304 sin ejecutar las agregaciones ni serializar la respuesta.
+
+Las respuestas llevan Cache-Control: private, no-cache: el navegador las guarda, pero siempre
+revalida antes de usarlas (los datos son por usuario y no deben quedar en cachés compartidas).
+"""
+import hashlib
+from datetime import datetime
+from typing import Iterable, Optional
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Conversation
+
+
+class VersionStamp:
+    """ETag y Last-Modified de un recurso"""
+
+    def __init__(self, parts: Iterable, last_modified: Optional[datetime] = None):
+        digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+        self.etag = f'"{digest[:32]}"'
+        self.last_modified = last_modified
+
+    def not_modified(self, request):
+        """Respuesta 304 si el cliente ya tiene esta versión; None si hay que generar la respuesta"""
+        timestamp = int(self.last_modified.timestamp()) if self.last_modified else None
+        response = get_conditional_response(request, etag=self.etag, last_modified=timestamp)
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        response['ETag'] = self.etag
+        if self.last_modified:
+            response['Last-Modified'] = http_date(self.last_modified.timestamp())
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+def conversation_stamp(conversation) -> VersionStamp:
+    """Historial de una conversación (dict con id, message_count y updated_at)"""
+    return VersionStamp(
+        ('conversation', conversation['id'], conversation['message_count'], conversation['updated_at'].isoformat()),
+        conversation['updated_at'],
+    )
+
+
+def _conversations_watermark(queryset):
+    watermark = queryset.aggregate(updated=Max('updated_at'), total=Count('id'))
+    updated = watermark['updated']
+    return (updated.isoformat() if updated else '-', watermark['total']), updated
+
+
+def user_conversations_stamp(user_id, scope: str = 'conversations', rolling_window: bool = False) -> VersionStamp:
+    """
+    Listado de conversaciones o estadísticas de un estudiante.
+    rolling_window: la respuesta depende de "la última semana", así que la versión cambia
+    también cada hora aunque no haya mensajes nuevos.
+    """
+    parts, updated = _conversations_watermark(Conversation.objects.filter(user_id=user_id))
+    window = timezone.now().strftime('%Y%m%d%H') if rolling_window else ''
+    return VersionStamp((scope, user_id, *parts, window), updated)
+
+
+def cohort_stamp(teacher_id, student_ids) -> VersionStamp:
+    """Estadísticas de los estudiantes asignados a un profesor (ventana móvil, ver arriba)"""
+    student_ids = sorted(student_ids)
+    parts, updated = _conversations_watermark(Conversation.objects.filter(user_id__in=student_ids))
+    roster = hashlib.sha1(','.join(str(pk) for pk in student_ids).encode('utf-8')).hexdigest()
+    return VersionStamp(
+        ('cohort', teacher_id, roster, *parts, timezone.now().strftime('%Y%m%d%H')),
+        updated,
+    )
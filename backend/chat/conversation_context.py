@@ -0,0 +1,259 @@
+# backend/chat/conversation_context.py
+"""
+Contexto por conversación para construir el prompt del chat sin consultar la base de datos.
+
+Se guarda en el framework de caché de Django (CHAT_CONTEXT_CACHE_ALIAS) y se actualiza de
+forma incremental cada vez que se guarda un turno:
+- turns: los últimos mensajes (id, emisor, texto) que van al prompt.
+- emotions: emoción primaria, sentimiento y estado del análisis de los últimos mensajes del
+  estudiante (estado emocional de la conversación).
+- summary: resumen incremental de lo que ya salió de la ventana (Conversation.summary) y
+  cuántos mensajes fuera de la ventana faltan resumir (ver chat.job_handlers).
+
+Reconstrucción: si la entrada no existe (primera vez, expiró o fue invalidada) se rearma con
+dos consultas. También se rearma si no coincide con la fila de Conversation que ya cargó la
+vista (message_count o summary_through_message_id distintos): otro proceso guardó mensajes
+(respuesta asíncrona del worker) o actualizó el resumen. Si al agregar un turno el contexto
+no coincide con el que se usó para el prompt (otro turno concurrente de la misma
+conversación) se invalida y se reconstruye en la siguiente lectura.
+
+Análisis que terminan después: el mensaje se agrega con el análisis que tenía al guardarse
+(provisional en modo asíncrono). Mientras una entrada de `emotions` no esté completa, cada
+lectura vuelve a leer esos mensajes de la base de datos, así el análisis del worker (que
+corre en otro proceso) llega al contexto sin que el worker escriba en la caché.
+"""
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Conversation, Message
+
+CONTEXT_VERSION = 4
+# Mensajes previos que van al prompt (más el mensaje actual son 7)
+MAX_TURNS = 6
+# Mensajes del estudiante que forman el estado emocional
+MAX_EMOTIONS = 10
+
+_counters = {
+    'hits': 0,
+    'misses': 0,
+    'appends': 0,
+    'invalidations': 0,
+    'stale': 0,
+    'analysis_refreshes': 0,
+}
+_counters_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def _cache():
+    return caches[getattr(settings, 'CHAT_CONTEXT_CACHE_ALIAS', 'default')]
+
+
+def _ttl() -> int:
+    return getattr(settings, 'CHAT_CONTEXT_CACHE_TTL_SECONDS', 6 * 60 * 60)
+
+
+def _key(conversation_id: int) -> str:
+    return f"chat-context:v{CONTEXT_VERSION}:{conversation_id}"
+
+
+def empty_context() -> Dict:
+    return {
+        'last_message_id': None,
+        'message_count': 0,  # Conversation.message_count al que corresponde el contexto
+        'turns': [],
+        'emotions': [],
+        'summary': '',
+        'summary_through_id': None,
+        'unsummarized': 0,  # Mensajes fuera de la ventana que todavía no están en el resumen
+    }
+
+
+def get_context(conversation: Conversation, new_conversation: bool = False) -> Dict:
+    """
+    Contexto de la conversación; lo reconstruye desde la base de datos si no está en caché o si
+    no coincide con `conversation` (la fila recién leída)
+    """
+    if new_conversation:
+        return empty_context()
+
+    context = _cache().get(_key(conversation.id))
+    if context is not None and _matches(context, conversation):
+        _count('hits')
+        _refresh_pending_analyses(conversation.id, context)
+        return context
+
+    _count('misses' if context is None else 'stale')
+    context = rebuild_context(conversation)
+    _cache().set(_key(conversation.id), context, timeout=_ttl())
+    return context
+
+
+def _matches(context: Dict, conversation: Conversation) -> bool:
+    return (
+        context['message_count'] == conversation.message_count
+        and context['summary_through_id'] == conversation.summary_through_message_id
+    )
+
+
+def count_unsummarized(conversation_id: int, summary_through_id: Optional[int]) -> int:
+    """Mensajes fuera de la ventana del prompt que todavía no están en el resumen"""
+    messages = Message.objects.filter(conversation_id=conversation_id)
+    if summary_through_id is not None:
+        messages = messages.filter(id__gt=summary_through_id)
+    return max(0, messages.count() - MAX_TURNS)
+
+
+def rebuild_context(conversation: Conversation) -> Dict:
+    """Rearma el contexto: los mensajes más recientes y cuántos faltan resumir"""
+    recent = list(
+        conversation.messages
+        .order_by('-timestamp', '-id')
+        .values('id', 'sender', 'text', 'primary_emotion', 'sentiment', 'analysis_status')[:MAX_TURNS + 2 * MAX_EMOTIONS]
+    )
+    recent.reverse()
+
+    context = empty_context()
+    context['message_count'] = conversation.message_count
+    context['summary'] = conversation.summary
+    context['summary_through_id'] = conversation.summary_through_message_id
+    _extend(context, recent)
+    context['unsummarized'] = count_unsummarized(conversation.id, conversation.summary_through_message_id)
+    return context
+
+
+def append_turn(conversation_id: int, previous_last_id: Optional[int], messages: Iterable[Message]) -> Optional[Dict]:
+    """
+    Agrega los mensajes recién guardados. previous_last_id es el último mensaje del contexto
+    con el que se armó el prompt: si no coincide, el contexto se invalida.
+    Devuelve el contexto actualizado (None si no había o se invalidó).
+    """
+    key = _key(conversation_id)
+    context = _cache().get(key)
+    if context is None:
+        if previous_last_id is not None:
+            # Se reconstruye en la próxima lectura
+            return None
+        # Conversación vacía al armar el prompt: se empieza de cero sin consultar
+        context = empty_context()
+    elif context['last_message_id'] != previous_last_id:
+        _cache().delete(key)
+        _count('invalidations')
+        return None
+
+    messages = list(messages)
+    context['message_count'] += len(messages)
+    _extend(context, [
+        {
+            'id': message.id,
+            'sender': message.sender,
+            'text': message.text,
+            'primary_emotion': message.primary_emotion,
+            'sentiment': message.sentiment,
+            'analysis_status': message.analysis_status,
+        }
+        for message in messages
+    ])
+    _cache().set(key, context, timeout=_ttl())
+    _count('appends')
+    return context
+
+
+def before_message(context: Dict, message_id: int) -> Dict:
+    """
+    Copia del contexto con los mensajes anteriores a message_id, para reintentar un turno cuyo
+    mensaje ya está guardado (va aparte en el prompt, como en un turno nuevo). Al guardar el
+    turno el contexto en caché no coincide con este y se invalida.
+    """
+    turns = [turn for turn in context['turns'] if turn['id'] < message_id]
+    return {
+        **context,
+        'turns': turns,
+        'emotions': [entry for entry in context['emotions'] if entry['id'] < message_id],
+        'last_message_id': turns[-1]['id'] if turns else None,
+    }
+
+
+def _refresh_pending_analyses(conversation_id: int, context: Dict):
+    """Relee de la base de datos los mensajes del estado emocional cuyo análisis no estaba completo"""
+    pending = [entry['id'] for entry in context['emotions'] if entry['status'] != Message.ANALYSIS_COMPLETE]
+    if not pending:
+        return
+
+    rows = {
+        row['id']: row
+        for row in Message.objects.filter(id__in=pending).values('id', 'primary_emotion', 'sentiment', 'analysis_status')
+    }
+    changed = False
+    for entry in context['emotions']:
+        row = rows.get(entry['id'])
+        if row is None or (row['primary_emotion'], row['sentiment'], row['analysis_status']) == (
+            entry['emotion'], entry['sentiment'], entry['status']
+        ):
+            continue
+        entry['emotion'] = row['primary_emotion']
+        entry['sentiment'] = row['sentiment']
+        entry['status'] = row['analysis_status']
+        changed = True
+
+    if changed:
+        _cache().set(_key(conversation_id), context, timeout=_ttl())
+        _count('analysis_refreshes')
+
+
+def _extend(context: Dict, messages: List[Dict]):
+    for message in messages:
+        context['turns'].append({
+            'id': message['id'],
+            'sender': message['sender'],
+            'text': message['text'],
+        })
+        if message['sender'] == 'user':
+            context['emotions'].append({
+                'id': message['id'],
+                'emotion': message['primary_emotion'],
+                'sentiment': message['sentiment'],
+                'status': message['analysis_status'],
+            })
+        context['last_message_id'] = message['id']
+
+    overflow = len(context['turns']) - MAX_TURNS
+    if overflow > 0:
+        context['unsummarized'] += sum(
+            1 for turn in context['turns'][:overflow]
+            if context['summary_through_id'] is None or turn['id'] > context['summary_through_id']
+        )
+    context['turns'] = context['turns'][-MAX_TURNS:]
+    context['emotions'] = context['emotions'][-MAX_EMOTIONS:]
+
+
+def emotional_state(context: Dict) -> Dict:
+    """Resumen del estado emocional de la conversación: recientes, predominante y racha negativa"""
+    emotions = [entry['emotion'] for entry in context['emotions'] if entry['emotion'] and entry['emotion'] != 'others']
+    negative_streak = 0
+    for entry in reversed(context['emotions']):
+        if entry['sentiment'] != 'NEG':
+            break
+        negative_streak += 1
+
+    return {
+        'recent': emotions[-3:],
+        'dominant': Counter(emotions).most_common(1)[0][0] if emotions else None,
+        'negative_streak': negative_streak,
+    }
+
+
+def context_stats() -> Dict:
+    with _counters_lock:
+        stats = dict(_counters)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+    return stats
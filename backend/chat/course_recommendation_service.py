@@ -6,23 +6,15 @@ y se apoyan en Gemini cuando está disponible. Siempre se aclara que no reemplaz
 from __future__ import annotations
 
 import json
-import os
-from datetime import timedelta
+from collections import Counter
 from typing import Dict, List, Optional
 
-import google.generativeai as genai
-from django.db.models import Count
-from django.utils import timezone
-
-from .models import CourseEmotionRecommendation, Message
+from . import emotion_rollups, llm_client
+from .llm_admission import acquire_slot
+from .models import CourseEmotionRecommendation, DailyEmotionRollup, Message
+from .prompts import DISCLAIMER_TEXT
 from users.models import Course
 
-GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
-DISCLAIMER_TEXT = (
-    "Estas sugerencias se basan en educación socioemocional (Bisquerra, CASEL, Goleman) y "
-    "no reemplazan el acompañamiento de psicología o psicopedagogía profesional."
-)
-
 
 class CourseEmotionRecommendationService:
     """
@@ -47,14 +39,8 @@ class CourseEmotionRecommendationService:
     }
 
     def __init__(self) -> None:
-        api_key = os.getenv('GEMINI_API_KEY')
-        self.model = None
-        if api_key:
-            try:
-                genai.configure(api_key=api_key)
-                self.model = genai.GenerativeModel(GEMINI_MODEL)
-            except Exception as exc:  # pragma: no cover - falla solo si credenciales son inválidas
-                print(f"[CourseRecommendationService] No se pudo inicializar Gemini: {exc}")
+        # Sin clave de Gemini (ni backend falso) se usan directamente las sugerencias de respaldo
+        self.llm_enabled = llm_client.is_available()
 
     # ----------------------------------------------------------------------
     # Métricas base
@@ -71,32 +57,37 @@ class CourseEmotionRecommendationService:
                 'recent_samples': [],
             }
 
-        window_start = timezone.now() - timedelta(days=self.TIME_WINDOW_DAYS)
-        qs = (
-            Message.objects.filter(
-                conversation__user_id__in=students_ids,
-                sender='user',
-                timestamp__gte=window_start,
+        # Conteos de los mensajes analizados desde el resumen diario (estudiantes × días); el
+        # primer día de la ventana entra solo en parte y se recalcula desde Message
+        cutoff, edge_day = emotion_rollups.rolling_window(self.TIME_WINDOW_DAYS)
+        rows = list(
+            DailyEmotionRollup.objects.filter(student_id__in=students_ids, day__gt=edge_day).values(
+                'analyzed', 'primary_emotion_counts', 'analyzed_sentiment_counts'
             )
-            .exclude(primary_emotion__isnull=True)
         )
-
-        total = qs.count()
-        emotion_counts = {
-            row['primary_emotion']: row['total']
-            for row in qs.values('primary_emotion').annotate(total=Count('id'))
-        }
-        sentiment_counts = {
-            row['sentiment']: row['total']
-            for row in qs.exclude(sentiment__isnull=True)
-                           .values('sentiment').annotate(total=Count('id'))
-        }
+        rows.extend(emotion_rollups.compute_rollups(
+            emotion_rollups.window_edge_messages(students_ids, cutoff)
+        ).values())
+        total = 0
+        emotion_counts = Counter()
+        sentiment_counts = Counter()
+        for row in rows:
+            total += row['analyzed']
+            emotion_counts.update(row['primary_emotion_counts'])
+            sentiment_counts.update(row['analyzed_sentiment_counts'])
+        emotion_counts = dict(emotion_counts)
+        sentiment_counts = dict(sentiment_counts)
 
         emotion_ratios = {
             emotion: round(count / total, 3) if total else 0.0
             for emotion, count in emotion_counts.items()
         }
 
+        qs = Message.objects.filter(
+            conversation__user_id__in=students_ids,
+            sender='user',
+            timestamp__gte=cutoff,
+        ).exclude(primary_emotion__isnull=True)
         recent_samples = list(
             qs.order_by('-timestamp')
               .values('text', 'primary_emotion', 'sentiment')[:5]
@@ -161,9 +152,12 @@ class CourseEmotionRecommendationService:
         return {'emotion': emotion, 'ratio': ratio, 'reason': 'dominant'}
 
     def _build_content(self, course: Course, trigger: Dict, stats: Dict) -> Dict:
-        if self.model:
+        if self.llm_enabled:
             try:
-                response = self.model.generate_content(self._build_prompt(course, trigger, stats))
+                prompt = self._build_prompt(course, trigger, stats)
+                # Instrucciones y formato JSON registrados como system_instruction
+                with acquire_slot(llm_client.PURPOSE_COURSE_RECOMMENDATION):
+                    response = llm_client.generate(llm_client.PURPOSE_COURSE_RECOMMENDATION, prompt)
                 parsed = self._parse_ai_response(response.text)
                 if parsed:
                     return parsed
@@ -188,8 +182,8 @@ class CourseEmotionRecommendationService:
             "Referencias generales: Bisquerra, Goleman, CASEL, Siegel.",
         )
 
+        # Rol, criterios y formato JSON van como system_instruction (prompts.COURSE_RECOMMENDATION_SYSTEM_INSTRUCTION)
         return f"""
-Eres un orientador pedagógico especializado en educación socioemocional.
 Necesitas sugerir acciones para el curso "{course.name}" (código {course.code}).
 
 Datos disponibles (últimos {stats['time_window_days']} días):
@@ -200,26 +194,7 @@ Datos disponibles (últimos {stats['time_window_days']} días):
 - Ejemplos recientes:
 {sample_texts}
 
-Considera siempre:
-- Son recomendaciones educativas inspiradas en {reference}.
-- Nunca reemplazan a profesionales de psicología o psicopedagogía.
-- Propón actividades factibles dentro del aula o tutorías breves (10-20 min).
-- Incluye al menos una acción colectiva y otra individual/reflexiva.
-
-Formatea tu respuesta como JSON estricto con esta estructura:
-{{
-  "overview": "Resumen breve de lo que ocurre y objetivo pedagógico",
-  "suggestions": [
-    {{
-      "title": "Título breve",
-      "description": "¿Por qué ayuda esta estrategia?",
-      "activity": "Actividad concreta (pasos resumidos)",
-      "reference": "Libro o autor que respalda la sugerencia"
-    }}
-  ],
-  "disclaimer": "{DISCLAIMER_TEXT}"
-}}
-Incluye entre 2 y 3 sugerencias.
+Referencia sugerida: {reference}.
 """
 
     def _parse_ai_response(self, text: str) -> Optional[Dict]:
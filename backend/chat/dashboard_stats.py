@@ -0,0 +1,106 @@
+# backend/chat/dashboard_stats.py
+"""
+Estadísticas emocionales del dashboard (estudiante, profesor y reporte PDF).
+
+Todo el resumen sale de una consulta al resumen diario DailyEmotionRollup (chat.emotion_rollups):
+los totales del grupo y el valor más frecuente de cada estudiante se obtienen sumando sus filas,
+así el costo crece con estudiantes × días y no con el total de mensajes.
+
+Se mantiene la semántica de las consultas anteriores sobre Message: los sentimientos y emociones
+nulos no se cuentan (tampoco los provisionales de mensajes con análisis pendiente), el top 5 de emociones se corta antes de descartar etiquetas vacías y un
+estudiante cuyo valor más frecuente es vacío (o sin mensajes) queda como 'NEU' / 'others'.
+"La última semana" sigue siendo timestamp >= ahora - 7 días: los días completos salen del
+resumen y el primero se cuenta desde Message (una consulta más, acotada a ese día).
+"""
+from collections import Counter, defaultdict
+from typing import Dict, Iterable
+
+from .emotion_analyzer import EMOTION_MAPPING, SENTIMENT_MAPPING
+from .emotion_rollups import rolling_window, window_edge_messages
+from .models import DailyEmotionRollup
+
+TOP_EMOTIONS = 5
+LAST_WEEK_DAYS = 7
+DEFAULT_SENTIMENT = 'NEU'
+DEFAULT_EMOTION = 'others'
+
+
+def _ranked(counts: Dict) -> list:
+    """
+    (etiqueta, conteo) de mayor a menor. Los empates se resuelven por etiqueta, con las vacías
+    al final, para que el resultado sea estable (antes dependía del orden del motor).
+    """
+    return sorted(counts.items(), key=lambda item: (-item[1], not item[0], item[0] or ''))
+
+
+def _mode(counts: Dict, default: str) -> str:
+    ranked = _ranked(counts)
+    return ranked[0][0] if ranked and ranked[0][0] else default
+
+
+def emotion_summary(student_ids: Iterable[int]) -> Dict:
+    """
+    Resumen de los mensajes de `student_ids`: totales, distribución de sentimientos, top de
+    emociones y, en 'per_student', conteo y valores dominantes de cada estudiante.
+    """
+    student_ids = list(student_ids)
+    last_week_cutoff, last_week_edge = rolling_window(LAST_WEEK_DAYS)
+
+    sentiments_by_student = defaultdict(Counter)
+    emotions_by_student = defaultdict(Counter)
+    entries_by_student = Counter()
+    entries_last_week = 0
+    for row in DailyEmotionRollup.objects.filter(student_id__in=student_ids).values(
+        'student_id', 'day', 'entries', 'sentiment_counts', 'dominant_emotion_counts'
+    ):
+        student_id = row['student_id']
+        sentiments_by_student[student_id].update(row['sentiment_counts'])
+        emotions_by_student[student_id].update(row['dominant_emotion_counts'])
+        entries_by_student[student_id] += row['entries']
+        if row['day'] > last_week_edge:
+            entries_last_week += row['entries']
+    if student_ids:
+        entries_last_week += window_edge_messages(student_ids, last_week_cutoff).count()
+
+    total_entries = sum(entries_by_student.values())
+    sentiment_totals = Counter()
+    emotion_totals = Counter()
+    for counts in sentiments_by_student.values():
+        sentiment_totals.update(counts)
+    for counts in emotions_by_student.values():
+        emotion_totals.update(counts)
+
+    sentiment_distribution = [
+        {
+            'sentiment': SENTIMENT_MAPPING.get(sentiment, sentiment),
+            'count': count,
+            'percentage': round((count / total_entries * 100) if total_entries > 0 else 0, 1)
+        }
+        for sentiment, count in _ranked(sentiment_totals)
+        if sentiment
+    ]
+    top_emotions = [
+        {'emotion': EMOTION_MAPPING.get(emotion, emotion), 'count': count}
+        for emotion, count in _ranked(emotion_totals)[:TOP_EMOTIONS]
+        if emotion
+    ]
+
+    per_student = {}
+    for student_id in student_ids:
+        dominant_sentiment = _mode(sentiments_by_student.get(student_id, {}), DEFAULT_SENTIMENT)
+        dominant_emotion = _mode(emotions_by_student.get(student_id, {}), DEFAULT_EMOTION)
+        per_student[student_id] = {
+            'entries_count': entries_by_student[student_id],
+            'dominant_sentiment': SENTIMENT_MAPPING.get(dominant_sentiment, dominant_sentiment),
+            'dominant_emotion': EMOTION_MAPPING.get(dominant_emotion, dominant_emotion),
+        }
+
+    return {
+        'total_entries': total_entries,
+        'most_common_sentiment': sentiment_distribution[0]['sentiment'] if sentiment_distribution else 'neutral',
+        'most_common_sentiment_percentage': sentiment_distribution[0]['percentage'] if sentiment_distribution else 0,
+        'entries_last_week': entries_last_week,
+        'sentiment_distribution': sentiment_distribution,
+        'top_emotions': top_emotions,
+        'per_student': per_student,
+    }
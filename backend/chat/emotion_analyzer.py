@@ -1,8 +1,19 @@
-import requests
 import os
-from typing import Dict, List
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
 import json
 
+from django.conf import settings
+
+from .analysis_cache import AnalysisCache
+from .circuit_breaker import CircuitOpenError, get_breaker
+from .inference_backends import InferenceError, get_inference_backend
+from .translation import TranslationService
+
 
 class EmotionAnalyzer:
     """
@@ -22,107 +33,288 @@ class EmotionAnalyzer:
         'optimism', 'relief', 'remorse', 'neutral', 'realization'
     ]
     
+    # Modelos de Hugging Face
+    EMOTION_MODEL_ID = "finiteautomata/beto-emotion-analysis"
+    SENTIMENT_MODEL_ID = "finiteautomata/beto-sentiment-analysis"
+    GOEMOTIONS_MODEL_ID = "SamLowe/roberta-base-go_emotions"
+    
+    # Versión de la lógica híbrida: forma parte de la clave de caché
+    ANALYSIS_VERSION = '1'
+    
+    # GoEmotions solo cambia la emoción primaria con gratitude/pride > 0.70
+    GOEMOTIONS_OVERRIDE_THRESHOLD = 0.70
+    
+    # Pistas baratas de gratitud/orgullo (texto sin tildes, en minúsculas).
+    # Si aparecen, la cascada siempre ejecuta GoEmotions.
+    GOEMOTIONS_CUES = re.compile(
+        r'\b(graci|agradec|orgullo|logr|consegu|aprob|super[eo]|gane\b|me salio bien|pude\b)'
+    )
+    
     def __init__(self):
         self.api_token = os.getenv('HUGGINGFACE_API_TOKEN')
-        if not self.api_token:
+        backend_name = getattr(settings, 'EMOTION_INFERENCE_BACKEND', 'huggingface_api')
+        if not self.api_token and backend_name == 'huggingface_api':
             print("WARNING: HUGGINGFACE_API_TOKEN no configurado")
         
-        # URLs de modelos
-        self.emotion_model_url = "https://api-inference.huggingface.co/models/finiteautomata/beto-emotion-analysis"
-        self.sentiment_model_url = "https://api-inference.huggingface.co/models/finiteautomata/beto-sentiment-analysis"
-        self.goemotions_model_url = "https://api-inference.huggingface.co/models/SamLowe/roberta-base-go_emotions"
+        # Backend de inferencia: API remota de Hugging Face o motor local en proceso
+        self.backend = get_inference_backend(self.api_token)
+        
+        # Un circuit breaker por endpoint: si uno se degrada se responde al instante con el fallback
+        slow_seconds = getattr(settings, 'CIRCUIT_BREAKER_HF_SLOW_SECONDS', 8)
+        self.breakers = {
+            'emotion': get_breaker('hf:emotion', slow_call_seconds=slow_seconds),
+            'sentiment': get_breaker('hf:sentiment', slow_call_seconds=slow_seconds),
+            'goemotions': get_breaker('hf:goemotions', slow_call_seconds=slow_seconds),
+        }
+        
+        # Ejecución concurrente de los tres modelos (ver analyze_complete_hybrid)
+        self.concurrent = getattr(settings, 'EMOTION_ANALYSIS_CONCURRENT', True)
+        
+        # Cascada: GoEmotions solo se ejecuta si puede cambiar el resultado (ver should_run_goemotions)
+        self.cascade = getattr(settings, 'EMOTION_CASCADE_ENABLED', False)
+        self._cascade_lock = threading.Lock()
+        self._cascade_counters = {
+            'evaluated': 0,
+            'ran': 0,
+            'skipped': 0,
+            'reasons': {},
+        }
+        self.max_workers = getattr(settings, 'EMOTION_ANALYSIS_MAX_WORKERS', 6)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        # Traductor ES→EN reutilizable con memoización (rama GoEmotions)
+        self.translator = TranslationService(src='es', dest='en')
+        
+        # Caché de resultados por texto normalizado + modelos
+        # (con cascada se guardan resultados sin GoEmotions: modo distinto, claves distintas)
+        self.cache = AnalysisCache(
+            model_ids=[self.backend.name, self.EMOTION_MODEL_ID, self.SENTIMENT_MODEL_ID, self.GOEMOTIONS_MODEL_ID],
+            version=f"{self.ANALYSIS_VERSION}{'-cascade' if self.cascade else ''}",
+        )
+    
+    @property
+    def model_ids(self) -> List[str]:
+        return [self.EMOTION_MODEL_ID, self.SENTIMENT_MODEL_ID, self.GOEMOTIONS_MODEL_ID]
+    
+    def warm_up(self, background: bool = False):
+        """
+        Prepara el backend antes del primer mensaje del worker:
+        conexiones HTTP precalentadas o modelos locales ya cargados.
+        """
+        if background:
+            threading.Thread(
+                target=self.backend.warm_up,
+                args=(self.model_ids,),
+                name='inference-warmup',
+                daemon=True
+            ).start()
+        else:
+            self.backend.warm_up(self.model_ids)
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Pool de hilos acotado, compartido por todas las peticiones del worker"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='hybrid-analysis'
+                    )
+        return self._executor
+    
+    def _run_hybrid_models(self, text: str, deadline: Optional[float] = None) -> Tuple[Dict[str, Dict], Dict]:
+        """
+        Ejecuta emoción, sentimiento y GoEmotions.
+        En modo concurrente las tres llamadas salen a la vez y se espera a todas,
+        así la latencia es la de la llamada más lenta y no la suma.
+        Cada analyze_* ya captura sus errores y devuelve su respuesta por defecto,
+        por lo que los resultados son idénticos en ambos modos.
+        
+        Con deadline (time.monotonic()) solo se espera hasta ese instante: los análisis
+        que no terminaron se devuelven como futures pendientes y en su lugar va la
+        respuesta por defecto. En modo secuencial el deadline se ignora.
+        
+        Con cascada, GoEmotions espera a pysentimiento para decidir si se ejecuta.
         
-        self.headers = {"Authorization": f"Bearer {self.api_token}"}
+        Devuelve ({'emotion': ..., 'sentiment': ..., 'goemotions': ...}, {nombre: future pendiente})
+        """
+        if not self.concurrent:
+            emotion = self.analyze_emotion(text)
+            sentiment = self.analyze_sentiment(text)
+            if self.cascade:
+                goemotions = self._cascade_goemotions(text, emotion, sentiment)
+            else:
+                goemotions = self.analyze_goemotions(text)
+            return {'emotion': emotion, 'sentiment': sentiment, 'goemotions': goemotions}, {}
+        
+        executor = self._get_executor()
+        futures = {
+            'emotion': executor.submit(self.analyze_emotion, text),
+            'sentiment': executor.submit(self.analyze_sentiment, text),
+        }
+        if self.cascade:
+            # Se encola después de las dos de las que depende, así que nunca bloquea el pool
+            futures['goemotions'] = executor.submit(
+                lambda: self._cascade_goemotions(text, futures['emotion'].result(), futures['sentiment'].result())
+            )
+        else:
+            futures['goemotions'] = executor.submit(self.analyze_goemotions, text)
+        
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        done, _ = wait(futures.values(), timeout=timeout)
+        
+        defaults = {
+            'emotion': self._default_emotion_response,
+            'sentiment': self._default_sentiment_response,
+            'goemotions': self._default_goemotions_response,
+        }
+        results = {}
+        pending = {}
+        for name, future in futures.items():
+            if future in done:
+                results[name] = future.result()
+            else:
+                results[name] = defaults[name]()
+                pending[name] = future
+        return results, pending
+    
+    # ------------------------------------------------------------------
+    # Cascada pysentimiento → GoEmotions
+    # ------------------------------------------------------------------
+    @classmethod
+    def has_goemotions_cue(cls, text: str) -> bool:
+        """Pre-chequeo por palabras clave de gratitud/orgullo"""
+        normalized = unicodedata.normalize('NFKD', (text or '').lower())
+        normalized = ''.join(c for c in normalized if not unicodedata.combining(c))
+        return bool(cls.GOEMOTIONS_CUES.search(normalized))
+    
+    @classmethod
+    def should_run_goemotions(
+        cls,
+        text: str,
+        emotion: Dict,
+        sentiment: Dict,
+        min_confidence: Optional[float] = None,
+        min_negative_confidence: Optional[float] = None
+    ) -> Tuple[bool, str]:
+        """
+        Decide si vale la pena traducir y llamar a GoEmotions a partir de pysentimiento.
+        GoEmotions solo puede aportar gratitude/pride, que casi nunca aparecen en mensajes
+        claramente negativos ni cuando pysentimiento está seguro de una emoción distinta de joy.
+        
+        Devuelve (ejecutar, motivo).
+        """
+        if min_confidence is None:
+            min_confidence = getattr(settings, 'EMOTION_CASCADE_MIN_CONFIDENCE', 0.80)
+        if min_negative_confidence is None:
+            min_negative_confidence = getattr(settings, 'EMOTION_CASCADE_MIN_NEGATIVE_CONFIDENCE', 0.70)
+        
+        if cls.has_goemotions_cue(text):
+            return True, 'keyword_cue'
+        if emotion.get('is_fallback') or sentiment.get('is_fallback'):
+            return True, 'pysentimiento_fallback'
+        if sentiment.get('sentiment') == 'NEG' and sentiment.get('confidence', 0) >= min_negative_confidence:
+            return False, 'confident_negative'
+        
+        # Alegría con tono positivo es justo donde aparecen gratitud y orgullo
+        if emotion.get('dominant_emotion') == 'joy' and sentiment.get('sentiment') == 'POS':
+            return True, 'positive_joy'
+        if emotion.get('confidence', 0) >= min_confidence:
+            return False, 'confident_emotion'
+        return True, 'uncertain'
+    
+    def _cascade_goemotions(self, text: str, emotion: Dict, sentiment: Dict) -> Dict:
+        run, reason = self.should_run_goemotions(text, emotion, sentiment)
+        with self._cascade_lock:
+            counters = self._cascade_counters
+            counters['evaluated'] += 1
+            counters['ran' if run else 'skipped'] += 1
+            counters['reasons'][reason] = counters['reasons'].get(reason, 0) + 1
+        
+        if not run:
+            print(f"[GoEmotions] Omitido por la cascada ({reason})")
+            return self._skipped_goemotions_response(reason)
+        return self.analyze_goemotions(text)
+    
+    def cascade_stats(self) -> Dict:
+        with self._cascade_lock:
+            counters = dict(self._cascade_counters, reasons=dict(self._cascade_counters['reasons']))
+        evaluated = counters['evaluated']
+        return {
+            'enabled': self.cascade,
+            'skip_rate': round(counters['skipped'] / evaluated, 3) if evaluated else 0.0,
+            **counters,
+        }
+    
+    def _classify(self, endpoint: str, model_id: str, texts: List[str], timeout: float) -> List[List[Dict]]:
+        """Llama al backend a través del circuit breaker del endpoint"""
+        try:
+            return self.breakers[endpoint].call(self.backend.classify, model_id, texts, timeout=timeout)
+        except CircuitOpenError as e:
+            raise InferenceError(str(e))
     
     def _translate_to_english(self, text: str) -> str:
         """
         Traduce texto al inglés para GoEmotions
-        Usa Google Translate vía googletrans
+        Usa Google Translate vía googletrans (cliente único + caché, ver translation.py)
         """
-        try:
-            from googletrans import Translator
-            translator = Translator()
-            translated = translator.translate(text, src='es', dest='en')
-            print(f"[Traducción] ES: '{text[:50]}...' → EN: '{translated.text[:50]}...'")
-            return translated.text
-        except ImportError:
-            print("[ERROR] googletrans no instalado. Ejecuta: pip install googletrans==4.0.0-rc1")
-            return text
-        except Exception as e:
-            print(f"[ERROR] Traducción falló: {e}. Usando texto original.")
-            return text
+        return self.translator.translate(text)
     
-    def analyze_goemotions(self, text: str, retry=2) -> Dict:
+    def analyze_goemotions(self, text: str, retry: Optional[int] = None) -> Dict:
         """
         Analiza emociones con GoEmotions (27 emociones en inglés)
+        Los reintentos (503 modelo cargándose, errores de conexión) los hace el backend de
+        inferencia dentro del timeout de la llamada (HF_HTTP_RETRIES). `retry` se acepta por
+        compatibilidad con las llamadas anteriores y ya no tiene efecto.
         """
+        # Circuito abierto: ni siquiera se traduce
+        if self.breakers['goemotions'].is_open():
+            print("[GoEmotions] Circuito abierto, usando valores por defecto")
+            return self._default_goemotions_response()
+        
         try:
             # Traducir a inglés
             text_en = self._translate_to_english(text)
             
-            for attempt in range(retry):
-                try:
-                    response = requests.post(
-                        self.goemotions_model_url,
-                        headers=self.headers,
-                        json={"inputs": text_en},
-                        timeout=15
-                    )
-                    
-                    # Modelo cargándose
-                    if response.status_code == 503:
-                        print(f"[GoEmotions] Modelo cargándose, reintento {attempt + 1}/{retry}")
-                        if attempt < retry - 1:
-                            import time
-                            time.sleep(3)
-                            continue
-                        else:
-                            print("[GoEmotions] Modelo no disponible, usando valores por defecto")
-                            return self._default_goemotions_response()
-                    
-                    if response.status_code == 200:
-                        results = response.json()
-                        
-                        if isinstance(results, list) and len(results) > 0:
-                            emotions = results[0]
-                            
-                            # Separar emociones primarias y secundarias
-                            primary_emotions = {}
-                            secondary_emotions = {}
-                            
-                            for emotion in emotions:
-                                label = emotion['label']
-                                score = round(emotion['score'], 4)
-                                
-                                if label in self.GOEMOTIONS_PRIMARY:
-                                    primary_emotions[label] = score
-                                elif label in self.GOEMOTIONS_SECONDARY:
-                                    secondary_emotions[label] = score
-                            
-                            # Encontrar emoción dominante de las primarias
-                            dominant_primary = None
-                            if primary_emotions:
-                                dominant_primary = max(primary_emotions.items(), key=lambda x: x[1])
-                            
-                            print(f"[GoEmotions] Análisis exitoso. Primarias: {list(primary_emotions.keys())}, Secundarias: {len(secondary_emotions)}")
-                            
-                            return {
-                                'primary_emotions': primary_emotions,
-                                'secondary_emotions': secondary_emotions,
-                                'dominant_primary': dominant_primary,
-                                'all_emotions': {e['label']: round(e['score'], 4) for e in emotions}
-                            }
-                    
-                    print(f"[GoEmotions] Error {response.status_code}: {response.text[:100]}")
-                    
-                except requests.exceptions.Timeout:
-                    print(f"[GoEmotions] Timeout en intento {attempt + 1}/{retry}")
-                    if attempt < retry - 1:
-                        import time
-                        time.sleep(2)
-                        continue
+            try:
+                results = self._classify('goemotions', self.GOEMOTIONS_MODEL_ID, [text_en], timeout=15)
+            except InferenceError as e:
+                # Modelo cargándose incluso tras los reintentos
+                if e.status_code == 503:
+                    print("[GoEmotions] Modelo no disponible, usando valores por defecto")
+                else:
+                    print(f"[GoEmotions] {e}")
+                return self._default_goemotions_response()
             
-            return self._default_goemotions_response()
+            emotions = results[0]
+            
+            # Separar emociones primarias y secundarias
+            primary_emotions = {}
+            secondary_emotions = {}
+            
+            for emotion in emotions:
+                label = emotion['label']
+                score = round(emotion['score'], 4)
+                
+                if label in self.GOEMOTIONS_PRIMARY:
+                    primary_emotions[label] = score
+                elif label in self.GOEMOTIONS_SECONDARY:
+                    secondary_emotions[label] = score
+            
+            # Encontrar emoción dominante de las primarias
+            dominant_primary = None
+            if primary_emotions:
+                dominant_primary = max(primary_emotions.items(), key=lambda x: x[1])
+            
+            print(f"[GoEmotions] Análisis exitoso. Primarias: {list(primary_emotions.keys())}, Secundarias: {len(secondary_emotions)}")
+            
+            return {
+                'primary_emotions': primary_emotions,
+                'secondary_emotions': secondary_emotions,
+                'dominant_primary': dominant_primary,
+                'all_emotions': {e['label']: round(e['score'], 4) for e in emotions}
+            }
             
         except Exception as e:
             print(f"[GoEmotions] Error inesperado: {str(e)}")
@@ -138,31 +330,23 @@ class EmotionAnalyzer:
         }
         """
         try:
-            response = requests.post(
-                self.emotion_model_url,
-                headers=self.headers,
-                json={"inputs": text},
-                timeout=10
-            )
+            results = self._classify('emotion', self.EMOTION_MODEL_ID, [text], timeout=10)
             
-            if response.status_code == 200:
-                results = response.json()
+            emotions = results[0]
+            if emotions:
+                sorted_emotions = sorted(emotions, key=lambda x: x['score'], reverse=True)
+                dominant_emotion = sorted_emotions[0]['label']
                 
-                if isinstance(results, list) and len(results) > 0:
-                    emotions = results[0]
-                    sorted_emotions = sorted(emotions, key=lambda x: x['score'], reverse=True)
-                    dominant_emotion = sorted_emotions[0]['label']
-                    
-                    emotion_scores = {
-                        emotion['label']: round(emotion['score'], 4) 
-                        for emotion in emotions
-                    }
-                    
-                    return {
-                        'dominant_emotion': dominant_emotion,
-                        'emotions': emotion_scores,
-                        'confidence': round(sorted_emotions[0]['score'], 4)
-                    }
+                emotion_scores = {
+                    emotion['label']: round(emotion['score'], 4)
+                    for emotion in emotions
+                }
+                
+                return {
+                    'dominant_emotion': dominant_emotion,
+                    'emotions': emotion_scores,
+                    'confidence': round(sorted_emotions[0]['score'], 4)
+                }
             
             return self._default_emotion_response()
             
@@ -179,31 +363,23 @@ class EmotionAnalyzer:
         }
         """
         try:
-            response = requests.post(
-                self.sentiment_model_url,
-                headers=self.headers,
-                json={"inputs": text},
-                timeout=10
-            )
+            results = self._classify('sentiment', self.SENTIMENT_MODEL_ID, [text], timeout=10)
             
-            if response.status_code == 200:
-                results = response.json()
+            sentiments = results[0]
+            if sentiments:
+                sorted_sentiments = sorted(sentiments, key=lambda x: x['score'], reverse=True)
+                dominant_sentiment = sorted_sentiments[0]['label']
+                
+                sentiment_scores = {
+                    sent['label']: round(sent['score'], 4)
+                    for sent in sentiments
+                }
                 
-                if isinstance(results, list) and len(results) > 0:
-                    sentiments = results[0]
-                    sorted_sentiments = sorted(sentiments, key=lambda x: x['score'], reverse=True)
-                    dominant_sentiment = sorted_sentiments[0]['label']
-                    
-                    sentiment_scores = {
-                        sent['label']: round(sent['score'], 4)
-                        for sent in sentiments
-                    }
-                    
-                    return {
-                        'sentiment': dominant_sentiment,
-                        'scores': sentiment_scores,
-                        'confidence': round(sorted_sentiments[0]['score'], 4)
-                    }
+                return {
+                    'sentiment': dominant_sentiment,
+                    'scores': sentiment_scores,
+                    'confidence': round(sorted_sentiments[0]['score'], 4)
+                }
             
             return self._default_sentiment_response()
             
@@ -211,23 +387,63 @@ class EmotionAnalyzer:
             print(f"[Pysentimiento Sentiment] Error: {str(e)}")
             return self._default_sentiment_response()
     
-    def analyze_complete_hybrid(self, text: str) -> Dict:
+    def analyze_complete_hybrid(
+        self,
+        text: str,
+        deadline: Optional[float] = None,
+        on_complete: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
         """
         ANÁLISIS HÍBRIDO COMPLETO:
         1. Pysentimiento (7 emociones + sentimiento)
         2. GoEmotions (2 primarias + ~18 secundarias)
+           (1 y 2 se ejecutan en paralelo si EMOTION_ANALYSIS_CONCURRENT está activo)
         3. Determina emoción primaria global
+        
+        deadline: instante (time.monotonic()) hasta el que se espera a los modelos.
+        Si se agota, el resultado se arma con lo que haya terminado, los análisis faltantes
+        quedan listados en 'pending_analyses' y se terminan en segundo plano; al acabar se
+        cachea el resultado completo y se invoca on_complete(resultado_completo).
         """
         print(f"\n[HYBRID ANALYSIS] Iniciando análisis para: '{text[:50]}...'")
         
-        # 1. Análisis pysentimiento (existente)
-        print("[1/3] Analizando con Pysentimiento...")
-        pysentimiento_emotion = self.analyze_emotion(text)
-        pysentimiento_sentiment = self.analyze_sentiment(text)
+        cached = self.cache.get(text)
+        if cached is not None:
+            print("[HYBRID ANALYSIS] Resultado obtenido de la caché")
+            cached['text'] = text
+            return cached
+        
+        # 1-2. Pysentimiento (emoción + sentimiento) y GoEmotions
+        mode = "concurrente" if self.concurrent else "secuencial"
+        print(f"[1-2/3] Analizando con Pysentimiento y GoEmotions ({mode})...")
+        results, pending = self._run_hybrid_models(text, deadline=deadline)
+        
+        result = self._build_hybrid_result(text, results, pending=list(pending))
         
-        # 2. Análisis GoEmotions (nuevo)
-        print("[2/3] Analizando con GoEmotions...")
-        goemotions_result = self.analyze_goemotions(text)
+        if pending:
+            print(f"[HYBRID ANALYSIS] Presupuesto de latencia agotado, pendientes: {', '.join(pending)}")
+            self._finish_pending_analyses(text, results, pending, on_complete)
+        elif not result['used_fallback']:
+            self.cache.set(text, result)
+        
+        return result
+    
+    def pending_result(self, text: str) -> Dict:
+        """
+        Resultado provisional sin llamar a los modelos (análisis asíncrono, CHAT_ASYNC_ANALYSIS):
+        mismo formato que analyze_complete_hybrid con los tres análisis pendientes.
+        """
+        results = {
+            'emotion': self._default_emotion_response(),
+            'sentiment': self._default_sentiment_response(),
+            'goemotions': self._default_goemotions_response(),
+        }
+        return self._build_hybrid_result(text, results, pending=list(results))
+    
+    def _build_hybrid_result(self, text: str, results: Dict[str, Dict], pending: List[str] = None) -> Dict:
+        pysentimiento_emotion = results['emotion']
+        pysentimiento_sentiment = results['sentiment']
+        goemotions_result = results['goemotions']
         
         # 3. Determinar emoción primaria global
         print("[3/3] Determinando emoción primaria global...")
@@ -245,6 +461,12 @@ class EmotionAnalyzer:
         
         print(f"[RESULTADO] Primaria: {primary_emotion} ({primary_source}), Intensidad: {intensity}")
         
+        # Si algún modelo cayó en su respuesta por defecto el resultado no se cachea
+        used_fallback = any(
+            result.get('is_fallback')
+            for result in (pysentimiento_emotion, pysentimiento_sentiment, goemotions_result)
+        )
+        
         return {
             'text': text,
             
@@ -255,15 +477,61 @@ class EmotionAnalyzer:
             # Análisis GoEmotions (complementario)
             'goemotions_primary': goemotions_result.get('primary_emotions', {}),
             'goemotions_secondary': goemotions_result.get('secondary_emotions', {}),
+            'goemotions_skipped': bool(goemotions_result.get('skipped')),
             
             # Emoción primaria global
             'primary_emotion': primary_emotion,
             'primary_emotion_source': primary_source,
             
             # Intensidad
-            'intensity': intensity
+            'intensity': intensity,
+            
+            'used_fallback': used_fallback,
+            
+            # Análisis que no terminaron dentro del presupuesto de latencia
+            'pending_analyses': pending or []
         }
     
+    def _finish_pending_analyses(
+        self,
+        text: str,
+        results: Dict[str, Dict],
+        pending: Dict,
+        on_complete: Optional[Callable[[Dict], None]]
+    ):
+        """
+        Cuando terminan todos los futures pendientes arma el resultado completo,
+        lo cachea y llama a on_complete. El cierre siempre corre en un hilo del pool,
+        nunca en el hilo de la petición.
+        """
+        results = dict(results)
+        remaining = [len(pending)]
+        lock = threading.Lock()
+        
+        def _finalize():
+            full_result = self._build_hybrid_result(text, results)
+            if not full_result['used_fallback']:
+                self.cache.set(text, full_result)
+            if on_complete is not None:
+                try:
+                    on_complete(full_result)
+                except Exception as e:
+                    print(f"[HYBRID ANALYSIS] Error completando análisis diferido: {e}")
+        
+        def _on_done(name, future):
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"[HYBRID ANALYSIS] Análisis diferido '{name}' falló: {e}")
+            with lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                self._get_executor().submit(_finalize)
+        
+        for name, future in pending.items():
+            future.add_done_callback(lambda f, name=name: _on_done(name, f))
+    
     def requires_support_resources(self, analysis: Dict, recent_messages: list = None) -> Dict:
         """
         Determina si el estudiante necesita recursos de ayuda
@@ -340,25 +608,33 @@ class EmotionAnalyzer:
             'suggested_resources': suggested_resources
         }
     
-    def _determine_primary_emotion(self, pysentimiento_result, goemotions_result):
+    @classmethod
+    def select_primary_emotion(cls, pysentimiento_result, goemotions_result):
         """
         Determina cuál es la emoción primaria global
         Regla: Si GoEmotions detecta gratitude o pride con >70%, usarla
         Caso contrario: usar pysentimiento
         """
-        pysentimiento_emotion = pysentimiento_result.get('dominant_emotion')
         goemotions_primary = goemotions_result.get('dominant_primary')
         
         # Si GoEmotions detectó gratitude o pride con alta confianza
-        if goemotions_primary and goemotions_primary[1] > 0.70:
-            print(f"[PRIMARY] GoEmotions ganó: {goemotions_primary[0]} ({goemotions_primary[1]*100:.1f}%)")
+        if goemotions_primary and goemotions_primary[1] > cls.GOEMOTIONS_OVERRIDE_THRESHOLD:
             return goemotions_primary[0], 'goemotions'
         
         # Caso contrario, usar pysentimiento
-        print(f"[PRIMARY] Pysentimiento ganó: {pysentimiento_emotion}")
-        return pysentimiento_emotion, 'pysentimiento'
+        return pysentimiento_result.get('dominant_emotion'), 'pysentimiento'
+    
+    def _determine_primary_emotion(self, pysentimiento_result, goemotions_result):
+        emotion, source = self.select_primary_emotion(pysentimiento_result, goemotions_result)
+        if source == 'goemotions':
+            score = goemotions_result['dominant_primary'][1]
+            print(f"[PRIMARY] GoEmotions ganó: {emotion} ({score*100:.1f}%)")
+        else:
+            print(f"[PRIMARY] Pysentimiento ganó: {emotion}")
+        return emotion, source
     
-    def _calculate_hybrid_intensity(self, pys_conf, sent_conf, go_conf):
+    @staticmethod
+    def _calculate_hybrid_intensity(pys_conf, sent_conf, go_conf):
         """Calcula intensidad considerando ambos análisis"""
         avg_confidence = (pys_conf + sent_conf + go_conf) / 3
         
@@ -369,13 +645,25 @@ class EmotionAnalyzer:
         else:
             return "baja"
     
+    def _skipped_goemotions_response(self, reason: str) -> Dict:
+        """GoEmotions omitido por la cascada: no es un fallback, el resultado se puede cachear"""
+        return {
+            'primary_emotions': {},
+            'secondary_emotions': {},
+            'dominant_primary': None,
+            'all_emotions': {},
+            'skipped': True,
+            'skip_reason': reason
+        }
+    
     def _default_goemotions_response(self):
         """Respuesta por defecto cuando GoEmotions falla"""
         return {
             'primary_emotions': {},
             'secondary_emotions': {},
             'dominant_primary': None,
-            'all_emotions': {}
+            'all_emotions': {},
+            'is_fallback': True
         }
     
     def _default_emotion_response(self) -> Dict:
@@ -391,7 +679,8 @@ class EmotionAnalyzer:
                 'disgust': 0.0,
                 'others': 1.0
             },
-            'confidence': 0.0
+            'confidence': 0.0,
+            'is_fallback': True
         }
     
     def _default_sentiment_response(self) -> Dict:
@@ -403,7 +692,8 @@ class EmotionAnalyzer:
                 'NEG': 0.0,
                 'NEU': 1.0
             },
-            'confidence': 0.0
+            'confidence': 0.0,
+            'is_fallback': True
         }
 
 
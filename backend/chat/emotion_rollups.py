@@ -0,0 +1,232 @@
+# backend/chat/emotion_rollups.py
+"""
+Mantenimiento del resumen diario DailyEmotionRollup (estudiante, día).
+
+Cada mensaje del estudiante aporta al día de su timestamp (zona TIME_ZONE):
+- entries +1
+- si su análisis no está pendiente (analysis_status != 'pending'):
+  - analyzed +1 si tiene emoción primaria
+  - +1 en dominant_emotion_counts, primary_emotion_counts y sentiment_counts (si no son nulos)
+  - +1 en analyzed_sentiment_counts si tiene emoción primaria y sentimiento (las
+    recomendaciones por curso solo cuentan mensajes analizados)
+  - sus puntajes a las sumas *_score_sum
+Un mensaje pendiente tiene el resultado provisional (emoción heurística u 'others', NEU): solo
+cuenta en entries hasta que llega su análisis.
+
+Se actualiza dentro de la misma transacción que escribe el mensaje:
+- record_messages(): al insertar mensajes (ChatAPIView._save_user_message, seed)
+- update_analysis(): cuando el análisis llega después (diferido o cola); resta el aporte
+  anterior del mensaje y suma el nuevo, así un análisis repetido no cuenta doble
+La fila del día se bloquea con select_for_update mientras se modifica.
+
+Los mensajes borrados no se descuentan (hoy solo se borran con el usuario, y sus filas se van
+con él); `python manage.py rebuild_emotion_rollups` recalcula o repara el resumen desde Message.
+
+Ventanas "últimos N días": se mantiene la semántica de las consultas sobre Message
+(timestamp >= ahora - N días). Los días completos salen del resumen y el día del corte, que
+entra solo en parte, se cuenta desde Message (window_edge_messages).
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyEmotionRollup, Message
+
+LABEL_FIELDS = ('dominant_emotion', 'primary_emotion', 'sentiment')
+SCORE_FIELDS = (
+    'emotion_joy_score', 'emotion_sadness_score', 'emotion_anger_score', 'emotion_fear_score',
+    'emotion_disgust_score', 'emotion_surprise_score', 'emotion_others_score',
+    'emotion_gratitude_score', 'emotion_pride_score',
+    'sentiment_pos_score', 'sentiment_neg_score', 'sentiment_neu_score',
+)
+COUNT_FIELDS = (*(f'{field}_counts' for field in LABEL_FIELDS), 'analyzed_sentiment_counts')
+SUM_FIELDS = tuple(f'{field}_sum' for field in SCORE_FIELDS)
+VALUE_FIELDS = ('analysis_status', *LABEL_FIELDS, *SCORE_FIELDS)
+
+# Tolerancia al comparar sumas incrementales con las recalculadas
+SUM_TOLERANCE = 1e-6
+
+
+def rolling_window(days: int) -> Tuple[datetime, date]:
+    """
+    Ventana de los últimos `days` días desde ahora: (corte, día local del corte). Las filas del
+    resumen con day > día del corte entran completas; ese día se cuenta con window_edge_messages.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    return cutoff, timezone.localdate(cutoff)
+
+
+def window_edge_messages(student_ids: Iterable[int], cutoff: datetime):
+    """Mensajes de los estudiantes del día del corte enviados desde `cutoff`"""
+    return Message.objects.filter(
+        conversation__user_id__in=student_ids,
+        sender='user',
+        timestamp__gte=cutoff,
+        timestamp__date=timezone.localdate(cutoff),
+    )
+
+
+def _message_values(message: Message) -> Dict:
+    return {field: getattr(message, field) for field in VALUE_FIELDS}
+
+
+def _apply(student_id: int, day: date, old: Optional[Dict], new: Optional[Dict]):
+    """Resta el aporte `old` de un mensaje y suma `new` (cualquiera puede ser None)"""
+    rollup, _ = DailyEmotionRollup.objects.select_for_update().get_or_create(student_id=student_id, day=day)
+    for sign, values in ((-1, old), (1, new)):
+        if values is None:
+            continue
+        rollup.entries += sign
+        if values.get('analysis_status') == Message.ANALYSIS_PENDING:
+            continue
+        if values.get('primary_emotion') is not None:
+            rollup.analyzed += sign
+        for field in LABEL_FIELDS:
+            label = values.get(field)
+            if label is None:
+                continue
+            counts = getattr(rollup, f'{field}_counts')
+            counts[label] = counts.get(label, 0) + sign
+            if counts[label] <= 0:
+                del counts[label]
+        sentiment = values.get('sentiment')
+        if sentiment is not None and values.get('primary_emotion') is not None:
+            counts = rollup.analyzed_sentiment_counts
+            counts[sentiment] = counts.get(sentiment, 0) + sign
+            if counts[sentiment] <= 0:
+                del counts[sentiment]
+        for field in SCORE_FIELDS:
+            sum_field = f'{field}_sum'
+            setattr(rollup, sum_field, getattr(rollup, sum_field) + sign * (values.get(field) or 0.0))
+    rollup.save()
+
+
+def record_messages(messages: Iterable[Message]):
+    """Suma los mensajes recién insertados (los del bot se ignoran)"""
+    with transaction.atomic():
+        for message in messages:
+            if message.sender != 'user':
+                continue
+            _apply(
+                message.conversation.user_id,
+                timezone.localdate(message.timestamp),
+                None,
+                _message_values(message),
+            )
+
+
+def update_analysis(message_id: int, fields: Dict) -> int:
+    """
+    Guarda los campos de análisis de un mensaje y corrige el resumen de su día.
+    Devuelve las filas actualizadas (0 si el mensaje ya no existe).
+    """
+    with transaction.atomic():
+        current = (
+            Message.objects.select_for_update(of=('self',))
+            .filter(pk=message_id)
+            .values('sender', 'timestamp', 'conversation__user_id', *VALUE_FIELDS)
+            .first()
+        )
+        if current is None:
+            return 0
+        updated = Message.objects.filter(pk=message_id).update(**fields, analysis_updated_at=timezone.now())
+        if current['sender'] == 'user':
+            old = {field: current[field] for field in VALUE_FIELDS}
+            new = {field: fields.get(field, old[field]) for field in old}
+            _apply(current['conversation__user_id'], timezone.localdate(current['timestamp']), old, new)
+        return updated
+
+
+# ----------------------------------------------------------------------
+# Recalcular desde Message
+# ----------------------------------------------------------------------
+def compute_rollups(messages) -> Dict[Tuple[int, date], Dict]:
+    """
+    Valores del resumen calculados desde `messages` (un queryset de Message, también el
+    modelo histórico de una migración): {(student_id, día): campos}. Cinco consultas agrupadas.
+    Los mensajes con análisis pendiente solo cuentan en entries.
+    """
+    messages = messages.filter(sender='user').annotate(day=TruncDate('timestamp')).order_by()
+    not_pending = ~Q(analysis_status=Message.ANALYSIS_PENDING)
+    rollups = {}
+    for row in messages.values('conversation__user_id', 'day').annotate(
+        entries=Count('id'),
+        analyzed=Count('primary_emotion', filter=not_pending),
+        **{
+            f'{field}_sum': Coalesce(Sum(field, filter=not_pending), Value(0.0), output_field=FloatField())
+            for field in SCORE_FIELDS
+        },
+    ):
+        key = (row.pop('conversation__user_id'), row.pop('day'))
+        rollups[key] = {**row, **{field: {} for field in COUNT_FIELDS}}
+
+    messages = messages.filter(not_pending)
+    for field in LABEL_FIELDS:
+        for row in messages.filter(**{f'{field}__isnull': False}).values(
+            'conversation__user_id', 'day', field
+        ).annotate(count=Count('id')):
+            rollups[(row['conversation__user_id'], row['day'])][f'{field}_counts'][row[field]] = row['count']
+
+    for row in messages.filter(primary_emotion__isnull=False, sentiment__isnull=False).values(
+        'conversation__user_id', 'day', 'sentiment'
+    ).annotate(count=Count('id')):
+        rollups[(row['conversation__user_id'], row['day'])]['analyzed_sentiment_counts'][row['sentiment']] = row['count']
+    return rollups
+
+
+def _matches(rollup: DailyEmotionRollup, values: Dict) -> bool:
+    if rollup.entries != values['entries'] or rollup.analyzed != values['analyzed']:
+        return False
+    if any(getattr(rollup, field) != values[field] for field in COUNT_FIELDS):
+        return False
+    return all(abs(getattr(rollup, field) - values[field]) <= SUM_TOLERANCE for field in SUM_FIELDS)
+
+
+def rebuild(student_ids: Optional[Iterable[int]] = None, since: Optional[date] = None, dry_run: bool = False) -> Dict:
+    """
+    Compara el resumen con lo recalculado desde Message y corrige las diferencias
+    (crea, actualiza o borra filas). Con dry_run solo cuenta las diferencias.
+    """
+    messages = Message.objects.all()
+    rollups = DailyEmotionRollup.objects.all()
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        messages = messages.filter(conversation__user_id__in=student_ids)
+        rollups = rollups.filter(student_id__in=student_ids)
+    if since is not None:
+        messages = messages.filter(timestamp__date__gte=since)
+        rollups = rollups.filter(day__gte=since)
+
+    stats = Counter()
+    with transaction.atomic():
+        # Primero se bloquean las filas existentes: los turnos que lleguen mientras tanto esperan
+        current = {(rollup.student_id, rollup.day): rollup for rollup in rollups.select_for_update()}
+        expected = compute_rollups(messages)
+
+        to_create, to_update = [], []
+        for key, values in expected.items():
+            rollup = current.pop(key, None)
+            if rollup is None:
+                to_create.append(DailyEmotionRollup(student_id=key[0], day=key[1], **values))
+            elif not _matches(rollup, values):
+                for field, value in values.items():
+                    setattr(rollup, field, value)
+                rollup.updated_at = timezone.now()
+                to_update.append(rollup)
+            else:
+                stats['unchanged'] += 1
+        to_delete = [rollup.pk for rollup in current.values()]
+
+        stats.update(created=len(to_create), updated=len(to_update), deleted=len(to_delete))
+        if not dry_run:
+            DailyEmotionRollup.objects.bulk_create(to_create, batch_size=500)
+            DailyEmotionRollup.objects.bulk_update(
+                to_update, ['entries', 'analyzed', *COUNT_FIELDS, *SUM_FIELDS, 'updated_at'], batch_size=500
+            )
+            DailyEmotionRollup.objects.filter(pk__in=to_delete).delete()
+    return dict(stats)
@@ -0,0 +1,187 @@
+# backend/chat/idempotency.py
+"""
+Claves de idempotencia para POST /chat/ (cabecera Idempotency-Key).
+
+Con Wi-Fi inestable el cliente reintenta el mismo mensaje; sin clave cada reintento repite el
+análisis, la llamada a Gemini y guarda mensajes duplicados. Con clave:
+- El primer intento reserva la clave con cache.add (atómico en todos los backends de Django)
+  y la marca "en curso" por CHAT_IDEMPOTENCY_PENDING_TTL_SECONDS. Mientras el turno corre,
+  PendingRefresher renueva esa marca, así no expira a mitad de un turno lento; si el
+  proceso muere deja de renovarse y la clave se libera sola al vencer.
+- Al terminar guarda el estado y el cuerpo de la respuesta por CHAT_IDEMPOTENCY_TTL_SECONDS;
+  los reintentos reciben esa misma respuesta (cabecera Idempotent-Replayed: true).
+- Un duplicado que llega mientras el primero sigue en curso espera su resultado en lugar de
+  empezar otro turno. Si el primero falla la clave se libera y el duplicado lo reintenta.
+- Si el intento falla (429, 5xx, excepción) después de guardar el mensaje del estudiante, la
+  clave recuerda su id: el reintento usa ese mensaje en lugar de insertar otro.
+
+Las claves son por usuario y la petición se identifica con una huella de su cuerpo: reusar
+una clave con otro mensaje es un error del cliente (422).
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+STATE_PENDING = 'pending'
+STATE_DONE = 'done'
+
+# Longitud máxima de la clave que envía el cliente (un UUID son 36 caracteres)
+MAX_KEY_LENGTH = 255
+
+_counters = {
+    'claimed': 0,
+    'replayed': 0,
+    'waited': 0,
+    'wait_timeouts': 0,
+    'released': 0,
+    'pending_refreshes': 0,
+}
+_counters_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def _cache():
+    return caches[getattr(settings, 'CHAT_IDEMPOTENCY_CACHE_ALIAS', 'default')]
+
+
+def cache_key(user_id, idempotency_key: str) -> str:
+    digest = hashlib.sha256(idempotency_key.encode('utf-8')).hexdigest()
+    return f"chat-idempotency:{user_id}:{digest}"
+
+
+def fingerprint(data) -> str:
+    """Huella del cuerpo de la petición (texto y conversación)"""
+    payload = json.dumps(
+        {'text': data.get('text'), 'conversation_id': data.get('conversation_id')},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _pending_ttl() -> int:
+    return getattr(settings, 'CHAT_IDEMPOTENCY_PENDING_TTL_SECONDS', 60)
+
+
+def claim(key: str, request_fingerprint: str) -> bool:
+    """Reserva la clave para este intento; False si otro intento ya la tiene (en curso o terminada)"""
+    claimed = _cache().add(
+        key,
+        {'state': STATE_PENDING, 'fingerprint': request_fingerprint},
+        timeout=_pending_ttl(),
+    )
+    if claimed:
+        _count('claimed')
+    return claimed
+
+
+class PendingRefresher:
+    """
+    Renueva la marca "en curso" de `key` cada tercio de su TTL mientras dura el bloque with
+    (hilo en segundo plano). Se detiene si la clave desaparece.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='idempotency-refresh', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join(timeout=1)
+        return False
+
+    def _run(self):
+        ttl = _pending_ttl()
+        try:
+            while not self._stop.wait(ttl / 3):
+                if not _cache().touch(self.key, timeout=ttl):
+                    return
+                _count('pending_refreshes')
+        except Exception as exc:
+            print(f"[IDEMPOTENCY] No se pudo renovar la marca en curso: {exc}")
+        finally:
+            close_old_connections()
+
+
+def _message_key(key: str) -> str:
+    return f"{key}:user-message"
+
+
+def saved_message_id(key: str) -> Optional[int]:
+    """Id del mensaje del estudiante que guardó un intento anterior con esta clave, si lo hay"""
+    return _cache().get(_message_key(key))
+
+
+def store(key: str, request_fingerprint: str, status_code: int, data):
+    """Guarda la respuesta terminada para los reintentos"""
+    _cache().delete(_message_key(key))
+    _cache().set(
+        key,
+        {
+            'state': STATE_DONE,
+            'fingerprint': request_fingerprint,
+            'status': status_code,
+            'data': data,
+        },
+        timeout=getattr(settings, 'CHAT_IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60),
+    )
+
+
+def release(key: str, user_message_id: Optional[int] = None):
+    """
+    El intento falló sin respuesta guardable: libera la clave para que un reintento la use.
+    user_message_id: el mensaje del estudiante que el intento alcanzó a guardar.
+    """
+    if user_message_id is not None:
+        _cache().set(
+            _message_key(key),
+            user_message_id,
+            timeout=getattr(settings, 'CHAT_IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60),
+        )
+    _cache().delete(key)
+    _count('released')
+
+
+def wait_for_result(key: str, request_fingerprint: str, max_wait: float) -> Optional[Dict]:
+    """
+    Espera a que el intento en curso termine. Devuelve None si la clave quedó libre (el intento
+    falló o expiró); si no, la entrada: terminada, en curso (se agotó la espera) o de otra
+    petición (huella distinta, sin esperar).
+    """
+    deadline = time.monotonic() + max_wait
+    waited = False
+    while True:
+        entry = _cache().get(key)
+        if entry is not None and entry['fingerprint'] != request_fingerprint:
+            return entry
+        if entry is None or entry['state'] == STATE_DONE:
+            if waited:
+                _count('waited')
+            if entry is not None:
+                _count('replayed')
+            return entry
+        if time.monotonic() >= deadline:
+            _count('wait_timeouts')
+            return entry
+        waited = True
+        time.sleep(0.1)
+
+
+def idempotency_stats() -> Dict:
+    with _counters_lock:
+        return dict(_counters)
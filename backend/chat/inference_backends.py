@@ -0,0 +1,288 @@
+# backend/chat/inference_backends.py
+"""
+Backends de inferencia para los clasificadores de emoción/sentimiento.
+
+Todos devuelven el mismo formato que la API de inferencia de Hugging Face:
+una lista (una entrada por texto) de listas [{'label': str, 'score': float}, ...],
+de modo que EmotionAnalyzer interpreta igual los resultados sin importar el backend.
+
+- HuggingFaceAPIBackend: API remota (sesión keep-alive con reintentos dentro del timeout).
+- LocalTransformersBackend: motor en proceso (CPU) con transformers u ONNX Runtime.
+  Carga cada modelo una vez por worker y procesa por lotes los textos de cada llamada
+  (no junta los de peticiones concurrentes).
+- FakeInferenceBackend: puntajes deterministas sin red ni modelos, para pruebas de carga.
+
+Se selecciona con EMOTION_INFERENCE_BACKEND ('huggingface_api' | 'local' | 'fake').
+"""
+import hashlib
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class InferenceError(Exception):
+    """Fallo de inferencia; EmotionAnalyzer lo convierte en su respuesta por defecto."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class InferenceBackend:
+    name = 'base'
+
+    def classify(self, model_id: str, texts: List[str], timeout: float = 10) -> List[List[Dict]]:
+        raise NotImplementedError
+
+    def warm_up(self, model_ids: List[str]):
+        """Prepara el backend antes del primer mensaje (opcional)."""
+
+
+class HuggingFaceAPIBackend(InferenceBackend):
+    name = 'huggingface_api'
+
+    # Códigos HTTP que se reintentan (503 = modelo cargándose)
+    RETRY_STATUS_CODES = (502, 503, 504)
+    # No se empieza un reintento si queda menos que esto del timeout
+    MIN_ATTEMPT_SECONDS = 0.5
+
+    def __init__(self, api_token: Optional[str]):
+        self.base_url = getattr(settings, 'HF_INFERENCE_BASE_URL', 'https://api-inference.huggingface.co').rstrip('/')
+        self.headers = {"Authorization": f"Bearer {api_token}"}
+        self.max_retries = getattr(settings, 'HF_HTTP_RETRIES', 2)
+        self.backoff_factor = getattr(settings, 'HF_HTTP_BACKOFF_FACTOR', 1.5)
+        self.connect_timeout = getattr(settings, 'HF_HTTP_CONNECT_TIMEOUT_SECONDS', 3.05)
+        # Sesión HTTP de larga vida (una por worker): pool keep-alive
+        self.session = self._build_session()
+
+    def model_url(self, model_id: str) -> str:
+        return f"{self.base_url}/models/{model_id}"
+
+    def _build_session(self) -> requests.Session:
+        """
+        Crea la sesión HTTP reutilizable hacia la API de inferencia: pool de conexiones
+        keep-alive (se evita un handshake TLS por llamada). Los reintentos no van en el
+        adaptador sino en classify(), para que todos juntos respeten el timeout de la llamada.
+        """
+        adapter = HTTPAdapter(
+            pool_connections=getattr(settings, 'HF_HTTP_POOL_CONNECTIONS', 2),
+            pool_maxsize=getattr(settings, 'HF_HTTP_POOL_MAXSIZE', 10),
+            max_retries=0,
+        )
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(self.headers)
+        session.headers['Connection'] = 'keep-alive'
+        return session
+
+    def classify(self, model_id: str, texts: List[str], timeout: float = 10) -> List[List[Dict]]:
+        """
+        `timeout` es el tiempo total de la llamada, reintentos incluidos: cada intento usa lo
+        que queda y no se reintenta si no alcanza para otro intento más el backoff.
+        Se reintentan los errores de conexión (la petición no llegó a enviarse) y 502/503/504;
+        un timeout de lectura no se reintenta porque ya consumió el tiempo disponible.
+        """
+        inputs = texts[0] if len(texts) == 1 else texts
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            retry_after = None
+            try:
+                response = self.session.post(
+                    self.model_url(model_id),
+                    json={"inputs": inputs},
+                    timeout=(min(self.connect_timeout, remaining), remaining)
+                )
+            except requests.exceptions.ConnectionError as e:
+                error = InferenceError(f"Error de conexión: {e}")
+            except requests.exceptions.RequestException as e:
+                raise InferenceError(f"Error de red: {e}")
+            else:
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    break
+                error = InferenceError(
+                    "Modelo cargándose (503)" if response.status_code == 503 else f"Error {response.status_code}",
+                    status_code=response.status_code
+                )
+                retry_after = response.headers.get('Retry-After')
+
+            delay = self._backoff(attempt, retry_after)
+            attempt += 1
+            if attempt > self.max_retries or time.monotonic() + delay + self.MIN_ATTEMPT_SECONDS > deadline:
+                raise error
+            print(f"[HF] {error}, reintento {attempt}/{self.max_retries} en {delay:.1f}s")
+            time.sleep(delay)
+
+        if response.status_code != 200:
+            raise InferenceError(f"Error {response.status_code}: {response.text[:100]}", status_code=response.status_code)
+
+        results = response.json()
+        if not isinstance(results, list) or len(results) < len(texts):
+            raise InferenceError(f"Respuesta inesperada: {str(results)[:100]}", status_code=response.status_code)
+        return results
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Espera antes del siguiente intento: Retry-After si viene, si no backoff exponencial"""
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_factor * (2 ** attempt)
+
+    def warm_up(self, model_ids: List[str]):
+        """
+        Abre por adelantado conexiones del pool (DNS + TCP + TLS) para que
+        el primer mensaje del worker no pague el handshake.
+        """
+        connections = max(1, getattr(settings, 'HF_HTTP_WARMUP_CONNECTIONS', 3))
+
+        def _open_connection():
+            try:
+                self.session.head(self.base_url, timeout=5)
+            except requests.exceptions.RequestException as e:
+                print(f"[HF Warm-up] No se pudo abrir conexión: {e}")
+
+        # En paralelo, para que queden varias conexiones vivas en el pool
+        threads = [threading.Thread(target=_open_connection) for _ in range(connections)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(f"[HF Warm-up] {connections} conexión(es) precalentadas hacia {self.base_url}")
+
+
+class LocalTransformersBackend(InferenceBackend):
+    """
+    Inferencia en proceso sobre CPU.
+
+    EMOTION_LOCAL_MODEL_PATHS permite mapear cada id de modelo a un directorio local
+    (por ejemplo una exportación ONNX o un modelo stub pequeño para pruebas sin red).
+    Con EMOTION_LOCAL_USE_ONNX=True se usa optimum + onnxruntime si están instalados.
+    """
+    name = 'local'
+
+    def __init__(self):
+        from transformers import pipeline  # noqa: F401 - falla aquí si no está instalado
+
+        self.model_paths = getattr(settings, 'EMOTION_LOCAL_MODEL_PATHS', {}) or {}
+        self.use_onnx = getattr(settings, 'EMOTION_LOCAL_USE_ONNX', False)
+        self.batch_size = getattr(settings, 'EMOTION_LOCAL_BATCH_SIZE', 16)
+        self._pipelines = {}
+        self._lock = threading.Lock()
+
+    def _get_pipeline(self, model_id: str):
+        """Carga el modelo una sola vez por worker"""
+        if model_id not in self._pipelines:
+            with self._lock:
+                if model_id not in self._pipelines:
+                    self._pipelines[model_id] = self._load_pipeline(model_id)
+        return self._pipelines[model_id]
+
+    def _load_pipeline(self, model_id: str):
+        from transformers import AutoTokenizer, pipeline
+
+        path = self.model_paths.get(model_id, model_id)
+        tokenizer = AutoTokenizer.from_pretrained(path)
+        model = path
+
+        if self.use_onnx:
+            try:
+                from optimum.onnxruntime import ORTModelForSequenceClassification
+                model = ORTModelForSequenceClassification.from_pretrained(path, export=not self._is_onnx_export(path))
+            except ImportError:
+                print("[Inference] optimum[onnxruntime] no instalado, usando PyTorch")
+
+        print(f"[Inference] Cargando modelo local {model_id} desde {path}")
+        return pipeline(
+            'text-classification',
+            model=model,
+            tokenizer=tokenizer,
+            top_k=None,
+            device=-1,
+            truncation=True,
+        )
+
+    @staticmethod
+    def _is_onnx_export(path: str) -> bool:
+        return os.path.isdir(path) and any(name.endswith('.onnx') for name in os.listdir(path))
+
+    def classify(self, model_id: str, texts: List[str], timeout: float = 10) -> List[List[Dict]]:
+        try:
+            classifier = self._get_pipeline(model_id)
+            results = classifier(list(texts), batch_size=self.batch_size)
+        except Exception as e:
+            raise InferenceError(f"Inferencia local falló ({model_id}): {e}")
+        return [
+            [{'label': item['label'], 'score': float(item['score'])} for item in result]
+            for result in results
+        ]
+
+    def warm_up(self, model_ids: List[str]):
+        for model_id in model_ids:
+            try:
+                self._get_pipeline(model_id)
+            except Exception as e:
+                print(f"[Inference] No se pudo precargar {model_id}: {e}")
+
+
+class FakeInferenceBackend(InferenceBackend):
+    """
+    Clasificador falso para pruebas de carga sin red (ver `python manage.py load_test_chat`).
+    Los puntajes salen de un hash del texto: el mismo texto da siempre el mismo resultado.
+    """
+    name = 'fake'
+
+    LABELS = {
+        'finiteautomata/beto-emotion-analysis': ['joy', 'sadness', 'anger', 'fear', 'disgust', 'surprise', 'others'],
+        'finiteautomata/beto-sentiment-analysis': ['POS', 'NEG', 'NEU'],
+    }
+    GOEMOTIONS_LABELS = [
+        'admiration', 'amusement', 'anger', 'annoyance', 'approval', 'caring', 'confusion',
+        'curiosity', 'desire', 'disappointment', 'disapproval', 'disgust', 'embarrassment',
+        'excitement', 'fear', 'gratitude', 'grief', 'joy', 'love', 'nervousness', 'optimism',
+        'pride', 'realization', 'relief', 'remorse', 'sadness', 'surprise', 'neutral',
+    ]
+
+    def __init__(self):
+        self.latency_seconds = getattr(settings, 'EMOTION_FAKE_LATENCY_SECONDS', 0.05)
+
+    def classify(self, model_id: str, texts: List[str], timeout: float = 10) -> List[List[Dict]]:
+        time.sleep(min(self.latency_seconds, timeout))
+        return [self._scores(model_id, text) for text in texts]
+
+    def _scores(self, model_id: str, text: str) -> List[Dict]:
+        labels = self.LABELS.get(model_id, self.GOEMOTIONS_LABELS)
+        seed = int(hashlib.sha1(f"{model_id}:{text}".encode('utf-8')).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        # Potencia alta: una etiqueta suele destacar, como en los modelos reales
+        raw = [rng.random() ** 4 for _ in labels]
+        total = sum(raw) or 1.0
+        scores = [{'label': label, 'score': value / total} for label, value in zip(labels, raw)]
+        return sorted(scores, key=lambda item: item['score'], reverse=True)
+
+
+def get_inference_backend(api_token: Optional[str]) -> InferenceBackend:
+    """Instancia el backend configurado en EMOTION_INFERENCE_BACKEND"""
+    backend_name = getattr(settings, 'EMOTION_INFERENCE_BACKEND', 'huggingface_api')
+
+    if backend_name == 'fake':
+        return FakeInferenceBackend()
+
+    if backend_name == 'local':
+        try:
+            return LocalTransformersBackend()
+        except ImportError:
+            print("[WARNING] transformers no instalado - usando la API de Hugging Face")
+
+    elif backend_name != 'huggingface_api':
+        print(f"[WARNING] Backend de inferencia desconocido '{backend_name}' - usando la API de Hugging Face")
+
+    return HuggingFaceAPIBackend(api_token)
+
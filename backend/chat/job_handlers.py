@@ -0,0 +1,184 @@
+# backend/chat/job_handlers.py
+"""
+Manejadores de los trabajos de la cola persistente (chat.job_queue).
+Se ejecutan en el proceso de `python manage.py process_analysis_jobs`.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import conversation_context, emotion_rollups, llm_client
+from .job_queue import register_handler
+from .message_analysis import message_fields_from_analysis, resolve_hybrid_analysis
+from .models import AnalysisJob, Conversation, Message
+from .prompt_budget import truncate_to_tokens
+
+# Mensajes que se incorporan al resumen por trabajo (el resto queda para el siguiente)
+SUMMARY_MAX_MESSAGES = 40
+
+# Las instrucciones fijas van como system_instruction (prompts.CONVERSATION_SUMMARY_SYSTEM_INSTRUCTION)
+SUMMARY_PROMPT = """RESUMEN ANTERIOR:
+{previous}
+
+MENSAJES NUEVOS:
+{messages}
+
+Escribe el resumen actualizado en máximo {max_words} palabras."""
+
+
+class RetryableJobError(Exception):
+    """El trabajo no pudo completarse del todo y conviene reintentarlo más tarde."""
+
+
+@register_handler(AnalysisJob.KIND_MESSAGE_ANALYSIS)
+def analyze_message(job: AnalysisJob):
+    """
+    Análisis híbrido de un mensaje guardado en modo asíncrono (CHAT_ASYNC_ANALYSIS)
+    y, si corresponde, generación de recursos de apoyo.
+    """
+    # Los singletons (analizador, generador de recursos) viven en views
+    from .emotion_analyzer import EMOTION_MAPPING, SENTIMENT_MAPPING
+    from .views import SUPPORT_ENABLED, emotion_analyzer, support_generator
+
+    message = job.message
+    if message is None:
+        return
+
+    hf_analysis = emotion_analyzer.analyze_complete_hybrid(message.text)
+
+    # Si algún modelo cayó en su fallback se reintenta; en el último intento se guarda lo que haya
+    if hf_analysis['used_fallback'] and job.attempts < job.max_attempts:
+        raise RetryableJobError("El análisis usó respuestas por defecto (modelo no disponible)")
+
+    resolved = resolve_hybrid_analysis(message.text, hf_analysis)
+    emotion_rollups.update_analysis(message.pk, message_fields_from_analysis(resolved))
+    Conversation.touch(message.conversation_id)
+    print(f"[QUEUE] Mensaje {message.pk} analizado: {resolved['primary_emotion']} ({resolved['primary_emotion_source']})")
+
+    if not SUPPORT_ENABLED or message.support_resources_offered:
+        return
+    if not support_generator.requires_support(hf_analysis):
+        return
+
+    print("[SUPPORT] Se detectaron emociones negativas intensas, generando recursos...")
+    support_resources_raw = support_generator.generate_support_resources(
+        text=message.text,
+        emotion=EMOTION_MAPPING.get(resolved['primary_emotion'], resolved['primary_emotion']),
+        intensity=resolved['intensity'],
+        sentiment=SENTIMENT_MAPPING.get(resolved['sentiment'], resolved['sentiment']),
+        timeout=support_generator.timeout
+    )
+    Message.objects.filter(pk=message.pk).update(
+        support_resources_offered=True,
+        support_resources=support_resources_raw
+    )
+    Conversation.touch(message.conversation_id)
+    print("[SUPPORT] Recursos generados y guardados")
+
+
+@register_handler(AnalysisJob.KIND_CHAT_REPLY)
+def generate_chat_reply(job: AnalysisJob):
+    """
+    Respuesta del chat en modo asíncrono (CHAT_ASYNC_ANALYSIS): arma el prompt con el contexto
+    que leyó la petición y el análisis del modelo, genera y guarda el mensaje del bot. El id queda
+    en el payload del trabajo, que es lo que consulta GET messages/<id>/analysis/; si el trabajo
+    se repite tras guardarlo no hace nada.
+
+    Si Gemini falla el trabajo se reintenta con backoff; solo en el último intento se guarda la
+    respuesta de respaldo. Sin cupo (LLMAdmissionRejected) también se reintenta y, agotados los
+    intentos, el trabajo queda fallido (reply_status 'failed').
+    """
+    from .llm_admission import acquire_slot
+    from .views import ChatAPIView
+
+    message = job.message
+    if message is None or job.payload.get('bot_message_id'):
+        return
+
+    # Trabajos encolados antes de armar el prompt en el worker traen el prompt hecho
+    prompt = job.payload.get('prompt') or _reply_prompt(message, job.payload['context'])
+    with acquire_slot(llm_client.PURPOSE_CHAT, user_id=message.conversation.user_id):
+        try:
+            bot_text = llm_client.generate(llm_client.PURPOSE_CHAT, prompt).text
+        except Exception as e:
+            if job.attempts < job.max_attempts:
+                raise
+            print(f"[QUEUE] Gemini falló en el último intento ({e}), se guarda la respuesta de respaldo")
+            bot_text = ChatAPIView.GEMINI_FALLBACK_TEXT
+
+    bot_message = Message(conversation_id=message.conversation_id, text=bot_text, sender='bot')
+    with transaction.atomic():
+        bot_message.save()
+        Conversation.register_messages(message.conversation_id, [bot_message])
+        AnalysisJob.objects.filter(pk=job.pk).update(payload={**job.payload, 'bot_message_id': bot_message.pk})
+        transaction.on_commit(lambda: ChatAPIView.update_context(
+            message.conversation_id, job.payload.get('context_last_message_id'), [message, bot_message]
+        ))
+    print(f"[QUEUE] Respuesta {bot_message.pk} generada para el mensaje {message.pk}")
+
+
+def _reply_prompt(message: Message, context) -> str:
+    """
+    Prompt de la respuesta asíncrona con el análisis de los modelos, no el provisional con el que
+    se guardó el mensaje. Si el trabajo de análisis todavía no corrió se analiza aquí; el
+    resultado queda en la caché del analizador y ese trabajo no vuelve a llamar a los modelos.
+    """
+    from .emotion_analyzer import EMOTION_MAPPING, SENTIMENT_MAPPING
+    from .views import ChatAPIView, emotion_analyzer
+
+    if message.analysis_status == Message.ANALYSIS_PENDING:
+        resolved = resolve_hybrid_analysis(message.text, emotion_analyzer.analyze_complete_hybrid(message.text))
+        emotion, sentiment = resolved['primary_emotion'], resolved['sentiment']
+    else:
+        emotion, sentiment = message.primary_emotion, message.sentiment
+    return ChatAPIView()._build_context_prompt(
+        context=context,
+        current_text=message.text,
+        emotion_es=EMOTION_MAPPING.get(emotion, emotion),
+        sentiment_es=SENTIMENT_MAPPING.get(sentiment, sentiment),
+    )
+
+
+@register_handler(AnalysisJob.KIND_CONVERSATION_SUMMARY)
+def summarize_conversation(job: AnalysisJob):
+    """
+    Incorpora al resumen de la conversación los mensajes que ya salieron de la ventana del
+    prompt (conversation_context.MAX_TURNS), de forma incremental: resumen anterior + nuevos.
+    """
+    from .llm_admission import acquire_slot
+
+    conversation = Conversation.objects.filter(pk=job.payload.get('conversation_id')).first()
+    if conversation is None:
+        return
+
+    window_ids = list(
+        conversation.messages.order_by('-timestamp', '-id').values_list('id', flat=True)[:conversation_context.MAX_TURNS]
+    )
+    pending = conversation.messages.exclude(id__in=window_ids)
+    if conversation.summary_through_message_id is not None:
+        pending = pending.filter(id__gt=conversation.summary_through_message_id)
+    batch = list(pending.order_by('timestamp', 'id').values('id', 'sender', 'text')[:SUMMARY_MAX_MESSAGES])
+    if not batch:
+        return
+
+    max_tokens = getattr(settings, 'CHAT_SUMMARY_MAX_TOKENS', 200)
+    message_tokens = getattr(settings, 'CHAT_PROMPT_MAX_MESSAGE_TOKENS', 150)
+    lines = [
+        f"{'Estudiante' if m['sender'] == 'user' else 'Asistente'}: {truncate_to_tokens(m['text'], message_tokens)}"
+        for m in batch
+    ]
+    prompt = SUMMARY_PROMPT.format(
+        previous=conversation.summary or 'Sin resumen previo.',
+        messages='\n'.join(lines),
+        max_words=int(max_tokens * 0.6),
+    )
+
+    # Si no hay cupo se lanza LLMAdmissionRejected y el trabajo se reintenta con backoff
+    with acquire_slot(llm_client.PURPOSE_CONVERSATION_SUMMARY):
+        response = llm_client.generate(llm_client.PURPOSE_CONVERSATION_SUMMARY, prompt)
+    summary = truncate_to_tokens((response.text or '').strip(), max_tokens)
+    if not summary:
+        raise RetryableJobError("Gemini devolvió un resumen vacío")
+
+    through_id = batch[-1]['id']
+    Conversation.objects.filter(pk=conversation.pk).update(summary=summary, summary_through_message_id=through_id)
+    print(f"[SUMMARY] Conversación {conversation.pk}: {len(batch)} mensajes incorporados al resumen")
@@ -0,0 +1,181 @@
+# backend/chat/job_queue.py
+"""
+Cola de trabajos persistente sobre la base de datos (tabla AnalysisJob), sin broker externo.
+
+- enqueue(): se llama desde la petición; solo inserta una fila.
+- claim_jobs(): el worker toma trabajos con SELECT ... FOR UPDATE SKIP LOCKED, de modo que
+  varios workers pueden drenar la cola a la vez sin pisarse.
+- Visibilidad: un trabajo tomado queda bloqueado hasta locked_until; si el worker muere,
+  al vencer ese plazo otro worker lo retoma.
+- Reintentos: fail() lo devuelve a la cola con backoff exponencial hasta max_attempts.
+
+Los manejadores de cada tipo de trabajo se registran en JOB_HANDLERS (ver chat.job_handlers).
+"""
+import os
+import socket
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Min, Q
+from django.utils import timezone
+
+from .models import AnalysisJob, Message
+
+# kind -> callable(job); se completa al importar chat.job_handlers
+JOB_HANDLERS: Dict[str, Callable[[AnalysisJob], None]] = {}
+
+
+def register_handler(kind: str):
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(kind: str, message: Optional[Message] = None, payload: Optional[Dict] = None, delay_seconds: float = 0) -> AnalysisJob:
+    """Encola un trabajo; si hay una transacción abierta se confirma con ella."""
+    return AnalysisJob.objects.create(
+        kind=kind,
+        message=message,
+        payload=payload or {},
+        max_attempts=getattr(settings, 'ANALYSIS_QUEUE_MAX_ATTEMPTS', 3),
+        available_at=timezone.now() + timedelta(seconds=delay_seconds),
+    )
+
+
+def claim_jobs(worker_id: str, batch_size: int = 1) -> List[AnalysisJob]:
+    """
+    Toma hasta batch_size trabajos disponibles: en cola y listos, o en proceso con la
+    visibilidad vencida (worker caído).
+    """
+    now = timezone.now()
+    visibility = getattr(settings, 'ANALYSIS_QUEUE_VISIBILITY_TIMEOUT_SECONDS', 120)
+
+    with transaction.atomic():
+        candidates = list(
+            AnalysisJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=AnalysisJob.STATUS_QUEUED, available_at__lte=now) |
+                Q(status=AnalysisJob.STATUS_RUNNING, locked_until__lt=now)
+            )
+            .order_by('available_at', 'id')[:batch_size]
+        )
+
+        claimed = []
+        for job in candidates:
+            if job.status == AnalysisJob.STATUS_RUNNING and job.attempts >= job.max_attempts:
+                # Murió el worker en el último intento: no se vuelve a intentar
+                _mark_failed(job, job.last_error or 'Visibilidad vencida en el último intento', now)
+                continue
+
+            # Update condicionado: en bases sin FOR UPDATE (SQLite) evita que dos workers tomen el mismo trabajo
+            updated = AnalysisJob.objects.filter(
+                pk=job.pk, status=job.status, attempts=job.attempts
+            ).update(
+                status=AnalysisJob.STATUS_RUNNING,
+                attempts=F('attempts') + 1,
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=visibility),
+                started_at=now,
+            )
+            if updated:
+                job.refresh_from_db()
+                claimed.append(job)
+    return claimed
+
+
+def complete(job: AnalysisJob):
+    AnalysisJob.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status=AnalysisJob.STATUS_DONE,
+        locked_until=None,
+        finished_at=timezone.now(),
+        last_error='',
+    )
+
+
+def fail(job: AnalysisJob, error: str):
+    """Vuelve a encolar con backoff exponencial o lo marca como fallido."""
+    now = timezone.now()
+    if job.attempts >= job.max_attempts:
+        _mark_failed(job, error, now)
+        print(f"[QUEUE] Trabajo {job.pk} fallido definitivamente: {error}")
+        return
+
+    backoff = getattr(settings, 'ANALYSIS_QUEUE_RETRY_BACKOFF_SECONDS', 10) * (2 ** (job.attempts - 1))
+    AnalysisJob.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status=AnalysisJob.STATUS_QUEUED,
+        locked_until=None,
+        available_at=now + timedelta(seconds=backoff),
+        last_error=error[:2000],
+    )
+    print(f"[QUEUE] Trabajo {job.pk} reintentará en {backoff:.0f}s (intento {job.attempts}/{job.max_attempts}): {error}")
+
+
+def _mark_failed(job: AnalysisJob, error: str, now):
+    AnalysisJob.objects.filter(pk=job.pk).update(
+        status=AnalysisJob.STATUS_FAILED,
+        locked_until=None,
+        finished_at=now,
+        last_error=error[:2000],
+    )
+
+
+def run_job(job: AnalysisJob) -> bool:
+    """Ejecuta el manejador del trabajo; devuelve True si terminó bien."""
+    handler = JOB_HANDLERS.get(job.kind)
+    if handler is None:
+        _mark_failed(job, f"Sin manejador para '{job.kind}'", timezone.now())
+        return False
+    try:
+        handler(job)
+    except Exception as e:
+        fail(job, f"{type(e).__name__}: {e}")
+        return False
+    complete(job)
+    return True
+
+
+def queue_stats() -> Dict:
+    """Profundidad, antigüedad y rendimiento de la cola (compartido por todos los workers)."""
+    now = timezone.now()
+    by_status = dict(
+        AnalysisJob.objects.values_list('status').annotate(total=Count('id')).values_list('status', 'total')
+    )
+    oldest_queued = AnalysisJob.objects.filter(
+        status=AnalysisJob.STATUS_QUEUED, available_at__lte=now
+    ).aggregate(oldest=Min('available_at'))['oldest']
+
+    last_hour = AnalysisJob.objects.filter(finished_at__gte=now - timedelta(hours=1))
+    finished = last_hour.aggregate(
+        done=Count('id', filter=Q(status=AnalysisJob.STATUS_DONE)),
+        failed=Count('id', filter=Q(status=AnalysisJob.STATUS_FAILED)),
+        avg_run=Avg(ExpressionWrapper(F('finished_at') - F('started_at'), output_field=DurationField()),
+                    filter=Q(status=AnalysisJob.STATUS_DONE)),
+        avg_latency=Avg(ExpressionWrapper(F('finished_at') - F('created_at'), output_field=DurationField()),
+                        filter=Q(status=AnalysisJob.STATUS_DONE)),
+    )
+    done_last_5min = AnalysisJob.objects.filter(
+        status=AnalysisJob.STATUS_DONE, finished_at__gte=now - timedelta(minutes=5)
+    ).count()
+
+    return {
+        'queued': by_status.get(AnalysisJob.STATUS_QUEUED, 0),
+        'running': by_status.get(AnalysisJob.STATUS_RUNNING, 0),
+        'done': by_status.get(AnalysisJob.STATUS_DONE, 0),
+        'failed': by_status.get(AnalysisJob.STATUS_FAILED, 0),
+        'oldest_queued_seconds': round((now - oldest_queued).total_seconds(), 1) if oldest_queued else 0.0,
+        'done_last_hour': finished['done'],
+        'failed_last_hour': finished['failed'],
+        'throughput_per_minute_5m': round(done_last_5min / 5, 2),
+        'avg_run_seconds_last_hour': round(finished['avg_run'].total_seconds(), 2) if finished['avg_run'] else None,
+        'avg_enqueue_to_done_seconds_last_hour': (
+            round(finished['avg_latency'].total_seconds(), 2) if finished['avg_latency'] else None
+        ),
+    }
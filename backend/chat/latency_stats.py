@@ -0,0 +1,78 @@
+# backend/chat/latency_stats.py
+"""
+Registro de latencias en memoria del proceso (ventana móvil por métrica) para el
+endpoint de métricas: percentiles p50/p95 sin dependencias externas, más un histograma
+acumulado por buckets (desde que arrancó el proceso).
+"""
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Dict
+
+
+class LatencyRecorder:
+    # Límites superiores de los buckets del histograma, en milisegundos
+    BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, name: str, window_size: int = 500):
+        self.name = name
+        self._samples = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self._count = 0
+        self._buckets = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def record(self, seconds: float):
+        bucket = bisect_left(self.BUCKETS_MS, seconds * 1000)
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+            self._buckets[bucket] += 1
+
+    @staticmethod
+    def _percentile(ordered, fraction: float) -> float:
+        index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+            buckets = list(self._buckets)
+        if not samples:
+            return {'count': count, 'window': 0}
+        return {
+            'count': count,
+            'window': len(samples),
+            'p50_ms': round(self._percentile(samples, 0.50) * 1000, 1),
+            'p95_ms': round(self._percentile(samples, 0.95) * 1000, 1),
+            'p99_ms': round(self._percentile(samples, 0.99) * 1000, 1),
+            'max_ms': round(samples[-1] * 1000, 1),
+            'histogram_ms': self._histogram(buckets),
+        }
+
+    def _histogram(self, buckets) -> Dict[str, int]:
+        """Conteo acumulado por bucket, al estilo Prometheus (le_100 = llamadas de hasta 100 ms)"""
+        histogram = {}
+        cumulative = 0
+        for limit, bucket_count in zip(self.BUCKETS_MS, buckets):
+            cumulative += bucket_count
+            histogram[f'le_{limit}'] = cumulative
+        histogram['le_inf'] = cumulative + buckets[-1]
+        return histogram
+
+
+_recorders: Dict[str, LatencyRecorder] = {}
+_recorders_lock = threading.Lock()
+
+
+def get_recorder(name: str) -> LatencyRecorder:
+    with _recorders_lock:
+        if name not in _recorders:
+            _recorders[name] = LatencyRecorder(name)
+        return _recorders[name]
+
+
+def latency_snapshot() -> Dict[str, Dict]:
+    with _recorders_lock:
+        recorders = list(_recorders.values())
+    return {recorder.name: recorder.snapshot() for recorder in recorders}
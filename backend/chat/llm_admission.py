@@ -0,0 +1,286 @@
+# backend/chat/llm_admission.py
+"""
+Control de admisión para las llamadas salientes a Gemini (chat, recursos de apoyo,
+recomendaciones de curso y resúmenes), compartido por todos los workers del host sin broker.
+
+Se basa en archivos de bloqueo con flock en LLM_ADMISSION_LOCK_DIR; el sistema operativo
+libera el bloqueo si el proceso muere, así que no quedan cupos huérfanos:
+- Cupos de ejecución (slot-N.lock): como mucho LLM_MAX_CONCURRENT_CALLS llamadas a la vez.
+  Los últimos LLM_PRIORITY_RESERVED_SLOTS solo los usan las llamadas prioritarias
+  (turnos que requieren recursos de apoyo).
+- Cupos por usuario (user-<hash>-N.lock): un mismo estudiante no tiene más de
+  LLM_ADMISSION_PER_USER_LIMIT llamadas en curso o esperando, aunque tenga varias pestañas
+  abiertas. Se toma antes de entrar a la cola, así no ocupa lugares que otros esperan.
+- Cola de espera ordenada (wait-<prioridad>-<número>.lock): si no hay cupo, o si ya hay
+  alguien esperando, se saca un número de ticket.counter (incrementado bajo flock) y se
+  espera el turno: solo el primero de la cola intenta tomar un cupo, las llamadas
+  prioritarias antes que las demás y dentro de cada grupo por orden de llegada. El archivo
+  de cada espera queda bloqueado mientras el proceso espera; los que quedan sin bloqueo
+  (proceso muerto) se borran al recorrer la cola.
+- La cola tiene como mucho LLM_ADMISSION_QUEUE_SIZE esperas y cada una dura hasta
+  LLM_ADMISSION_MAX_WAIT_SECONDS; si está llena o se agota la espera se lanza
+  LLMAdmissionRejected y el chat responde 429 con Retry-After.
+
+Sin fcntl (Windows) el control queda desactivado.
+"""
+import hashlib
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - solo en Windows
+    fcntl = None
+
+
+class LLMAdmissionRejected(Exception):
+    """No hay cupo para llamar al modelo; el cliente debe reintentar más tarde."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Llamada al modelo rechazada ({reason}), reintentar en {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+_counters = {
+    'admitted': 0,
+    'admitted_after_wait': 0,
+    'rejected_queue_full': 0,
+    'rejected_user_limit': 0,
+    'rejected_timeout': 0,
+    'wait_seconds_total': 0.0,
+}
+_counters_lock = threading.Lock()
+
+
+def _count(name: str, value=1):
+    with _counters_lock:
+        _counters[name] += value
+
+
+def _enabled() -> bool:
+    return fcntl is not None and getattr(settings, 'LLM_ADMISSION_ENABLED', True)
+
+
+def _lock_dir() -> str:
+    path = getattr(settings, 'LLM_ADMISSION_LOCK_DIR', '/tmp/host-ai-llm-admission')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _try_lock(name: str) -> Optional[int]:
+    """Bloqueo exclusivo no bloqueante; devuelve el descriptor o None si está tomado"""
+    fd = os.open(os.path.join(_lock_dir(), name), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _unlock(fd: int):
+    try:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def _try_any(names: List[str]) -> Optional[int]:
+    # Orden aleatorio: reparte los intentos entre procesos y evita que todos peleen por slot-0
+    for name in random.sample(names, len(names)):
+        fd = _try_lock(name)
+        if fd is not None:
+            return fd
+    return None
+
+
+def _waiters() -> List[str]:
+    """
+    Esperas vivas de la cola en orden de atención. Un archivo sin bloqueo es de un proceso que
+    terminó sin salir de la cola: se borra.
+    """
+    lock_dir = _lock_dir()
+    waiters = []
+    for name in sorted(os.listdir(lock_dir)):
+        if not (name.startswith('wait-') and name.endswith('.lock')):
+            continue
+        path = os.path.join(lock_dir, name)
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            continue
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            waiters.append(name)
+        else:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        finally:
+            os.close(fd)
+    return waiters
+
+
+def _enter_queue(priority: bool, queue_size: int) -> Optional[Tuple[int, str]]:
+    """Saca número y se pone en la cola; None si está llena. Devuelve (descriptor, nombre)"""
+    lock_dir = _lock_dir()
+    counter_fd = os.open(os.path.join(lock_dir, 'ticket.counter'), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(counter_fd, fcntl.LOCK_EX)
+        if len(_waiters()) >= queue_size:
+            return None
+        ticket = int(os.pread(counter_fd, 32, 0) or b'0') + 1
+        os.ftruncate(counter_fd, 0)
+        os.pwrite(counter_fd, str(ticket).encode('ascii'), 0)
+
+        # El archivo se bloquea antes de darle su nombre: nadie lo ve sin bloqueo y lo borra
+        name = f"wait-{0 if priority else 1}-{ticket:012d}.lock"
+        entering = os.path.join(lock_dir, f"entering-{os.getpid()}-{threading.get_ident()}.tmp")
+        fd = os.open(entering, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.rename(entering, os.path.join(lock_dir, name))
+        return fd, name
+    finally:
+        _unlock(counter_fd)
+
+
+def _leave_queue(fd: int, name: str):
+    try:
+        os.unlink(os.path.join(_lock_dir(), name))
+    except FileNotFoundError:
+        pass
+    _unlock(fd)
+
+
+class AdmissionSlot:
+    """Cupo tomado; se libera con release() o al salir del bloque with"""
+
+    def __init__(self, fds: List[int]):
+        self._fds = fds
+
+    def release(self):
+        fds, self._fds = self._fds, []
+        for fd in fds:
+            _unlock(fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def __del__(self):
+        self.release()
+
+
+def acquire_slot(purpose: str, user_id=None, priority: bool = False, max_wait: Optional[float] = None) -> AdmissionSlot:
+    """
+    Toma un cupo para llamar al modelo (esperando su turno en la cola si hace falta).
+    Lanza LLMAdmissionRejected si la cola está llena, si el estudiante no libera un cupo a
+    tiempo o si se agota la espera.
+    """
+    if not _enabled():
+        return AdmissionSlot([])
+
+    total = getattr(settings, 'LLM_MAX_CONCURRENT_CALLS', 8)
+    reserved = min(getattr(settings, 'LLM_PRIORITY_RESERVED_SLOTS', 2), total - 1)
+    usable = total if priority else total - reserved
+    slot_names = [f'slot-{i}.lock' for i in range(usable)]
+
+    user_names = []
+    if user_id is not None:
+        user_hash = hashlib.sha1(str(user_id).encode('utf-8')).hexdigest()[:16]
+        user_names = [
+            f'user-{user_hash}-{i}.lock'
+            for i in range(getattr(settings, 'LLM_ADMISSION_PER_USER_LIMIT', 2))
+        ]
+
+    if max_wait is None:
+        max_wait = getattr(settings, 'LLM_ADMISSION_MAX_WAIT_SECONDS', 10)
+    retry_after = max(1, int(max_wait))
+    started = time.monotonic()
+    poll_seconds = 0.02 if priority else 0.05
+
+    fds = []
+    try:
+        # 1. Cupo del estudiante: mientras lo espera no ocupa lugar en la cola
+        if user_names:
+            user_fd = _try_any(user_names)
+            while user_fd is None:
+                if time.monotonic() - started >= max_wait:
+                    _count('rejected_user_limit')
+                    print(f"[ADMISSION] {purpose}: el estudiante ya tiene sus llamadas en curso, rechazada")
+                    raise LLMAdmissionRejected('límite por estudiante', retry_after)
+                time.sleep(poll_seconds)
+                user_fd = _try_any(user_names)
+            fds.append(user_fd)
+
+        # 2. Sin nadie esperando se toma un cupo libre directamente
+        if not _waiters():
+            slot_fd = _try_any(slot_names)
+            if slot_fd is not None:
+                fds.append(slot_fd)
+                return _admitted(fds, time.monotonic() - started)
+
+        # 3. Cola ordenada: solo el primero intenta tomar un cupo
+        entry = _enter_queue(priority, getattr(settings, 'LLM_ADMISSION_QUEUE_SIZE', 32))
+        if entry is None:
+            _count('rejected_queue_full')
+            print(f"[ADMISSION] {purpose}: cola llena, llamada rechazada")
+            raise LLMAdmissionRejected('cola llena', retry_after)
+        try:
+            while True:
+                waiters = _waiters()
+                if not waiters or waiters[0] == entry[1]:
+                    slot_fd = _try_any(slot_names)
+                    if slot_fd is not None:
+                        fds.append(slot_fd)
+                        return _admitted(fds, time.monotonic() - started)
+                waited = time.monotonic() - started
+                if waited >= max_wait:
+                    _count('rejected_timeout')
+                    print(f"[ADMISSION] {purpose}: sin cupo tras {waited:.1f}s, llamada rechazada")
+                    raise LLMAdmissionRejected('tiempo de espera agotado', retry_after)
+                time.sleep(poll_seconds)
+        finally:
+            _leave_queue(*entry)
+    except BaseException:
+        for fd in fds:
+            _unlock(fd)
+        raise
+
+
+def _admitted(fds: List[int], waited: float) -> AdmissionSlot:
+    _count('admitted')
+    if waited > 0.001:
+        _count('admitted_after_wait')
+        _count('wait_seconds_total', waited)
+    return AdmissionSlot(fds)
+
+
+def queue_full() -> bool:
+    """Comprobación rápida antes de empezar un turno: ¿la cola de espera está llena?"""
+    if not _enabled():
+        return False
+    return len(_waiters()) >= getattr(settings, 'LLM_ADMISSION_QUEUE_SIZE', 32)
+
+
+def admission_stats() -> Dict:
+    with _counters_lock:
+        stats = dict(_counters)
+    stats['avg_wait_seconds'] = (
+        round(stats['wait_seconds_total'] / stats['admitted_after_wait'], 3) if stats['admitted_after_wait'] else 0.0
+    )
+    stats['wait_seconds_total'] = round(stats['wait_seconds_total'], 2)
+    stats['enabled'] = _enabled()
+    stats['max_concurrent_calls'] = getattr(settings, 'LLM_MAX_CONCURRENT_CALLS', 8)
+    return stats
@@ -0,0 +1,235 @@
+# backend/chat/llm_client.py
+"""
+Cliente único para los modelos generativos, independiente del proveedor.
+
+Todo el backend (chat, recursos de apoyo, recomendaciones de curso y resúmenes) llama al
+modelo a través de generate() y stream(), que agregan:
+- Backend configurable (LLM_BACKEND): 'gemini' o 'fake' (chat.llm_fakes, sin red, para
+  desarrollo y pruebas de carga). GEMINI_FAKE=True equivale a LLM_BACKEND=fake.
+- Un modelo por caso de uso y por proceso. genai.configure se llama una sola vez, así todos
+  los modelos comparten el mismo canal gRPC con Gemini en lugar de abrir uno por módulo.
+- Timeout por llamada (request_options); por defecto LLM_TIMEOUT_SECONDS.
+- El circuit breaker de Gemini (chat.circuit_breaker).
+- Contabilidad de tokens, errores y timeouts por caso de uso (usage_stats) e histograma de
+  latencias (métricas llm_<caso de uso> de chat.latency_stats).
+
+Las instrucciones estáticas de cada prompt (rol, enfoque pedagógico, ejemplos y formato de
+salida; ver chat.prompts) se registran una sola vez como system_instruction del modelo y en
+cada petición solo viaja la parte dinámica. Como van siempre primero y sin cambios, Gemini 2.5
+las reutiliza con su caché implícita de prefijos: usage_metadata.cached_content_token_count
+indica cuántos tokens del prompt se sirvieron desde caché, y eso es lo que se registra como
+ahorro en usage_stats().
+
+No se crea un CachedContent explícito: las instrucciones rondan el mínimo de tokens que exige
+la API para una caché explícita, que además se cobra por hora de almacenamiento.
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+import google.generativeai as genai
+from django.conf import settings
+
+from . import prompts
+from .circuit_breaker import CircuitOpenError, get_gemini_breaker
+from .latency_stats import get_recorder
+from .prompt_budget import estimate_tokens
+
+try:
+    from google.api_core.exceptions import DeadlineExceeded
+except ImportError:  # pragma: no cover - viene con google-generativeai
+    DeadlineExceeded = TimeoutError
+
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+
+BACKEND_GEMINI = 'gemini'
+BACKEND_FAKE = 'fake'
+
+PURPOSE_CHAT = 'chat'
+PURPOSE_SUPPORT_RESOURCES = 'support_resources'
+PURPOSE_SUPPORT_MESSAGE = 'support_message'
+PURPOSE_COURSE_RECOMMENDATION = 'course_recommendation'
+PURPOSE_CONVERSATION_SUMMARY = 'conversation_summary'
+
+SYSTEM_INSTRUCTIONS = {
+    PURPOSE_CHAT: prompts.CHAT_SYSTEM_INSTRUCTION,
+    PURPOSE_SUPPORT_RESOURCES: prompts.SUPPORT_RESOURCES_SYSTEM_INSTRUCTION,
+    PURPOSE_SUPPORT_MESSAGE: prompts.SUPPORT_MESSAGE_SYSTEM_INSTRUCTION,
+    PURPOSE_COURSE_RECOMMENDATION: prompts.COURSE_RECOMMENDATION_SYSTEM_INSTRUCTION,
+    PURPOSE_CONVERSATION_SUMMARY: prompts.CONVERSATION_SUMMARY_SYSTEM_INSTRUCTION,
+}
+
+_models = {}
+_models_lock = threading.Lock()
+
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+_gemini_configured = False
+
+
+def backend_name() -> str:
+    return getattr(settings, 'LLM_BACKEND', BACKEND_FAKE if getattr(settings, 'GEMINI_FAKE', False) else BACKEND_GEMINI)
+
+
+def is_available() -> bool:
+    """Hay un modelo utilizable (backend falso o clave de Gemini configurada)"""
+    return backend_name() == BACKEND_FAKE or bool(os.getenv('GEMINI_API_KEY'))
+
+
+def _gemini_model(purpose: str, system_instruction: str):
+    global _gemini_configured
+    if not _gemini_configured:
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+        _gemini_configured = True
+    return genai.GenerativeModel(GEMINI_MODEL, system_instruction=system_instruction)
+
+
+def _fake_model(purpose: str, system_instruction: str):
+    from .llm_fakes import FakeStreamingModel
+    return FakeStreamingModel(system_instruction=system_instruction, purpose=purpose)
+
+
+_BACKENDS = {
+    BACKEND_GEMINI: _gemini_model,
+    BACKEND_FAKE: _fake_model,
+}
+
+
+def get_model(purpose: str):
+    """Modelo (uno por proceso) con las instrucciones estáticas del caso de uso ya registradas"""
+    with _models_lock:
+        if purpose not in _models:
+            backend = backend_name()
+            if backend not in _BACKENDS:
+                raise ValueError(f"LLM_BACKEND desconocido: {backend}")
+            _models[purpose] = _BACKENDS[backend](purpose, SYSTEM_INSTRUCTIONS[purpose])
+        return _models[purpose]
+
+
+def _request_options(timeout: Optional[float]) -> Dict:
+    return {'timeout': timeout or getattr(settings, 'LLM_TIMEOUT_SECONDS', 30)}
+
+
+def generate(purpose: str, contents, timeout: Optional[float] = None):
+    """
+    Llamada completa al modelo del caso de uso. Lanza CircuitOpenError si el circuito está
+    abierto y propaga los errores del proveedor; el llamador decide su fallback.
+    """
+    model = get_model(purpose)
+    start = time.monotonic()
+    try:
+        response = get_gemini_breaker().call(model.generate_content, contents, request_options=_request_options(timeout))
+    except Exception as exc:
+        _record_error(purpose, exc, time.monotonic() - start)
+        raise
+    get_recorder(f'llm_{purpose}').record(time.monotonic() - start)
+    record_usage(purpose, response, contents)
+    return response
+
+
+def stream(purpose: str, contents, timeout: Optional[float] = None) -> Iterator[str]:
+    """
+    Llamada con stream=True: devuelve los fragmentos de texto a medida que llegan.
+    Lanza CircuitOpenError al empezar si el circuito está abierto.
+    """
+    breaker = get_gemini_breaker()
+    if not breaker.allow_request():
+        error = CircuitOpenError(breaker.name)
+        _record_error(purpose, error, 0.0)
+        raise error
+
+    model = get_model(purpose)
+    start = time.monotonic()
+    last_chunk = None
+    try:
+        for chunk in model.generate_content(contents, stream=True, request_options=_request_options(timeout)):
+            last_chunk = chunk
+            try:
+                piece = chunk.text
+            except ValueError:
+                # Fragmento sin texto (p. ej. solo metadatos de seguridad)
+                continue
+            if piece:
+                yield piece
+    except GeneratorExit:
+        # El cliente cerró la conexión a mitad del stream
+        breaker.record_success(time.monotonic() - start)
+        raise
+    except Exception as exc:
+        breaker.record_failure(time.monotonic() - start)
+        _record_error(purpose, exc, time.monotonic() - start)
+        raise
+
+    elapsed = time.monotonic() - start
+    breaker.record_success(elapsed)
+    get_recorder(f'llm_{purpose}').record(elapsed)
+    if last_chunk is not None:
+        record_usage(purpose, last_chunk, contents)
+
+
+def _purpose_stats(purpose: str) -> Dict:
+    """Contadores del caso de uso (llamar con _usage_lock tomado)"""
+    return _usage.setdefault(purpose, {
+        'calls': 0,
+        'errors': 0,
+        'timeouts': 0,
+        'circuit_open': 0,
+        'prompt_tokens': 0,
+        'cached_tokens': 0,
+        'output_tokens': 0,
+        'dynamic_tokens_estimated': 0,
+    })
+
+
+def _record_error(purpose: str, exc: Exception, elapsed: float):
+    """CircuitOpenError: la llamada se cortó sin llegar al proveedor"""
+    with _usage_lock:
+        stats = _purpose_stats(purpose)
+        if isinstance(exc, CircuitOpenError):
+            stats['circuit_open'] += 1
+            return
+        stats['errors'] += 1
+        if isinstance(exc, (TimeoutError, DeadlineExceeded)):
+            stats['timeouts'] += 1
+    get_recorder(f'llm_{purpose}').record(elapsed)
+
+
+def record_usage(purpose: str, response, contents: str):
+    """
+    Registra el uso de tokens de una llamada. Con stream=True se pasa el último fragmento
+    (es el que trae usage_metadata).
+    """
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+    cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+    output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+    instruction_tokens = estimate_tokens(SYSTEM_INSTRUCTIONS[purpose])
+    dynamic_tokens = estimate_tokens(contents if isinstance(contents, str) else str(contents))
+
+    with _usage_lock:
+        stats = _purpose_stats(purpose)
+        stats['calls'] += 1
+        stats['prompt_tokens'] += prompt_tokens
+        stats['cached_tokens'] += cached_tokens
+        stats['output_tokens'] += output_tokens
+        stats['dynamic_tokens_estimated'] += dynamic_tokens
+        stats['instruction_tokens_estimated'] = instruction_tokens
+
+    print(
+        f"[LLM] {purpose}: prompt {prompt_tokens} tokens ({cached_tokens} desde caché), "
+        f"parte dinámica ~{dynamic_tokens}, instrucciones ~{instruction_tokens}"
+    )
+
+
+def usage_stats() -> Dict:
+    with _usage_lock:
+        snapshot = {purpose: dict(stats) for purpose, stats in _usage.items()}
+    for stats in snapshot.values():
+        stats['cached_ratio'] = (
+            round(stats['cached_tokens'] / stats['prompt_tokens'], 3) if stats['prompt_tokens'] else 0.0
+        )
+    snapshot['backend'] = backend_name()
+    return snapshot
@@ -0,0 +1,205 @@
+# backend/chat/llm_fakes.py
+"""
+Modelo generativo falso, con la misma interfaz que genai.GenerativeModel.generate_content,
+para desarrollo y pruebas de carga sin llamar a Gemini (LLM_BACKEND=fake o GEMINI_FAKE=True).
+
+Simula la latencia real: una espera hasta el primer fragmento (time-to-first-token)
+y una pausa entre fragmentos, tanto en modo normal como con stream=True.
+
+Para pruebas de carga realistas (ver `python manage.py load_test_chat`):
+- La respuesta es fija por caso de uso (JSON válido para recursos de apoyo y recomendaciones
+  de curso), así el pipeline completo se ejecuta igual que con Gemini.
+- LLM_FAKE_LATENCY_JITTER varía la latencia ±fracción, LLM_FAKE_SLOW_RATE hace que una parte
+  de las llamadas tarde 10 veces más (cola larga) y LLM_FAKE_FAILURE_RATE inyecta errores.
+- Si la latencia simulada supera el timeout de request_options la llamada espera ese timeout
+  y lanza TimeoutError, como un DeadlineExceeded de Gemini.
+- Con LLM_FAKE_SEED la secuencia de latencias y fallas es reproducible.
+
+También simula usage_metadata: las instrucciones de sistema cuentan como servidas desde la
+caché de prefijos a partir de la segunda llamada. last_contents guarda lo último que se
+envió, para comprobar que las instrucciones estáticas no viajan en cada petición.
+"""
+import json
+import random
+import threading
+import time
+from typing import Iterator, Optional
+
+from django.conf import settings
+
+from .prompt_budget import estimate_tokens
+
+
+DEFAULT_REPLY = (
+    "Percibo que hay algo importante en lo que compartes. Es normal sentirse así a veces. "
+    "¿En qué momento del día notaste esa emoción con más fuerza?"
+)
+
+# Respuestas por caso de uso (claves de chat.llm_client.PURPOSE_*)
+FAKE_REPLIES = {
+    'chat': DEFAULT_REPLY,
+    'support_resources': json.dumps({
+        'techniques': [
+            {
+                'type': 'breathing',
+                'title': 'Respiración cuadrada',
+                'steps': ['Inhala contando hasta 4', 'Sostén contando hasta 4', 'Exhala contando hasta 4'],
+                'duration': '1-2 minutos',
+            },
+            {
+                'type': 'journaling',
+                'title': 'Escribe lo que sientes',
+                'steps': ['Anota qué pasó', 'Nombra la emoción', 'Escribe qué necesitas ahora'],
+                'duration': '5 minutos',
+            },
+        ],
+        'supportive_message': 'Lo que sientes es válido. Darte un momento para notarlo ya es un paso importante.',
+        'educational_insight': 'Las emociones intensas suelen bajar cuando las nombramos y les damos espacio.',
+    }, ensure_ascii=False),
+    'support_message': 'Lo que cuentas importa y tiene sentido que te sientas así. Date un momento para respirar.',
+    'course_recommendation': json.dumps({
+        'overview': 'El curso muestra una emoción predominante; el objetivo es nombrarla y regularla en grupo.',
+        'suggestions': [
+            {
+                'title': 'Círculo de palabras',
+                'description': 'Nombrar en grupo lo que se siente reduce la intensidad y crea confianza.',
+                'activity': 'Cada estudiante elige una palabra para su estado y la comparte en ronda (10 min).',
+                'reference': 'CASEL Framework',
+            },
+            {
+                'title': 'Diario de emociones',
+                'description': 'La escritura reflexiva ayuda a identificar disparadores.',
+                'activity': 'Escribir 5 minutos sobre un momento del día y la emoción asociada.',
+                'reference': "R. Bisquerra – 'La educación emocional'",
+            },
+        ],
+        'disclaimer': 'Recomendación de prueba generada por el modelo falso.',
+    }, ensure_ascii=False),
+    'conversation_summary': (
+        'El estudiante habló de sus preocupaciones escolares y expresó nervios y cansancio; '
+        'se exploró cómo se manifiestan esas emociones.'
+    ),
+}
+
+# Multiplicador de latencia de las llamadas lentas (LLM_FAKE_SLOW_RATE)
+SLOW_FACTOR = 10
+
+
+class FakeLLMError(Exception):
+    """Falla inyectada por el modelo falso (LLM_FAKE_FAILURE_RATE)."""
+
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count: int, cached_content_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.cached_content_token_count = cached_content_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeChunk:
+    def __init__(self, text: str, usage_metadata: Optional[FakeUsageMetadata] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeResponse(FakeChunk):
+    pass
+
+
+class FakeStreamingModel:
+    # Palabras por fragmento (Gemini entrega el texto en trozos de varias palabras)
+    WORDS_PER_CHUNK = 4
+
+    def __init__(
+        self,
+        reply: Optional[str] = None,
+        first_token_seconds: Optional[float] = None,
+        token_seconds: Optional[float] = None,
+        system_instruction: Optional[str] = None,
+        purpose: Optional[str] = None,
+        failure_rate: Optional[float] = None,
+        slow_rate: Optional[float] = None,
+        jitter: Optional[float] = None,
+        seed: Optional[int] = None
+    ):
+        self.reply = reply if reply is not None else FAKE_REPLIES.get(purpose, DEFAULT_REPLY)
+        self.system_instruction = system_instruction
+        self.last_contents = None
+        self._calls = 0
+        self.first_token_seconds = (
+            first_token_seconds if first_token_seconds is not None
+            else getattr(settings, 'GEMINI_FAKE_FIRST_TOKEN_SECONDS', 0.3)
+        )
+        self.token_seconds = (
+            token_seconds if token_seconds is not None
+            else getattr(settings, 'GEMINI_FAKE_TOKEN_SECONDS', 0.05)
+        )
+        self.failure_rate = failure_rate if failure_rate is not None else getattr(settings, 'LLM_FAKE_FAILURE_RATE', 0.0)
+        self.slow_rate = slow_rate if slow_rate is not None else getattr(settings, 'LLM_FAKE_SLOW_RATE', 0.0)
+        self.jitter = jitter if jitter is not None else getattr(settings, 'LLM_FAKE_LATENCY_JITTER', 0.0)
+        if seed is None:
+            seed = getattr(settings, 'LLM_FAKE_SEED', None)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _chunks(self):
+        words = self.reply.split(' ')
+        for start in range(0, len(words), self.WORDS_PER_CHUNK):
+            piece = ' '.join(words[start:start + self.WORDS_PER_CHUNK])
+            yield piece if start + self.WORDS_PER_CHUNK >= len(words) else piece + ' '
+
+    def _usage(self, contents, calls: int) -> FakeUsageMetadata:
+        instruction_tokens = estimate_tokens(self.system_instruction or '')
+        cached = instruction_tokens if calls > 1 else 0
+        return FakeUsageMetadata(
+            prompt_token_count=instruction_tokens + estimate_tokens(str(contents)),
+            cached_content_token_count=cached,
+            candidates_token_count=estimate_tokens(self.reply),
+        )
+
+    def _plan_call(self, contents):
+        """Sortea la llamada: (número de llamada, factor de latencia, ¿falla?)"""
+        with self._lock:
+            self.last_contents = contents
+            self._calls += 1
+            factor = 1.0
+            if self.jitter:
+                factor += self._random.uniform(-self.jitter, self.jitter)
+            if self.slow_rate and self._random.random() < self.slow_rate:
+                factor *= SLOW_FACTOR
+            fails = bool(self.failure_rate) and self._random.random() < self.failure_rate
+            return self._calls, max(0.0, factor), fails
+
+    @staticmethod
+    def _wait(seconds: float, deadline: Optional[float]):
+        """Espera la latencia simulada; si pasa del timeout espera solo hasta él y lanza TimeoutError"""
+        if deadline is not None and time.monotonic() + seconds > deadline:
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            raise TimeoutError("Tiempo de espera agotado (modelo falso)")
+        time.sleep(seconds)
+
+    def generate_content(self, contents, stream: bool = False, request_options=None, **kwargs):
+        calls, factor, fails = self._plan_call(contents)
+        timeout = (request_options or {}).get('timeout')
+        deadline = time.monotonic() + timeout if timeout else None
+        if stream:
+            return self._stream(contents, calls, factor, fails, deadline)
+
+        chunks = list(self._chunks())
+        self._wait(factor * (self.first_token_seconds + self.token_seconds * max(0, len(chunks) - 1)), deadline)
+        if fails:
+            raise FakeLLMError("Falla inyectada (modelo falso)")
+        return FakeResponse(self.reply, self._usage(contents, calls))
+
+    def _stream(self, contents, calls, factor, fails, deadline) -> Iterator[FakeChunk]:
+        self._wait(factor * self.first_token_seconds, deadline)
+        chunks = list(self._chunks())
+        for index, piece in enumerate(chunks):
+            if index:
+                self._wait(factor * self.token_seconds, deadline)
+            # Las fallas inyectadas cortan el stream a la mitad
+            if fails and index >= len(chunks) // 2:
+                raise FakeLLMError("Falla inyectada en el stream (modelo falso)")
+            # Como en Gemini, el último fragmento trae el uso de tokens
+            yield FakeChunk(piece, self._usage(contents, calls) if index == len(chunks) - 1 else None)
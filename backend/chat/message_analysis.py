@@ -0,0 +1,239 @@
+# backend/chat/message_analysis.py
+"""
+Traducción del resultado de EmotionAnalyzer.analyze_complete_hybrid a los campos de Message.
+
+Lo usan ChatAPIView (resultado parcial dentro del presupuesto de latencia), la finalización
+en segundo plano de los análisis pendientes y el worker de la cola asíncrona (chat.job_handlers),
+para que todos los caminos guarden exactamente los mismos valores.
+"""
+import threading
+from typing import Dict, Optional
+
+from django.db import close_old_connections
+
+from . import emotion_rollups
+from .models import Conversation, Message
+
+
+def infer_emotion_from_text(text: str) -> str:
+    """Heurística simple para inferir emoción cuando el modelo devuelve neutral."""
+    t = (text or "").lower()
+    if any(w in t for w in ["triste", "soledad", "solo", "llorar", "deprim"]):
+        return "tristeza"
+    if any(w in t for w in ["ansio", "miedo", "preocup", "nervios"]):
+        return "miedo"
+    if any(w in t for w in ["enojo", "rabia", "furia", "molest"]):
+        return "enojo"
+    if any(w in t for w in ["feliz", "content", "alegr", "gracia"]):
+        return "alegría"
+    return "neutral"
+
+
+def resolve_hybrid_analysis(text: str, hf_analysis: Dict) -> Dict:
+    """
+    Extrae los valores que usa el chat del análisis híbrido y aplica el fallback heurístico
+    cuando Pysentimiento devolvió todos 0 y 'others':1.0.
+    """
+    pysentimiento_emotion = hf_analysis['pysentimiento_emotion']
+    pysentimiento_sentiment = hf_analysis['pysentimiento_sentiment']
+    primary_emotion = hf_analysis['primary_emotion']
+    primary_emotion_source = hf_analysis['primary_emotion_source']
+
+    # Puntajes base de Pysentimiento
+    emotion_scores = pysentimiento_emotion.get('emotions', {})
+
+    try:
+        non_others_sum = sum(v for k, v in emotion_scores.items() if k != 'others')
+        others_val = emotion_scores.get('others', 0)
+    except Exception:
+        non_others_sum = 0
+        others_val = 0
+
+    if others_val >= 0.99 and non_others_sum == 0:
+        guessed_es = infer_emotion_from_text(text)
+        mapping_rev = {
+            'tristeza': 'sadness',
+            'miedo': 'fear',
+            'enojo': 'anger',
+            'alegría': 'joy',
+            'alegria': 'joy',
+        }
+        guessed = mapping_rev.get(guessed_es, 'others')
+        if guessed != 'others':
+            print(f"[FALLBACK] Ajustando emoción a '{guessed}' por heurística de texto")
+            emotion_scores = {
+                'joy': 0.0,
+                'sadness': 0.0,
+                'anger': 0.0,
+                'fear': 0.0,
+                'surprise': 0.0,
+                'disgust': 0.0,
+                'others': 0.1,
+            }
+            emotion_scores[guessed] = 0.9
+            pysentimiento_emotion['emotions'] = emotion_scores
+            pysentimiento_emotion['dominant_emotion'] = guessed
+            pysentimiento_emotion['confidence'] = 0.6
+            # Si la primaria venía como 'others', usa la inferida
+            if primary_emotion == 'others' or not primary_emotion:
+                primary_emotion = guessed
+                primary_emotion_source = 'heuristic'
+
+    return {
+        'pysentimiento_emotion': pysentimiento_emotion,
+        'emotion_scores': emotion_scores,
+        'goemotions_primary': hf_analysis['goemotions_primary'],
+        'goemotions_secondary': hf_analysis['goemotions_secondary'],
+        'primary_emotion': primary_emotion,
+        'primary_emotion_source': primary_emotion_source,
+        'intensity': hf_analysis['intensity'],
+        'sentiment': pysentimiento_sentiment['sentiment'],
+        'sentiment_scores': pysentimiento_sentiment['scores'],
+        'analysis_status': analysis_status(hf_analysis),
+    }
+
+
+def analysis_status(hf_analysis: Dict) -> str:
+    """complete | partial (faltan análisis secundarios) | pending (no hay emoción ni sentimiento)"""
+    pending = set(hf_analysis.get('pending_analyses') or [])
+    if not pending:
+        return Message.ANALYSIS_COMPLETE
+    if {'emotion', 'sentiment'} <= pending:
+        return Message.ANALYSIS_PENDING
+    return Message.ANALYSIS_PARTIAL
+
+
+def message_fields_from_analysis(resolved: Dict) -> Dict:
+    """Valores de los campos de análisis de Message a partir de resolve_hybrid_analysis"""
+    emotion_scores = resolved['emotion_scores']
+    goemotions_primary = resolved['goemotions_primary']
+    goemotions_secondary = resolved['goemotions_secondary']
+    sentiment_scores = resolved['sentiment_scores']
+
+    return {
+        # Pysentimiento (7 emociones)
+        'dominant_emotion': resolved['pysentimiento_emotion']['dominant_emotion'],
+        'emotion_joy_score': emotion_scores.get('joy', 0.0),
+        'emotion_sadness_score': emotion_scores.get('sadness', 0.0),
+        'emotion_anger_score': emotion_scores.get('anger', 0.0),
+        'emotion_fear_score': emotion_scores.get('fear', 0.0),
+        'emotion_disgust_score': emotion_scores.get('disgust', 0.0),
+        'emotion_surprise_score': emotion_scores.get('surprise', 0.0),
+        'emotion_others_score': emotion_scores.get('others', 0.0),
+
+        # GoEmotions primarias (2 emociones)
+        'emotion_gratitude_score': goemotions_primary.get('gratitude', 0.0),
+        'emotion_pride_score': goemotions_primary.get('pride', 0.0),
+
+        # GoEmotions secundarias (JSON)
+        'secondary_emotions': goemotions_secondary if goemotions_secondary else {},
+
+        # Emoción primaria global
+        'primary_emotion': resolved['primary_emotion'],
+        'primary_emotion_source': resolved['primary_emotion_source'],
+
+        # Sentimiento
+        'sentiment': resolved['sentiment'],
+        'sentiment_pos_score': sentiment_scores.get('POS', 0.0),
+        'sentiment_neg_score': sentiment_scores.get('NEG', 0.0),
+        'sentiment_neu_score': sentiment_scores.get('NEU', 0.0),
+
+        'analysis_status': resolved['analysis_status'],
+    }
+
+
+def analysis_from_message(message: Message) -> Dict:
+    """Reconstruye el formato de resolve_hybrid_analysis desde los campos guardados de un mensaje"""
+    emotion_scores = {
+        'joy': message.emotion_joy_score or 0.0,
+        'sadness': message.emotion_sadness_score or 0.0,
+        'anger': message.emotion_anger_score or 0.0,
+        'fear': message.emotion_fear_score or 0.0,
+        'disgust': message.emotion_disgust_score or 0.0,
+        'surprise': message.emotion_surprise_score or 0.0,
+        'others': message.emotion_others_score or 0.0,
+    }
+    sentiment_scores = {
+        'POS': message.sentiment_pos_score or 0.0,
+        'NEG': message.sentiment_neg_score or 0.0,
+        'NEU': message.sentiment_neu_score or 0.0,
+    }
+    dominant = message.dominant_emotion or 'others'
+    sentiment = message.sentiment or 'NEU'
+    return {
+        'pysentimiento_emotion': {
+            'dominant_emotion': dominant,
+            'emotions': emotion_scores,
+            'confidence': emotion_scores.get(dominant, 0.0),
+        },
+        'emotion_scores': emotion_scores,
+        'goemotions_primary': {
+            'gratitude': message.emotion_gratitude_score or 0.0,
+            'pride': message.emotion_pride_score or 0.0,
+        },
+        'goemotions_secondary': message.secondary_emotions or {},
+        'primary_emotion': message.primary_emotion or dominant,
+        'primary_emotion_source': message.primary_emotion_source or 'pysentimiento',
+        'intensity': _stored_intensity(emotion_scores.get(dominant, 0.0), max(sentiment_scores.values()), message),
+        'sentiment': sentiment,
+        'sentiment_scores': sentiment_scores,
+        'analysis_status': message.analysis_status,
+    }
+
+
+def _stored_intensity(emotion_confidence: float, sentiment_confidence: float, message: Message) -> str:
+    # La intensidad no se guarda: se recalcula igual que EmotionAnalyzer._calculate_hybrid_intensity
+    from .emotion_analyzer import EmotionAnalyzer
+
+    go_confidence = max(message.emotion_gratitude_score or 0.0, message.emotion_pride_score or 0.0)
+    return EmotionAnalyzer._calculate_hybrid_intensity(emotion_confidence, sentiment_confidence, go_confidence)
+
+
+class DeferredAnalysisUpdate:
+    """
+    Callback on_complete para analyze_complete_hybrid: cuando los análisis que quedaron
+    pendientes por el presupuesto de latencia terminan, completa el Message del turno.
+
+    El mensaje ya está guardado, pero la vista escribe el análisis parcial al final del turno
+    (ChatAPIView._persist_turn); para que ese UPDATE no pise el completo, el resultado se
+    escribe recién cuando la vista llamó a bind(). Si llegó antes, lo escribe bind().
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.message_id: Optional[int] = None
+        self.conversation_id: Optional[int] = None
+        self._fields: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def bind(self, message: Message):
+        """Después de guardar el análisis parcial: a partir de aquí el resultado se escribe directo"""
+        with self._lock:
+            self.message_id = message.pk
+            self.conversation_id = message.conversation_id
+            fields = self._fields
+        if fields is not None:
+            # Llegó antes que el análisis parcial; corre en el hilo de la petición
+            self._update(fields)
+
+    def __call__(self, hf_analysis: Dict):
+        resolved = resolve_hybrid_analysis(self.text, hf_analysis)
+        fields = message_fields_from_analysis(resolved)
+
+        with self._lock:
+            if self.message_id is None:
+                # La vista todavía no escribió el análisis parcial: lo aplica bind()
+                self._fields = fields
+                return
+
+        close_old_connections()
+        try:
+            self._update(fields)
+        finally:
+            close_old_connections()
+        print(f"[ANÁLISIS DIFERIDO] {resolved['primary_emotion']} ({resolved['primary_emotion_source']})")
+
+    def _update(self, fields: Dict):
+        updated = emotion_rollups.update_analysis(self.message_id, fields)
+        Conversation.touch(self.conversation_id)
+        print(f"[ANÁLISIS DIFERIDO] Mensaje {self.message_id} actualizado ({updated} fila/s)")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_translationcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='analysis_status',
+            field=models.CharField(choices=[('complete', 'Completo'), ('partial', 'Parcial'), ('pending', 'Pendiente')], default='complete', max_length=10),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupportResourceTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emotion', models.CharField(max_length=30)),
+                ('intensity', models.CharField(max_length=10)),
+                ('sentiment', models.CharField(max_length=15)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('variant', models.PositiveSmallIntegerField(default=0)),
+                ('resources', models.JSONField()),
+                ('source', models.CharField(choices=[('seed', 'Recursos base'), ('gemini', 'Generado con Gemini')], default='seed', max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('emotion', 'intensity', 'sentiment', 'version', 'variant'), name='supportresourcetemplate_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+
+def backfill_listing_fields(apps, schema_editor):
+    """Calcula message_count, last_message_at y last_message_preview en un solo UPDATE"""
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+
+    messages = Message.objects.filter(conversation=OuterRef('pk'))
+    counts = messages.order_by().values('conversation').annotate(total=Count('id')).values('total')
+    latest = messages.order_by('-timestamp', '-id')
+
+    Conversation.objects.update(
+        message_count=Coalesce(Subquery(counts), 0),
+        last_message_at=Subquery(latest.values('timestamp')[:1]),
+        last_message_preview=Coalesce(Substr(Subquery(latest.values('text')[:1]), 1, 200), Value('')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_supportresourcetemplate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', '-start_time', '-id'], name='chat_conv_user_start_idx'),
+        ),
+        migrations.RunPython(backfill_listing_fields, migrations.RunPython.noop),
+    ]
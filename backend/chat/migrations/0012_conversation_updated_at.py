@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:43
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Versión inicial: el último mensaje (o el inicio si la conversación está vacía)"""
+    Conversation = apps.get_model('chat', 'Conversation')
+    Conversation.objects.update(updated_at=Coalesce(F('last_message_at'), F('start_time')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_message_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', 'updated_at'], name='chat_conv_user_updated_idx'),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
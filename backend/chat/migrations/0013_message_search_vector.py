@@ -0,0 +1,41 @@
+# Columna generada y GIN para la búsqueda de texto completo (ver chat/search.py)
+
+from django.db import migrations
+
+TABLE = 'chat_message'
+INDEX = 'chat_msg_search_gin'
+
+
+def add_search_vector(apps, schema_editor):
+    """
+    Solo en PostgreSQL. Agregar la columna STORED reescribe la tabla (bloqueo exclusivo);
+    en tablas grandes conviene aplicarla en una ventana de mantenimiento. El índice se crea
+    con CONCURRENTLY para no bloquear las escrituras del chat mientras se construye.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('spanish', coalesce(text, ''))) STORED"
+    )
+    schema_editor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX} ON {TABLE} USING GIN (search_vector)")
+
+
+def remove_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX}")
+    schema_editor.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('chat', '0012_conversation_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, remove_search_vector),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    """Resumen inicial desde los mensajes existentes (consultas agrupadas, no fila por fila)"""
+    from chat.emotion_rollups import compute_rollups
+
+    Message = apps.get_model('chat', 'Message')
+    DailyEmotionRollup = apps.get_model('chat', 'DailyEmotionRollup')
+    # compute_rollups es el del código actual: los campos agregados después los llenan sus migraciones
+    fields = {field.name for field in DailyEmotionRollup._meta.get_fields()}
+    DailyEmotionRollup.objects.bulk_create(
+        [
+            DailyEmotionRollup(
+                student_id=student_id, day=day, **{name: value for name, value in values.items() if name in fields}
+            )
+            for (student_id, day), values in compute_rollups(Message.objects.all()).items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_message_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEmotionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('analyzed', models.PositiveIntegerField(default=0)),
+                ('dominant_emotion_counts', models.JSONField(default=dict)),
+                ('primary_emotion_counts', models.JSONField(default=dict)),
+                ('sentiment_counts', models.JSONField(default=dict)),
+                ('emotion_joy_score_sum', models.FloatField(default=0.0)),
+                ('emotion_sadness_score_sum', models.FloatField(default=0.0)),
+                ('emotion_anger_score_sum', models.FloatField(default=0.0)),
+                ('emotion_fear_score_sum', models.FloatField(default=0.0)),
+                ('emotion_disgust_score_sum', models.FloatField(default=0.0)),
+                ('emotion_surprise_score_sum', models.FloatField(default=0.0)),
+                ('emotion_others_score_sum', models.FloatField(default=0.0)),
+                ('emotion_gratitude_score_sum', models.FloatField(default=0.0)),
+                ('emotion_pride_score_sum', models.FloatField(default=0.0)),
+                ('sentiment_pos_score_sum', models.FloatField(default=0.0)),
+                ('sentiment_neg_score_sum', models.FloatField(default=0.0)),
+                ('sentiment_neu_score_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emotion_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'day'), name='chat_rollup_student_day_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
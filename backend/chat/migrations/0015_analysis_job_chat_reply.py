@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0014_daily_emotion_rollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysisjob',
+            name='kind',
+            field=models.CharField(choices=[('message_analysis', 'Análisis de mensaje'), ('conversation_summary', 'Resumen de conversación'), ('chat_reply', 'Respuesta del chat')], max_length=40),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:12
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_analyzed_sentiments(apps, schema_editor):
+    """Sentimientos de los mensajes con emoción primaria, por (estudiante, día), en una consulta agrupada"""
+    Message = apps.get_model('chat', 'Message')
+    DailyEmotionRollup = apps.get_model('chat', 'DailyEmotionRollup')
+
+    counts = {}
+    for row in (
+        Message.objects.filter(sender='user', primary_emotion__isnull=False, sentiment__isnull=False)
+        .annotate(day=TruncDate('timestamp'))
+        .order_by()
+        .values('conversation__user_id', 'day', 'sentiment')
+        .annotate(count=Count('id'))
+    ):
+        counts.setdefault((row['conversation__user_id'], row['day']), {})[row['sentiment']] = row['count']
+
+    rollups = []
+    for rollup in DailyEmotionRollup.objects.all().iterator():
+        rollup.analyzed_sentiment_counts = counts.get((rollup.student_id, rollup.day), {})
+        rollups.append(rollup)
+    DailyEmotionRollup.objects.bulk_update(rollups, ['analyzed_sentiment_counts'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0015_analysis_job_chat_reply'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyemotionrollup',
+            name='analyzed_sentiment_counts',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(backfill_analyzed_sentiments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def recompute_rollups(apps, schema_editor):
+    """Recalcula el resumen sin el análisis provisional de los mensajes pendientes"""
+    from chat.emotion_rollups import compute_rollups
+
+    Message = apps.get_model('chat', 'Message')
+    DailyEmotionRollup = apps.get_model('chat', 'DailyEmotionRollup')
+    fields = {field.name for field in DailyEmotionRollup._meta.get_fields()}
+    DailyEmotionRollup.objects.all().delete()
+    DailyEmotionRollup.objects.bulk_create(
+        [
+            DailyEmotionRollup(
+                student_id=student_id, day=day, **{name: value for name, value in values.items() if name in fields}
+            )
+            for (student_id, day), values in compute_rollups(Message.objects.all()).items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0016_daily_emotion_rollup_analyzed_sentiment'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_rollups, migrations.RunPython.noop),
+    ]
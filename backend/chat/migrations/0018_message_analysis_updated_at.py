@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0017_rollups_skip_pending_analyses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='analysis_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -2,17 +2,62 @@
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class Conversation(models.Model):
+    # Caracteres del último mensaje que se guardan para el listado
+    PREVIEW_LENGTH = 200
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     start_time = models.DateTimeField(auto_now_add=True)
+    # Resumen incremental de los mensajes que ya salieron de la ventana del prompt
+    summary = models.TextField(blank=True, default='')
+    summary_through_message_id = models.BigIntegerField(blank=True, null=True)  # Último mensaje incluido en el resumen
+
+    # === DATOS DEL LISTADO (desnormalizados, se actualizan al guardar mensajes) ===
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField(blank=True, null=True)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True, default='')
+    # Marca de versión para ETag/Last-Modified: cambia con cada mensaje nuevo o análisis que llega después
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Listado del estudiante paginado por cursor (start_time, id)
+            models.Index(fields=['user', '-start_time', '-id'], name='chat_conv_user_start_idx'),
+            # Max(updated_at) por estudiante o por curso (GET condicionales)
+            models.Index(fields=['user', 'updated_at'], name='chat_conv_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Conversation with {self.user.username} on {self.start_time.strftime('%Y-%m-%d')}"
 
+    @classmethod
+    def register_messages(cls, conversation_id, messages):
+        """Actualiza los datos del listado tras guardar `messages` (en orden) en la conversación"""
+        if not messages:
+            return
+        last = messages[-1]
+        cls.objects.filter(pk=conversation_id).update(
+            message_count=models.F('message_count') + len(messages),
+            last_message_at=last.timestamp,
+            last_message_preview=last.text[:cls.PREVIEW_LENGTH],
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def touch(cls, conversation_id):
+        """Cambia la versión de la conversación (p. ej. cuando un análisis termina después de guardar)"""
+        cls.objects.filter(pk=conversation_id).update(updated_at=timezone.now())
+
 
 class Message(models.Model):
+    # Estado del análisis emocional (presupuesto de latencia del chat)
+    ANALYSIS_COMPLETE = 'complete'
+    ANALYSIS_PARTIAL = 'partial'
+    ANALYSIS_PENDING = 'pending'
+
     conversation = models.ForeignKey(Conversation, related_name='messages', on_delete=models.CASCADE)
     text = models.TextField()
     sender = models.CharField(max_length=10, choices=[('user', 'User'), ('bot', 'Bot')])
@@ -51,6 +96,20 @@ class Message(models.Model):
     sentiment_pos_score = models.FloatField(blank=True, null=True)
     sentiment_neg_score = models.FloatField(blank=True, null=True)
     sentiment_neu_score = models.FloatField(blank=True, null=True)
+
+    # 'partial'/'pending' si el presupuesto de latencia se agotó y el resto se completa en segundo plano
+    analysis_status = models.CharField(
+        max_length=10,
+        choices=[
+            (ANALYSIS_COMPLETE, 'Completo'),
+            (ANALYSIS_PARTIAL, 'Parcial'),
+            (ANALYSIS_PENDING, 'Pendiente'),
+        ],
+        default=ANALYSIS_COMPLETE
+    )
+    # Cuándo llegó el análisis si se escribió después de guardar el mensaje (diferido o cola);
+    # la sincronización con ?since= reenvía los mensajes que el cliente ya tenía
+    analysis_updated_at = models.DateTimeField(blank=True, null=True)
     
     # === SISTEMA DE RECURSOS DE APOYO ===
     needs_support = models.BooleanField(default=False)  # Si requiere recursos de ayuda
@@ -63,10 +122,63 @@ class Message(models.Model):
     support_resources_offered = models.BooleanField(default=False)  # Si se ofrecieron recursos
     support_resources = models.JSONField(blank=True, null=True)  # Recursos generados por IA
 
+    class Meta:
+        indexes = [
+            # Historial de una conversación paginado por cursor (timestamp, id) y sincronización con ?since=
+            models.Index(fields=['conversation', 'timestamp', 'id'], name='chat_msg_conv_ts_idx'),
+        ]
+
     def __str__(self):
         return f"[{self.timestamp.strftime('%Y-%m-%d %H:%M')}] {self.sender}: {self.text[:50]}"
 
 
+class DailyEmotionRollup(models.Model):
+    """
+    Resumen diario (estudiante, día) de los mensajes del estudiante, mantenido por
+    chat.emotion_rollups al guardar y analizar mensajes. Los dashboards, el reporte PDF y las
+    recomendaciones por curso leen de aquí en lugar de agregar Message.
+    Se reconstruye con `python manage.py rebuild_emotion_rollups`.
+    """
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='emotion_rollups', on_delete=models.CASCADE)
+    day = models.DateField()  # Fecha local (TIME_ZONE) del mensaje
+
+    entries = models.PositiveIntegerField(default=0)  # Mensajes del estudiante
+    analyzed = models.PositiveIntegerField(default=0)  # Mensajes con emoción primaria y análisis no pendiente
+
+    # Conteos por etiqueta, p. ej. {"joy": 3, "sadness": 1}; no cuentan los valores nulos ni los
+    # mensajes con análisis pendiente (resultado provisional)
+    dominant_emotion_counts = models.JSONField(default=dict)
+    primary_emotion_counts = models.JSONField(default=dict)
+    sentiment_counts = models.JSONField(default=dict)
+    # Sentimientos solo de los mensajes con emoción primaria (recomendaciones por curso)
+    analyzed_sentiment_counts = models.JSONField(default=dict)
+
+    # Sumas de los puntajes (promedio = suma / analyzed)
+    emotion_joy_score_sum = models.FloatField(default=0.0)
+    emotion_sadness_score_sum = models.FloatField(default=0.0)
+    emotion_anger_score_sum = models.FloatField(default=0.0)
+    emotion_fear_score_sum = models.FloatField(default=0.0)
+    emotion_disgust_score_sum = models.FloatField(default=0.0)
+    emotion_surprise_score_sum = models.FloatField(default=0.0)
+    emotion_others_score_sum = models.FloatField(default=0.0)
+    emotion_gratitude_score_sum = models.FloatField(default=0.0)
+    emotion_pride_score_sum = models.FloatField(default=0.0)
+    sentiment_pos_score_sum = models.FloatField(default=0.0)
+    sentiment_neg_score_sum = models.FloatField(default=0.0)
+    sentiment_neu_score_sum = models.FloatField(default=0.0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # También es el índice de las lecturas por estudiante y rango de días
+            models.UniqueConstraint(fields=['student', 'day'], name='chat_rollup_student_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} {self.day}: {self.entries} mensajes"
+
+
 class CourseEmotionRecommendation(models.Model):
     """
     Registro de recomendaciones generadas por IA para profesores sobre la dinámica emocional de un curso.
@@ -101,3 +213,114 @@ class CourseEmotionRecommendation(models.Model):
 
     def __str__(self):
         return f"{self.course.code} - {self.triggered_emotion} ({self.created_at.date()})"
+
+
+class TranslationCacheEntry(models.Model):
+    """
+    Traducciones ES→EN ya realizadas para la rama GoEmotions.
+    Respaldo persistente de la memoización en memoria de chat.translation.TranslationService.
+    """
+    source_hash = models.CharField(max_length=64, unique=True)  # sha256(src:dest:texto)
+    source_lang = models.CharField(max_length=10, default='es')
+    dest_lang = models.CharField(max_length=10, default='en')
+    source_text = models.TextField()
+    translated_text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"[{self.source_lang}→{self.dest_lang}] {self.source_text[:50]}"
+
+
+class AnalysisJob(models.Model):
+    """
+    Trabajo en la cola persistente de análisis (sin broker externo).
+    Lo drena `python manage.py process_analysis_jobs` con SELECT ... FOR UPDATE SKIP LOCKED.
+    Ver chat.job_queue.
+    """
+    KIND_MESSAGE_ANALYSIS = 'message_analysis'
+    KIND_CONVERSATION_SUMMARY = 'conversation_summary'
+    KIND_CHAT_REPLY = 'chat_reply'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    kind = models.CharField(
+        max_length=40,
+        choices=[
+            (KIND_MESSAGE_ANALYSIS, 'Análisis de mensaje'),
+            (KIND_CONVERSATION_SUMMARY, 'Resumen de conversación'),
+            (KIND_CHAT_REPLY, 'Respuesta del chat'),
+        ]
+    )
+    message = models.ForeignKey(
+        Message,
+        related_name='analysis_jobs',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=[
+            (STATUS_QUEUED, 'En cola'),
+            (STATUS_RUNNING, 'En proceso'),
+            (STATUS_DONE, 'Terminado'),
+            (STATUS_FAILED, 'Fallido'),
+        ],
+        default=STATUS_QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    available_at = models.DateTimeField(default=timezone.now)  # No se toma antes (reintentos con backoff)
+    locked_until = models.DateTimeField(blank=True, null=True)  # Visibilidad: pasado este instante otro worker lo retoma
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='analysisjob_status_avail_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status}, intento {self.attempts}/{self.max_attempts})"
+
+
+class SupportResourceTemplate(models.Model):
+    """
+    Pool pregenerado de recursos de apoyo por clave (emoción, intensidad, sentimiento).
+    Lo llena `python manage.py build_support_resource_pool`; el chat sirve la versión
+    SUPPORT_RESOURCES_POOL_VERSION sin llamar a Gemini (ver SupportResourcesGenerator).
+    """
+    SOURCE_SEED = 'seed'
+    SOURCE_GEMINI = 'gemini'
+
+    emotion = models.CharField(max_length=30)  # Etiqueta en español (EMOTION_MAPPING)
+    intensity = models.CharField(max_length=10)  # alta | media | baja
+    sentiment = models.CharField(max_length=15)  # negativo | neutral | positivo
+    version = models.PositiveIntegerField(default=1)
+    variant = models.PositiveSmallIntegerField(default=0)
+    resources = models.JSONField()  # techniques, supportive_message, educational_insight
+    source = models.CharField(
+        max_length=10,
+        choices=[(SOURCE_SEED, 'Recursos base'), (SOURCE_GEMINI, 'Generado con Gemini')],
+        default=SOURCE_SEED
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['emotion', 'intensity', 'sentiment', 'version', 'variant'],
+                name='supportresourcetemplate_key_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"v{self.version} {self.emotion}/{self.intensity}/{self.sentiment} #{self.variant} ({self.source})"
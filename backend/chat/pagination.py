@@ -0,0 +1,81 @@
+# backend/chat/pagination.py
+"""
+Paginación por cursor (keyset) sobre un campo de orden (fecha, o el ranking de la búsqueda)
+más el id como desempate.
+
+A diferencia de OFFSET, cada página es un rango del índice (fecha, id): el costo no crece con
+el número de página y no se saltan ni repiten filas cuando entran registros nuevos.
+El cursor es opaco para el cliente (base64 de "valor|id").
+"""
+import base64
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Cursor o límite mal formado enviado por el cliente."""
+
+
+def encode_cursor(value: Any, pk: int) -> str:
+    text = value.isoformat() if isinstance(value, datetime) else repr(value)
+    raw = f"{text}|{pk}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, parse: Callable[[str], Any] = datetime.fromisoformat) -> Tuple[Any, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|', 1)
+        return parse(value), int(pk)
+    except (ValueError, UnicodeError) as exc:
+        raise InvalidCursor("Cursor inválido") from exc
+
+
+def parse_limit(raw: Optional[str], default: int = DEFAULT_PAGE_SIZE) -> int:
+    if raw in (None, ''):
+        return default
+    try:
+        return max(1, min(int(raw), MAX_PAGE_SIZE))
+    except ValueError as exc:
+        raise InvalidCursor("limit debe ser un número entero") from exc
+
+
+def keyset_page(
+    queryset: QuerySet,
+    field: str,
+    cursor: Optional[str],
+    limit: Optional[int],
+    descending: bool = True,
+    parse: Callable[[str], Any] = datetime.fromisoformat
+) -> Tuple[List, Optional[str]]:
+    """
+    Una página de `queryset` ordenada por (field, id). Devuelve (filas, cursor siguiente);
+    el cursor es None en la última página. Funciona con instancias y con .values() (que debe
+    incluir field e id). `field` puede ser una anotación (p. ej. el ranking, con parse=float).
+    limit None: todas las filas desde el cursor, sin página siguiente.
+    """
+    if cursor:
+        value, pk = decode_cursor(cursor, parse)
+        if descending:
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+        else:
+            queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+
+    order = (f'-{field}', '-id') if descending else (field, 'id')
+    if limit is None:
+        return list(queryset.order_by(*order)), None
+    # Una fila de más indica si hay página siguiente sin un COUNT aparte
+    rows = list(queryset.order_by(*order)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    if isinstance(last, dict):
+        return rows, encode_cursor(last[field], last['id'])
+    return rows, encode_cursor(getattr(last, field), last.id)
@@ -0,0 +1,52 @@
+# backend/chat/prompt_budget.py
+"""
+Presupuesto de tokens para el prompt del chat.
+
+No se llama a count_tokens de Gemini en cada turno (sería otra ida y vuelta a la API): se
+estima con CHAT_PROMPT_CHARS_PER_TOKEN caracteres por token, que para español con el
+tokenizador de Gemini queda del lado conservador.
+"""
+import math
+from typing import Dict, List
+
+from django.conf import settings
+
+ELLIPSIS = '…'
+
+
+def chars_per_token() -> float:
+    return getattr(settings, 'CHAT_PROMPT_CHARS_PER_TOKEN', 3.5)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or '') / chars_per_token())
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Recorta el texto al presupuesto, en un límite de palabra"""
+    text = text or ''
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(1, int(max_tokens * chars_per_token()) - len(ELLIPSIS))
+    cut = text[:max_chars]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip() + ELLIPSIS
+
+
+def fit_history(turns: List[Dict], budget_tokens: int, max_message_tokens: int) -> List[Dict]:
+    """
+    Turnos (del más antiguo al más reciente) que entran en el presupuesto: se recorre desde el
+    más reciente, cada mensaje se recorta a max_message_tokens y se corta al agotar el presupuesto.
+    """
+    kept = []
+    used = 0
+    for turn in reversed(turns):
+        text = truncate_to_tokens(turn['text'], max_message_tokens)
+        cost = estimate_tokens(text)
+        if used + cost > budget_tokens:
+            break
+        kept.append({**turn, 'text': text})
+        used += cost
+    kept.reverse()
+    return kept
@@ -0,0 +1,122 @@
+# backend/chat/search.py
+"""
+Búsqueda de texto completo en las entradas de los estudiantes (Message.text).
+
+En PostgreSQL se usa la columna generada chat_message.search_vector
+(to_tsvector('spanish', text), STORED) con índice GIN, creada por la migración 0013:
+- websearch_to_tsquery('spanish', q): acepta frases entre comillas, OR y -palabra.
+- Resultados ordenados por ts_rank y paginados por cursor sobre (rank, id).
+- ts_headline marca las coincidencias; el texto se escapa antes de agregar <mark>, así el
+  cliente puede mostrarlo como HTML sin riesgo de inyección.
+
+La columna no se declara en el modelo (quedaría en todos los SELECT y no existe en otros
+motores); se referencia con RawSQL. Con otros motores (SQLite en desarrollo) se cae a un
+icontains ordenado por fecha, sin ranking.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Message
+from .pagination import keyset_page
+
+SEARCH_CONFIG = 'spanish'
+# Separadores de las coincidencias antes de escapar (no aparecen en texto normal)
+_START, _STOP = '\x02', '\x03'
+HEADLINE_OPTIONS = f'StartSel={_START}, StopSel={_STOP}, MaxWords=35, MinWords=15, MaxFragments=2'
+
+# Contexto alrededor de la primera coincidencia en el modo sin texto completo
+FALLBACK_CONTEXT_CHARS = 120
+
+MIN_QUERY_LENGTH = 2
+MAX_QUERY_LENGTH = 200
+
+
+def full_text_available() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def _highlight(headline: str) -> str:
+    return escape(headline).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def search_messages(queryset, query: str, cursor: Optional[str], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Busca `query` dentro de `queryset` (mensajes ya filtrados por permisos).
+    Devuelve (resultados, cursor siguiente).
+    """
+    if full_text_available():
+        return _search_postgres(queryset, query, cursor, limit)
+    return _search_fallback(queryset, query, cursor, limit)
+
+
+def _search_postgres(queryset, query, cursor, limit):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVectorField
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    search_vector = RawSQL(
+        f'{connection.ops.quote_name(Message._meta.db_table)}.{connection.ops.quote_name("search_vector")}',
+        (),
+        output_field=SearchVectorField(),
+    )
+    matches = (
+        queryset
+        .alias(search_vector=search_vector)
+        .filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F('search_vector'), search_query))
+    )
+    rows, next_cursor = keyset_page(
+        matches.values('id', 'conversation_id', 'conversation__user_id', 'timestamp', 'dominant_emotion', 'rank'),
+        'rank',
+        cursor,
+        limit,
+        parse=float,
+    )
+    if not rows:
+        return [], None
+
+    # ts_headline es caro: solo para los mensajes de la página
+    headlines = dict(
+        Message.objects.filter(id__in=[row['id'] for row in rows])
+        .annotate(headline=SearchHeadline('text', search_query, config=SEARCH_CONFIG, options=HEADLINE_OPTIONS))
+        .values_list('id', 'headline')
+    )
+    return [_result(row, _highlight(headlines.get(row['id'], ''))) for row in rows], next_cursor
+
+
+def _search_fallback(queryset, query, cursor, limit):
+    rows, next_cursor = keyset_page(
+        queryset.filter(text__icontains=query).values(
+            'id', 'conversation_id', 'conversation__user_id', 'timestamp', 'dominant_emotion', 'text'
+        ),
+        'timestamp',
+        cursor,
+        limit,
+    )
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
+    results = []
+    for row in rows:
+        row['rank'] = None
+        text = row.pop('text')
+        match = pattern.search(text)
+        start = max(0, match.start() - FALLBACK_CONTEXT_CHARS) if match else 0
+        snippet = text[start:start + 3 * FALLBACK_CONTEXT_CHARS]
+        marked = pattern.sub(lambda found: f'{_START}{found.group(0)}{_STOP}', snippet)
+        results.append(_result(row, _highlight(('…' if start else '') + marked)))
+    return results, next_cursor
+
+
+def _result(row: Dict, headline: str) -> Dict:
+    return {
+        'message_id': row['id'],
+        'conversation_id': row['conversation_id'],
+        'student_id': row['conversation__user_id'],
+        'timestamp': row['timestamp'],
+        'dominant_emotion': row['dominant_emotion'],
+        'rank': round(row['rank'], 4) if row['rank'] is not None else None,
+        'headline': headline,
+    }
@@ -20,8 +20,12 @@ class SupportResourcesSerializer(serializers.Serializer):
 
 
 class ChatResponseSerializer(serializers.Serializer):
-    bot_response = serializers.CharField()
+    # null en modo asíncrono: la respuesta llega por messages/<id>/analysis/ (reply_status)
+    bot_response = serializers.CharField(allow_null=True)
+    reply_status = serializers.CharField(required=False)
     conversation_id = serializers.IntegerField()
+    # Para consultar el análisis en messages/<id>/analysis/ (modo asíncrono)
+    user_message_id = serializers.IntegerField(required=False)
 
     class EmotionalInsightSerializer(serializers.Serializer):
         primary_emotion = serializers.CharField()
@@ -37,6 +41,9 @@ class ChatResponseSerializer(serializers.Serializer):
             child=SecondaryEmotionSerializer(),
             required=False
         )
+        # complete | partial | pending: los análisis pendientes se completan en segundo plano
+        analysis_status = serializers.CharField(required=False)
+        pending_analyses = serializers.ListField(child=serializers.CharField(), required=False)
 
     emotional_insight = EmotionalInsightSerializer()
 
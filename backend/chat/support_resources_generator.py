@@ -1,13 +1,19 @@
 # backend/chat/support_resources_generator.py
 
-import google.generativeai as genai
-import os
+import copy
 import json
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime
 
-# Configurar Gemini
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-2.5-flash')
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from . import llm_client
+from .llm_admission import acquire_slot
+from .models import SupportResourceTemplate
 
 
 class SupportResourcesGenerator:
@@ -24,8 +30,35 @@ class SupportResourcesGenerator:
     
     NEGATIVE_EMOTIONS = ['sadness', 'fear', 'anger', 'disgust']
     
+    # Campos de los recursos que se guardan en el pool (el resto es metadata por mensaje)
+    POOL_RESOURCE_FIELDS = ('techniques', 'supportive_message', 'educational_insight')
+    
     def __init__(self):
-        self.model = model
+        self.timeout = getattr(settings, 'SUPPORT_RESOURCES_TIMEOUT_SECONDS', 15)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        # Pool pregenerado (SupportResourceTemplate), cacheado en memoria del proceso
+        self.pool_enabled = getattr(settings, 'SUPPORT_RESOURCES_POOL_ENABLED', True)
+        self.pool_version = getattr(settings, 'SUPPORT_RESOURCES_POOL_VERSION', 1)
+        self.pool_refresh_seconds = getattr(settings, 'SUPPORT_RESOURCES_POOL_REFRESH_SECONDS', 300)
+        self.personalize = getattr(settings, 'SUPPORT_RESOURCES_PERSONALIZE', False)
+        self.personalize_timeout = getattr(settings, 'SUPPORT_RESOURCES_PERSONALIZE_TIMEOUT_SECONDS', 4)
+        self._pool = None
+        self._pool_loaded_at = 0.0
+        self._pool_lock = threading.Lock()
+        self._pool_counters = {'hits': 0, 'misses': 0, 'personalized': 0}
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Pool propio: la generación de recursos corre en paralelo a la respuesta del chat"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=getattr(settings, 'SUPPORT_RESOURCES_MAX_WORKERS', 4),
+                        thread_name_prefix='support-resources'
+                    )
+        return self._executor
     
     def requires_support(self, analysis):
         """
@@ -82,7 +115,128 @@ class SupportResourcesGenerator:
             'total_analyzed': len(recent_messages)
         }
     
-    def generate_support_resources(self, text, emotion, intensity, sentiment):
+    def start_support_resources(self, text, emotion, intensity, sentiment, user_id=None) -> Future:
+        """
+        Lanza generate_support_resources en segundo plano con su propio timeout.
+        El resultado se recoge con collect_support_resources.
+        """
+        future = self._get_executor().submit(
+            self._generate_in_thread, text, emotion, intensity, sentiment, self.timeout, True, user_id
+        )
+        future.started_at = time.monotonic()
+        future.fallback_args = (emotion, intensity)
+        return future
+    
+    def collect_support_resources(self, future: Future):
+        """Espera los recursos lanzados con start_support_resources; al agotar el timeout usa el respaldo"""
+        remaining = max(0.0, future.started_at + self.timeout - time.monotonic())
+        try:
+            return future.result(timeout=remaining)
+        except FuturesTimeoutError:
+            print(f"[SUPPORT] Tiempo agotado ({self.timeout}s), usando recursos de respaldo")
+            return self._get_fallback_resources(*future.fallback_args)
+    
+    def _generate_in_thread(self, *args):
+        try:
+            return self.generate_support_resources(*args)
+        finally:
+            # Hilo del pool: no retiene la conexión a la base de datos (lectura del pool)
+            close_old_connections()
+    
+    # ------------------------------------------------------------------
+    # Pool pregenerado
+    # ------------------------------------------------------------------
+    @staticmethod
+    def pool_key(emotion, intensity, sentiment):
+        return (str(emotion).lower(), str(intensity).lower(), str(sentiment).lower())
+    
+    @classmethod
+    def template_resources(cls, resources):
+        """Lo que se guarda en SupportResourceTemplate.resources"""
+        return {field: resources[field] for field in cls.POOL_RESOURCE_FIELDS if field in resources}
+    
+    def _load_pool(self):
+        """Plantillas activas de la versión vigente por clave; se recargan cada pool_refresh_seconds"""
+        now = time.monotonic()
+        with self._pool_lock:
+            if self._pool is not None and now < self._pool_loaded_at + self.pool_refresh_seconds:
+                return self._pool
+        
+        pool = {}
+        try:
+            templates = SupportResourceTemplate.objects.filter(
+                version=self.pool_version, is_active=True
+            ).values('id', 'emotion', 'intensity', 'sentiment', 'resources')
+            for template in templates:
+                key = self.pool_key(template['emotion'], template['intensity'], template['sentiment'])
+                pool.setdefault(key, []).append(template)
+        except DatabaseError as e:
+            print(f"[SUPPORT] No se pudo cargar el pool de recursos: {e}")
+        
+        with self._pool_lock:
+            self._pool = pool
+            self._pool_loaded_at = now
+        return pool
+    
+    def _resources_from_pool(self, text, emotion, intensity, sentiment, user_id=None):
+        templates = self._load_pool().get(self.pool_key(emotion, intensity, sentiment))
+        with self._pool_lock:
+            self._pool_counters['hits' if templates else 'misses'] += 1
+        if not templates:
+            return None
+        
+        template = random.choice(templates)
+        resources = copy.deepcopy(template['resources'])
+        if self.personalize:
+            resources['supportive_message'] = self._personalize_message(
+                text, emotion, resources.get('supportive_message', ''), user_id
+            )
+        resources['generated_at'] = datetime.now().isoformat()
+        resources['emotion_context'] = {
+            'emotion': emotion,
+            'intensity': intensity,
+            'sentiment': sentiment
+        }
+        resources['pool_template_id'] = template['id']
+        resources['pool_version'] = self.pool_version
+        return resources
+    
+    def _personalize_message(self, text, emotion, base_message, user_id=None):
+        """Solo reescribe supportive_message (respuesta corta); ante cualquier error queda el del pool"""
+        prompt = f"""MENSAJE DEL ESTUDIANTE:
+"{text}"
+
+EMOCIÓN DETECTADA: {emotion}
+
+MENSAJE DE APOYO BASE:
+"{base_message}"
+"""
+        try:
+            # Turno marcado por requires_support: prioridad en el control de admisión
+            with acquire_slot(llm_client.PURPOSE_SUPPORT_MESSAGE, user_id=user_id, priority=True,
+                              max_wait=self.personalize_timeout):
+                response = llm_client.generate(
+                    llm_client.PURPOSE_SUPPORT_MESSAGE, prompt, timeout=self.personalize_timeout
+                )
+            message = response.text.strip().strip('"')
+        except Exception as e:
+            print(f"[SUPPORT] No se pudo personalizar el mensaje: {e}")
+            return base_message
+        if not message:
+            return base_message
+        with self._pool_lock:
+            self._pool_counters['personalized'] += 1
+        return message
+    
+    def pool_stats(self):
+        with self._pool_lock:
+            stats = dict(self._pool_counters)
+            stats['keys'] = len(self._pool) if self._pool is not None else None
+        stats['enabled'] = self.pool_enabled
+        stats['version'] = self.pool_version
+        return stats
+    
+    def generate_support_resources(self, text, emotion, intensity, sentiment, timeout=None, use_pool=True, user_id=None):
         """
         Genera recursos de apoyo contextuales usando IA (Gemini).
         
@@ -91,63 +245,33 @@ class SupportResourcesGenerator:
             emotion: Emoción detectada (en español)
             intensity: Intensidad (low/medium/high)
             sentiment: Sentimiento (positivo/negativo/neutral)
+            timeout: Timeout de la llamada a Gemini en segundos (opcional)
+            use_pool: Servir desde el pool pregenerado si hay plantillas para la clave
+            user_id: Estudiante (reparto justo de cupos en chat.llm_admission)
             
         Returns:
             dict: Recursos generados con técnicas y mensaje de apoyo
         """
+        if use_pool and self.pool_enabled:
+            resources = self._resources_from_pool(text, emotion, intensity, sentiment, user_id)
+            if resources is not None:
+                return resources
         
-        prompt = f"""Eres un asistente educativo de inteligencia emocional para estudiantes de 12 a 18 años.
-
-SITUACIÓN DETECTADA:
+        
+        # Las instrucciones y el formato JSON van como system_instruction (prompts.SUPPORT_RESOURCES_SYSTEM_INSTRUCTION)
+        prompt = f"""SITUACIÓN DETECTADA:
 - Mensaje del estudiante: "{text}"
 - Emoción identificada: {emotion}
 - Intensidad: {intensity}
 - Sentimiento general: {sentiment}
 
-TAREA:
-Genera recursos de apoyo emocional apropiados en formato JSON. Debes proporcionar:
-
-1. **techniques**: Lista de 2-3 técnicas prácticas (cada una con título y pasos)
-2. **supportive_message**: Un mensaje empático y de apoyo (2-3 oraciones máximo)
-3. **educational_insight**: Una breve explicación educativa sobre la emoción (1-2 oraciones)
-
-TIPOS DE TÉCNICAS A SUGERIR:
-- **Respiración**: Ejercicios de respiración consciente (ej: 4-7-8, respiración cuadrada)
-- **Grounding**: Técnicas de anclaje al presente (ej: 5-4-3-2-1, observación consciente)
-- **Journaling**: Escritura reflexiva o expresiva
-- **Movimiento**: Actividad física suave (caminar, estiramiento)
-- **Contacto**: Hablar con alguien de confianza
-
-IMPORTANTE:
-- Usa lenguaje cercano para adolescentes (sin ser condescendiente)
-- Sé breve y práctico
-- Todas las emociones son válidas
-- No des terapia, solo educación emocional
-- No minimices lo que sienten
-- Enfócate en dar herramientas, no soluciones
-
-FORMATO DE SALIDA (JSON estricto, sin comentarios):
-{{
-  "techniques": [
-    {{
-      "type": "breathing|grounding|journaling|movement|contact",
-      "title": "Título corto",
-      "steps": [
-        "Paso 1",
-        "Paso 2",
-        "Paso 3"
-      ],
-      "duration": "1-2 minutos|5 minutos|10 minutos"
-    }}
-  ],
-  "supportive_message": "Mensaje empático validando la emoción",
-  "educational_insight": "Breve explicación educativa sobre la emoción"
-}}
-
 GENERA SOLO EL JSON, SIN TEXTO ADICIONAL:"""
 
         try:
-            response = self.model.generate_content(prompt)
+            # Si el circuito de Gemini está abierto se lanza CircuitOpenError -> fallback inmediato
+            # Sin cupo (LLMAdmissionRejected) también se usan los recursos de respaldo
+            with acquire_slot(llm_client.PURPOSE_SUPPORT_RESOURCES, user_id=user_id, priority=True, max_wait=timeout):
+                response = llm_client.generate(llm_client.PURPOSE_SUPPORT_RESOURCES, prompt, timeout=timeout)
             response_text = response.text.strip()
             
             # Limpiar respuesta (remover markdown si existe)
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat import emotion_rollups
+from chat.models import Conversation, Message
+from chat.pagination import DEFAULT_PAGE_SIZE
+from chat.views import ChatAPIView
+
+from .utils import make_user
+
+CHAT_URL = '/api/v1/chat/'
+
+
+class ChatHistoryTests(TestCase):
+
+    def setUp(self):
+        self.student = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def add_messages(self, conversation, count, start):
+        messages = []
+        for index in range(count):
+            message = Message.objects.create(
+                conversation=conversation, sender='user' if index % 2 == 0 else 'bot', text=f'mensaje {index}',
+            )
+            Message.objects.filter(pk=message.pk).update(timestamp=start + timedelta(minutes=index))
+            messages.append(message)
+        Conversation.register_messages(conversation.id, messages)
+        return messages
+
+    def get(self, **params):
+        response = self.client.get(CHAT_URL, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_history_without_parameters_returns_every_message(self):
+        conversation = Conversation.objects.create(user=self.student)
+        messages = self.add_messages(conversation, ChatAPIView.HISTORY_PAGE_SIZE + 10, timezone.now() - timedelta(days=1))
+
+        data = self.get(conversation_id=conversation.id)
+
+        self.assertEqual([row['id'] for row in data['messages']], [message.id for message in messages])
+        self.assertIsNone(data['next_cursor'])
+        self.assertIsNotNone(data['sync_cursor'])
+
+    def test_history_pages_follow_next_cursor(self):
+        conversation = Conversation.objects.create(user=self.student)
+        messages = self.add_messages(conversation, 25, timezone.now() - timedelta(days=1))
+
+        latest = self.get(conversation_id=conversation.id, limit=10)
+        self.assertEqual([row['id'] for row in latest['messages']], [message.id for message in messages[-10:]])
+
+        seen = latest['messages']
+        cursor = latest['next_cursor']
+        while cursor:
+            page = self.get(conversation_id=conversation.id, limit=10, cursor=cursor)
+            seen = page['messages'] + seen
+            cursor = page['next_cursor']
+        self.assertEqual([row['id'] for row in seen], [message.id for message in messages])
+
+    def test_conversation_list_without_parameters_returns_every_conversation(self):
+        for _ in range(DEFAULT_PAGE_SIZE + 5):
+            Conversation.objects.create(user=self.student)
+
+        data = self.get()
+        self.assertEqual(len(data['conversations']), DEFAULT_PAGE_SIZE + 5)
+        self.assertIsNone(data['next_cursor'])
+
+        page = self.get(limit=DEFAULT_PAGE_SIZE)
+        self.assertEqual(len(page['conversations']), DEFAULT_PAGE_SIZE)
+        self.assertIsNotNone(page['next_cursor'])
+
+    def test_since_returns_analyses_that_arrived_after_the_sync(self):
+        conversation = Conversation.objects.create(user=self.student)
+        pending, _ = self.add_messages(conversation, 2, timezone.now() - timedelta(minutes=5))
+        Message.objects.filter(pk=pending.pk).update(analysis_status=Message.ANALYSIS_PENDING)
+        synced = self.get(conversation_id=conversation.id)
+
+        emotion_rollups.update_analysis(pending.pk, {
+            'dominant_emotion': 'sadness', 'primary_emotion': 'sadness', 'sentiment': 'NEG',
+            'analysis_status': Message.ANALYSIS_COMPLETE,
+        })
+        Conversation.touch(conversation.id)
+
+        delta = self.get(conversation_id=conversation.id, since=synced['sync_cursor'])
+        self.assertEqual(delta['messages'], [])
+        self.assertEqual([row['id'] for row in delta['updated_messages']], [pending.id])
+        self.assertEqual(delta['updated_messages'][0]['analysis']['dominant_emotion'], 'tristeza')
+
+        # Cuando el cursor pasa a un mensaje posterior al análisis ya no se reenvía
+        newer = self.add_messages(conversation, 1, timezone.now() + timedelta(minutes=1))
+        later = self.get(conversation_id=conversation.id, since=delta['sync_cursor'])
+        self.assertEqual([row['id'] for row in later['messages']], [newer[0].id])
+        latest = self.get(conversation_id=conversation.id, since=later['sync_cursor'])
+        self.assertEqual((latest['messages'], latest['updated_messages']), ([], []))
@@ -0,0 +1,90 @@
+import json
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from chat import llm_client
+from chat.llm_fakes import DEFAULT_REPLY
+from chat.models import Conversation, Message
+from chat.views import ChatAPIView
+
+from .utils import FakeBackendsMixin, make_user
+
+STREAM_URL = '/api/v1/chat/stream/'
+
+
+def read_events(response):
+    """[(evento, datos)] de una respuesta text/event-stream"""
+    body = b''.join(response.streaming_content).decode('utf-8')
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+class ChatStreamTests(FakeBackendsMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_streams_tokens_then_saves_the_turn(self):
+        response = self.client.post(STREAM_URL, {'text': 'Hoy me fue mal en el examen'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/event-stream'))
+        events = read_events(response)
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], 'start')
+        self.assertEqual(names[-2:], ['insight', 'done'])
+        self.assertGreater(names.count('token'), 1)
+
+        streamed = ''.join(data['text'] for name, data in events if name == 'token')
+        self.assertEqual(streamed, DEFAULT_REPLY)
+
+        insight = events[-2][1]
+        self.assertEqual(insight['bot_response'], DEFAULT_REPLY)
+        conversation = Conversation.objects.get(user=self.student)
+        self.assertEqual(insight['conversation_id'], conversation.id)
+        self.assertEqual(events[0][1]['conversation_id'], conversation.id)
+        self.assertEqual(
+            list(conversation.messages.order_by('id').values_list('sender', 'text')),
+            [('user', 'Hoy me fue mal en el examen'), ('bot', DEFAULT_REPLY)],
+        )
+        self.assertEqual(insight['user_message_id'], conversation.messages.get(sender='user').id)
+
+    def test_model_error_streams_the_fallback_reply(self):
+        with mock.patch.object(llm_client, 'stream', side_effect=RuntimeError('sin conexión')):
+            response = self.client.post(STREAM_URL, {'text': 'Hola'}, format='json')
+            events = read_events(response)
+
+        tokens = [data['text'] for name, data in events if name == 'token']
+        self.assertEqual(tokens, [ChatAPIView.GEMINI_FALLBACK_TEXT])
+        self.assertTrue(Message.objects.filter(sender='bot', text=ChatAPIView.GEMINI_FALLBACK_TEXT).exists())
+
+    def test_client_disconnect_still_saves_the_turn(self):
+        response = self.client.post(STREAM_URL, {'text': 'Hoy me fue mal en el examen'}, format='json')
+        stream = iter(response.streaming_content)
+        self.assertTrue(next(stream).startswith(b'event: start'))
+        first_token = next(stream).decode('utf-8')
+        self.assertTrue(first_token.startswith('event: token'))
+
+        # Lo que hace el servidor WSGI al cortarse la conexión: cierra la respuesta y su generador
+        with self.captureOnCommitCallbacks(execute=True):
+            response.close()
+
+        user_message = Message.objects.get(sender='user')
+        self.assertEqual(user_message.analysis_status, Message.ANALYSIS_COMPLETE)
+        bot_message = Message.objects.get(sender='bot')
+        self.assertEqual(bot_message.text, json.loads(first_token.split('data: ', 1)[1])['text'])
+        self.assertEqual(Conversation.objects.get(user=self.student).message_count, 2)
+
+    def test_validation_errors_are_plain_responses(self):
+        response = self.client.post(STREAM_URL, {'text': ''}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Conversation.objects.exists())
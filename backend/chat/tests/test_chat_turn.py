@@ -0,0 +1,64 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from chat.emotion_analyzer import SENTIMENT_MAPPING
+from chat.llm_admission import LLMAdmissionRejected
+from chat.llm_fakes import DEFAULT_REPLY
+from chat.models import Conversation, DailyEmotionRollup, Message
+from chat.views import ChatAPIView
+
+from .utils import FakeBackendsMixin, make_user
+
+CHAT_URL = '/api/v1/chat/'
+
+
+class ChatTurnPersistenceTests(FakeBackendsMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_turn_saves_both_messages_with_the_analysis(self):
+        response = self.client.post(CHAT_URL, {'text': 'Hoy me siento bien'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        user_message = Message.objects.get(pk=response.data['user_message_id'])
+        self.assertEqual(user_message.analysis_status, Message.ANALYSIS_COMPLETE)
+        self.assertEqual(
+            response.data['user_message_analysis']['sentiment']['dominant'],
+            SENTIMENT_MAPPING[user_message.sentiment],
+        )
+        conversation = Conversation.objects.get(pk=response.data['conversation_id'])
+        self.assertEqual(conversation.message_count, 2)
+        self.assertEqual(conversation.last_message_preview, DEFAULT_REPLY[:Conversation.PREVIEW_LENGTH])
+
+        rollup = DailyEmotionRollup.objects.get(student=self.student)
+        self.assertEqual(rollup.entries, 1)
+        self.assertEqual(rollup.sentiment_counts, {user_message.sentiment: 1})
+        self.assertEqual(rollup.primary_emotion_counts, {user_message.primary_emotion: 1})
+
+    def test_message_is_kept_when_generation_fails(self):
+        with mock.patch.object(ChatAPIView, '_generate_gemini_response', side_effect=RuntimeError('caída')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(CHAT_URL, {'text': 'No quiero perder esto'}, format='json')
+
+        message = Message.objects.get()
+        self.assertEqual((message.sender, message.text), ('user', 'No quiero perder esto'))
+        self.assertEqual(message.conversation.message_count, 1)
+        self.assertEqual(DailyEmotionRollup.objects.get(student=self.student).entries, 1)
+
+    def test_rejected_turn_keeps_the_message_and_reports_it(self):
+        rejected = LLMAdmissionRejected('queue_full', retry_after=3)
+        with mock.patch('chat.views.acquire_slot', side_effect=rejected):
+            response = self.client.post(CHAT_URL, {'text': 'Hola'}, format='json')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3')
+        message = Message.objects.get()
+        self.assertEqual(response.data['user_message_id'], message.id)
+        self.assertEqual(response.data['conversation_id'], message.conversation_id)
+        self.assertEqual(message.analysis_status, Message.ANALYSIS_COMPLETE)
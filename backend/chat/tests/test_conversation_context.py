@@ -0,0 +1,127 @@
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from chat import conversation_context
+from chat.models import AnalysisJob, Conversation, Message
+
+from .utils import FakeBackendsMixin, make_user
+
+CHAT_URL = '/api/v1/chat/'
+
+# Cada "proceso" con su propia LocMemCache: lo que escribe el worker no lo ve la vista
+SEPARATE_PROCESS_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'context-web'},
+    'worker': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'context-worker'},
+}
+
+
+class SeparateProcessContextTests(FakeBackendsMixin, TestCase):
+    """La vista y el worker de process_analysis_jobs con cachés distintas, como con varios procesos"""
+
+    def setUp(self):
+        super().setUp()
+        overrides = override_settings(CACHES=SEPARATE_PROCESS_CACHES, CHAT_ASYNC_ANALYSIS=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for alias in SEPARATE_PROCESS_CACHES:
+            caches[alias].clear()
+            self.addCleanup(caches[alias].clear)
+        self.student = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def send(self, text, conversation_id=None):
+        data = {'text': text}
+        if conversation_id:
+            data['conversation_id'] = conversation_id
+        response = self.client.post(CHAT_URL, data, format='json')
+        self.assertEqual(response.status_code, 202)
+        return response.data
+
+    def run_worker_process(self):
+        with override_settings(CHAT_CONTEXT_CACHE_ALIAS='worker'), self.captureOnCommitCallbacks(execute=True):
+            call_command('process_analysis_jobs', '--once', stdout=StringIO())
+
+    def cached_context(self, conversation_id):
+        return caches['default'].get(conversation_context._key(conversation_id))
+
+    def test_worker_analysis_reaches_the_web_context(self):
+        first = self.send('Estoy preocupado por el examen')
+        conversation_id = first['conversation_id']
+        # El segundo turno deja en la caché de la vista el primer mensaje con análisis pendiente
+        self.send('Y anoche no dormí nada', conversation_id)
+        pending = self.cached_context(conversation_id)['emotions'][0]
+        self.assertEqual(pending['id'], first['user_message_id'])
+        self.assertEqual(pending['status'], Message.ANALYSIS_PENDING)
+
+        self.run_worker_process()
+
+        context = conversation_context.get_context(Conversation.objects.get(pk=conversation_id))
+        analyzed = {
+            row['id']: row
+            for row in Message.objects.filter(sender='user').values('id', 'primary_emotion', 'sentiment', 'analysis_status')
+        }
+        self.assertEqual(analyzed[first['user_message_id']]['analysis_status'], Message.ANALYSIS_COMPLETE)
+        for entry in context['emotions']:
+            row = analyzed[entry['id']]
+            self.assertEqual(
+                (entry['emotion'], entry['sentiment'], entry['status']),
+                (row['primary_emotion'], row['sentiment'], row['analysis_status']),
+            )
+        self.assertEqual(self.cached_context(conversation_id)['emotions'], context['emotions'])
+
+
+class SeparateProcessSummaryTests(FakeBackendsMixin, TestCase):
+    """El resumen lo guarda el worker: la vista lo toma de Conversation y no vuelve a encolarlo"""
+
+    def setUp(self):
+        super().setUp()
+        overrides = override_settings(
+            CACHES=SEPARATE_PROCESS_CACHES, CHAT_SUMMARY_ENABLED=True, CHAT_SUMMARY_EVERY_TURNS=2,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for alias in SEPARATE_PROCESS_CACHES:
+            caches[alias].clear()
+            self.addCleanup(caches[alias].clear)
+        self.student = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.conversation_id = None
+
+    def send(self, text):
+        data = {'text': text}
+        if self.conversation_id:
+            data['conversation_id'] = self.conversation_id
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(CHAT_URL, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.conversation_id = response.data['conversation_id']
+
+    def summary_jobs(self):
+        return AnalysisJob.objects.filter(kind=AnalysisJob.KIND_CONVERSATION_SUMMARY)
+
+    def test_summary_written_by_the_worker_is_not_requeued(self):
+        for turn in range(5):
+            self.send(f'Mensaje número {turn}')
+        # 10 mensajes: 4 quedaron fuera de la ventana del prompt sin resumir
+        self.assertEqual(self.summary_jobs().count(), 1)
+
+        with override_settings(CHAT_CONTEXT_CACHE_ALIAS='worker'):
+            call_command('process_analysis_jobs', '--once', stdout=StringIO())
+        conversation = Conversation.objects.get(pk=self.conversation_id)
+        self.assertTrue(conversation.summary)
+        self.assertEqual(self.summary_jobs().get().status, AnalysisJob.STATUS_DONE)
+
+        self.send('Otro mensaje')
+
+        self.assertEqual(self.summary_jobs().count(), 1)
+        context = caches['default'].get(conversation_context._key(self.conversation_id))
+        self.assertEqual(context['summary'], conversation.summary)
+        self.assertEqual(context['summary_through_id'], conversation.summary_through_message_id)
+        self.assertEqual(context['message_count'], 12)
+        self.assertEqual(context['unsummarized'], 2)
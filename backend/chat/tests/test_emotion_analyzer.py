@@ -0,0 +1,111 @@
+from django.test import SimpleTestCase, override_settings
+
+from chat.circuit_breaker import CircuitBreaker
+from chat.emotion_analyzer import EmotionAnalyzer
+from chat.inference_backends import FakeInferenceBackend
+
+from .utils import FAKE_BACKEND_SETTINGS, ScriptedInferenceBackend, identity_translation
+
+
+CONFIDENT_SADNESS = {
+    EmotionAnalyzer.EMOTION_MODEL_ID: [('sadness', 0.92), ('others', 0.05), ('joy', 0.03)],
+    EmotionAnalyzer.SENTIMENT_MODEL_ID: [('NEG', 0.88), ('NEU', 0.1), ('POS', 0.02)],
+}
+
+
+@override_settings(**FAKE_BACKEND_SETTINGS)
+class EmotionAnalyzerTests(SimpleTestCase):
+
+    def make_analyzer(self, backend, **overrides):
+        with override_settings(**overrides):
+            analyzer = EmotionAnalyzer()
+        analyzer.backend = backend
+        analyzer.translator.translate = identity_translation
+        # Breakers propios: las fallas de una prueba no abren el circuito de las demás
+        analyzer.breakers = {name: CircuitBreaker(f'test:{name}') for name in analyzer.breakers}
+        return analyzer
+
+    def test_fake_backend_is_deterministic(self):
+        analyzer = self.make_analyzer(FakeInferenceBackend(), EMOTION_CACHE_ENABLED=False)
+        first = analyzer.analyze_complete_hybrid("Hoy tuve un examen difícil")
+        second = analyzer.analyze_complete_hybrid("Hoy tuve un examen difícil")
+        self.assertFalse(first['used_fallback'])
+        self.assertEqual(first['primary_emotion'], second['primary_emotion'])
+        self.assertEqual(first['pysentimiento_emotion'], second['pysentimiento_emotion'])
+
+    def test_cascade_skips_goemotions_when_pysentimiento_is_confident(self):
+        backend = ScriptedInferenceBackend(CONFIDENT_SADNESS)
+        analyzer = self.make_analyzer(backend, EMOTION_CASCADE_ENABLED=True)
+
+        result = analyzer.analyze_complete_hybrid("Me siento muy solo esta semana")
+
+        self.assertNotIn(EmotionAnalyzer.GOEMOTIONS_MODEL_ID, backend.calls)
+        self.assertTrue(result['goemotions_skipped'])
+        self.assertFalse(result['used_fallback'])
+        self.assertEqual(result['primary_emotion'], 'sadness')
+        self.assertEqual(analyzer.cascade_stats()['reasons'], {'confident_negative': 1})
+
+    def test_cascade_runs_goemotions_on_gratitude_cue(self):
+        backend = ScriptedInferenceBackend(CONFIDENT_SADNESS)
+        analyzer = self.make_analyzer(backend, EMOTION_CASCADE_ENABLED=True)
+
+        result = analyzer.analyze_complete_hybrid("Gracias por escucharme, estaba triste")
+
+        self.assertIn(EmotionAnalyzer.GOEMOTIONS_MODEL_ID, backend.calls)
+        self.assertFalse(result['goemotions_skipped'])
+        self.assertEqual(analyzer.cascade_stats()['reasons'], {'keyword_cue': 1})
+
+    def test_without_cascade_goemotions_always_runs(self):
+        backend = ScriptedInferenceBackend(CONFIDENT_SADNESS)
+        analyzer = self.make_analyzer(backend, EMOTION_CASCADE_ENABLED=False)
+
+        analyzer.analyze_complete_hybrid("Me siento muy solo esta semana")
+
+        self.assertIn(EmotionAnalyzer.GOEMOTIONS_MODEL_ID, backend.calls)
+
+    def test_cache_hit_skips_the_models(self):
+        backend = ScriptedInferenceBackend()
+        analyzer = self.make_analyzer(backend)
+
+        first = analyzer.analyze_complete_hybrid("Estoy cansado")
+        calls = len(backend.calls)
+        # Misma entrada con otro formato: el texto se normaliza antes de armar la clave
+        second = analyzer.analyze_complete_hybrid("  ESTOY   cansado ")
+
+        self.assertEqual(len(backend.calls), calls)
+        self.assertEqual(second['primary_emotion'], first['primary_emotion'])
+        self.assertEqual(second['text'], "  ESTOY   cansado ")
+        self.assertEqual(analyzer.cache.stats()['local_hits'], 1)
+
+    def test_fallback_results_are_not_cached(self):
+        backend = ScriptedInferenceBackend(failing={EmotionAnalyzer.SENTIMENT_MODEL_ID})
+        analyzer = self.make_analyzer(backend)
+
+        result = analyzer.analyze_complete_hybrid("No sé qué hacer")
+        self.assertTrue(result['used_fallback'])
+        self.assertEqual(analyzer.cache.stats()['skipped_fallbacks'], 0)
+        self.assertEqual(analyzer.cache.stats()['stores'], 0)
+
+        # Cuando el modelo se recupera se vuelve a llamar y ahora sí se guarda
+        backend.failing.clear()
+        result = analyzer.analyze_complete_hybrid("No sé qué hacer")
+        self.assertFalse(result['used_fallback'])
+        self.assertIn(EmotionAnalyzer.SENTIMENT_MODEL_ID, backend.calls[-3:])
+        self.assertEqual(analyzer.cache.stats()['stores'], 1)
+
+    def test_cache_refuses_fallback_results(self):
+        analyzer = self.make_analyzer(FakeInferenceBackend())
+        fallback = analyzer.pending_result("hola")
+
+        self.assertFalse(analyzer.cache.set("hola", fallback))
+        self.assertIsNone(analyzer.cache.get("hola"))
+        self.assertEqual(analyzer.cache.stats()['skipped_fallbacks'], 1)
+
+    def test_backend_errors_fall_back_to_defaults(self):
+        backend = ScriptedInferenceBackend(failing={EmotionAnalyzer.EMOTION_MODEL_ID})
+        analyzer = self.make_analyzer(backend)
+
+        emotion = analyzer.analyze_emotion("hola")
+
+        self.assertTrue(emotion['is_fallback'])
+        self.assertEqual(emotion['dominant_emotion'], 'others')
@@ -0,0 +1,124 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import Count
+from django.test import TestCase
+from django.utils import timezone
+
+from chat import emotion_rollups
+from chat.course_recommendation_service import CourseEmotionRecommendationService
+from chat.dashboard_stats import LAST_WEEK_DAYS, emotion_summary
+from chat.emotion_analyzer import SENTIMENT_MAPPING
+from chat.models import Conversation, DailyEmotionRollup, Message
+from users.models import Course
+
+from .utils import make_user
+
+
+class RollupWindowTests(TestCase):
+    """Lo que sale del resumen diario coincide con las consultas directas sobre Message"""
+
+    def setUp(self):
+        self.students = [make_user(), make_user()]
+        now = timezone.now()
+        self.course = Course.objects.create(
+            name='Curso', code='ROLLUP-1',
+            start_date=now.date() - timedelta(days=30), end_date=now.date() + timedelta(days=30),
+        )
+        self.course.students.set(self.students)
+        cutoff = now - timedelta(days=LAST_WEEK_DAYS)
+
+        first, second = self.students
+        self.add_messages(first, [
+            (now - timedelta(days=10), 'joy', 'POS'),
+            # A ambos lados del corte: mismo día local, solo el segundo entra en la ventana
+            (cutoff - timedelta(minutes=30), 'sadness', 'NEG'),
+            (cutoff + timedelta(minutes=30), 'fear', 'NEG'),
+            (now - timedelta(days=2), None, 'NEU'),  # Sentimiento sin emoción primaria
+            (now, 'joy', 'POS'),
+        ])
+        self.add_messages(second, [
+            (now - timedelta(days=6), None, None),
+            (now - timedelta(days=1), 'anger', 'NEG'),
+        ])
+        # Análisis en cola: guardado con el resultado provisional, solo cuenta como mensaje
+        self.pending = self.add_messages(second, [
+            (now - timedelta(hours=1), 'others', 'NEU'),
+        ], analysis_status=Message.ANALYSIS_PENDING)
+
+    def add_messages(self, student, rows, analysis_status=Message.ANALYSIS_COMPLETE):
+        conversation = Conversation.objects.create(user=student)
+        for timestamp, emotion, sentiment in rows:
+            message = Message.objects.create(
+                conversation=conversation, sender='user', text='mensaje',
+                primary_emotion=emotion, dominant_emotion=emotion, sentiment=sentiment,
+                analysis_status=analysis_status,
+            )
+            Message.objects.filter(pk=message.pk).update(timestamp=timestamp)
+            message.refresh_from_db()
+            emotion_rollups.record_messages([message])
+            Message.objects.create(conversation=conversation, sender='bot', text='respuesta')
+        return message
+
+    def test_incremental_rollups_match_the_recomputed_ones(self):
+        stats = emotion_rollups.rebuild(dry_run=True)
+        self.assertEqual((stats['created'], stats['updated'], stats['deleted']), (0, 0, 0))
+
+    def test_dashboard_matches_the_message_queries(self):
+        messages = Message.objects.filter(conversation__user__in=self.students, sender='user')
+        week_ago = timezone.now() - timedelta(days=LAST_WEEK_DAYS)
+
+        summary = emotion_summary([student.id for student in self.students])
+
+        self.assertEqual(summary['total_entries'], messages.count())
+        self.assertEqual(summary['entries_last_week'], messages.filter(timestamp__gte=week_ago).count())
+        self.assertEqual(summary['entries_last_week'], 6)
+        sentiments = Counter(
+            messages.exclude(sentiment__isnull=True)
+            .exclude(analysis_status=Message.ANALYSIS_PENDING)
+            .values_list('sentiment', flat=True)
+        )
+        self.assertEqual(
+            {row['sentiment']: row['count'] for row in summary['sentiment_distribution']},
+            {SENTIMENT_MAPPING[sentiment]: count for sentiment, count in sentiments.items()},
+        )
+
+    def test_recommendation_stats_match_the_message_queries(self):
+        window_start = timezone.now() - timedelta(days=CourseEmotionRecommendationService.TIME_WINDOW_DAYS)
+        analyzed = Message.objects.filter(
+            conversation__user__in=self.students, sender='user', timestamp__gte=window_start,
+        ).exclude(primary_emotion__isnull=True).exclude(analysis_status=Message.ANALYSIS_PENDING)
+
+        stats = CourseEmotionRecommendationService().collect_stats(self.course)
+
+        self.assertEqual(stats['total_messages'], analyzed.count())
+        self.assertEqual(stats['total_messages'], 3)
+        self.assertEqual(stats['emotion_counts'], {
+            row['primary_emotion']: row['total']
+            for row in analyzed.values('primary_emotion').annotate(total=Count('id'))
+        })
+        # Solo mensajes analizados: el 'NEU' sin emoción primaria no se cuenta
+        self.assertEqual(stats['sentiment_counts'], {'NEG': 2, 'POS': 1})
+        self.assertEqual(stats['sentiment_counts'], {
+            row['sentiment']: row['total']
+            for row in analyzed.exclude(sentiment__isnull=True).values('sentiment').annotate(total=Count('id'))
+        })
+
+    def test_pending_analysis_counts_once_it_arrives(self):
+        day = timezone.localdate(self.pending.timestamp)
+        rollup = DailyEmotionRollup.objects.get(student=self.students[1], day=day)
+        self.assertEqual((rollup.entries, rollup.analyzed), (1, 0))
+        self.assertEqual(rollup.sentiment_counts, {})
+        self.assertEqual(rollup.analyzed_sentiment_counts, {})
+
+        emotion_rollups.update_analysis(self.pending.pk, {
+            'primary_emotion': 'sadness', 'dominant_emotion': 'sadness', 'sentiment': 'NEG',
+            'analysis_status': Message.ANALYSIS_COMPLETE,
+        })
+
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.entries, rollup.analyzed), (1, 1))
+        self.assertEqual(rollup.primary_emotion_counts, {'sadness': 1})
+        self.assertEqual(rollup.analyzed_sentiment_counts, {'NEG': 1})
+        stats = emotion_rollups.rebuild(dry_run=True)
+        self.assertEqual((stats['created'], stats['updated'], stats['deleted']), (0, 0, 0))
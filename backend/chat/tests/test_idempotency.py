@@ -0,0 +1,135 @@
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from chat import idempotency, llm_client
+from chat.llm_admission import LLMAdmissionRejected
+from chat.models import Conversation, DailyEmotionRollup, Message
+
+from .utils import FakeBackendsMixin, make_user
+
+CHAT_URL = '/api/v1/chat/'
+
+
+class IdempotentChatPostTests(FakeBackendsMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def post(self, data, key):
+        return self.client.post(CHAT_URL, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post({'text': 'Hoy tuve un buen día'}, 'clave-1')
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', first)
+
+        model = llm_client.get_model(llm_client.PURPOSE_CHAT)
+        with mock.patch.object(model, 'generate_content', wraps=model.generate_content) as generate:
+            retry = self.post({'text': 'Hoy tuve un buen día'}, 'clave-1')
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        generate.assert_not_called()
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_new_key_runs_a_new_turn(self):
+        self.post({'text': 'Hola'}, 'clave-1')
+        response = self.post({'text': 'Hola'}, 'clave-2')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Message.objects.count(), 4)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post({'text': 'Hola'}, 'clave-1')
+        other = APIClient()
+        other.force_authenticate(make_user())
+
+        response = other.post(CHAT_URL, {'text': 'Hola'}, format='json', HTTP_IDEMPOTENCY_KEY='clave-1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_reusing_a_key_with_another_message_is_rejected(self):
+        self.post({'text': 'Hola'}, 'clave-1')
+        response = self.post({'text': 'Otro mensaje'}, 'clave-1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_key_in_progress_answers_409(self):
+        key = idempotency.cache_key(self.student.id, 'clave-1')
+        fingerprint = idempotency.fingerprint({'text': 'Hola'})
+        self.assertTrue(idempotency.claim(key, fingerprint))
+
+        with self.settings(CHAT_IDEMPOTENCY_WAIT_SECONDS=0):
+            response = self.post({'text': 'Hola'}, 'clave-1')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Message.objects.exists())
+
+    def test_errors_release_the_key(self):
+        with mock.patch('chat.views.ChatAPIView._prepare_turn', side_effect=RuntimeError('falla')):
+            with self.assertRaises(RuntimeError):
+                self.post({'text': 'Hola'}, 'clave-1')
+
+        response = self.post({'text': 'Hola'}, 'clave-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_retry_after_429_reuses_the_saved_message(self):
+        rejected = LLMAdmissionRejected('cola llena', retry_after=2)
+        with mock.patch('chat.views.acquire_slot', side_effect=rejected):
+            busy = self.post({'text': 'Hola'}, 'clave-1')
+        self.assertEqual(busy.status_code, 429)
+
+        response = self.post({'text': 'Hola'}, 'clave-1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_message_id'], busy.data['user_message_id'])
+        self.assertEqual(response.data['conversation_id'], busy.data['conversation_id'])
+        self.assertEqual(Message.objects.filter(sender='user').count(), 1)
+        self.assertEqual(Message.objects.filter(sender='bot').count(), 1)
+        conversation = Conversation.objects.get(pk=response.data['conversation_id'])
+        self.assertEqual(conversation.message_count, 2)
+        self.assertEqual(DailyEmotionRollup.objects.get(student=self.student).entries, 1)
+
+    def test_retry_after_an_error_reuses_the_saved_message(self):
+        with mock.patch('chat.views.ChatAPIView._finish_turn', side_effect=RuntimeError('falla')):
+            with self.assertRaises(RuntimeError):
+                self.post({'text': 'Hola'}, 'clave-1')
+        first = Message.objects.get(sender='user')
+
+        response = self.post({'text': 'Hola'}, 'clave-1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_message_id'], first.id)
+        self.assertEqual(Message.objects.filter(sender='user').count(), 1)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'idempotency-refresh'}},
+    CHAT_IDEMPOTENCY_PENDING_TTL_SECONDS=1,
+)
+class PendingRefresherTests(SimpleTestCase):
+
+    def test_pending_marker_outlives_its_ttl_while_the_turn_runs(self):
+        key = idempotency.cache_key(1, 'turno-lento')
+        self.assertTrue(idempotency.claim(key, 'huella'))
+
+        with idempotency.PendingRefresher(key):
+            time.sleep(1.5)
+            entry = caches['default'].get(key)
+
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry['state'], idempotency.STATE_PENDING)
+        self.assertFalse(idempotency.claim(key, 'huella'))
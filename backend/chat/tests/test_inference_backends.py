@@ -0,0 +1,84 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+from django.test import SimpleTestCase, override_settings
+
+from chat.emotion_analyzer import EmotionAnalyzer
+from chat.inference_backends import InferenceError, LocalTransformersBackend
+
+HAS_TRANSFORMERS = all(importlib.util.find_spec(name) for name in ('transformers', 'torch'))
+
+SENTIMENT_LABELS = ['POS', 'NEG', 'NEU']
+VOCAB = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]', 'hoy', 'estoy', 'muy', 'triste', 'feliz', 'examen']
+
+
+def save_tiny_classifier(path, labels):
+    """Modelo BERT mínimo (pesos aleatorios) con su tokenizer, en el formato de from_pretrained"""
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizer
+
+    vocab_file = os.path.join(path, 'vocab.txt')
+    with open(vocab_file, 'w', encoding='utf-8') as vocab:
+        vocab.write('\n'.join(VOCAB) + '\n')
+    BertTokenizer(vocab_file=vocab_file).save_pretrained(path)
+
+    config = BertConfig(
+        vocab_size=len(VOCAB),
+        hidden_size=8,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=16,
+        max_position_embeddings=32,
+        num_labels=len(labels),
+        id2label=dict(enumerate(labels)),
+        label2id={label: index for index, label in enumerate(labels)},
+    )
+    BertForSequenceClassification(config).save_pretrained(path)
+
+
+@unittest.skipUnless(HAS_TRANSFORMERS, 'transformers/torch no están instalados')
+class LocalTransformersBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        model_dir = tempfile.mkdtemp(prefix='tiny-sentiment-')
+        self.addCleanup(shutil.rmtree, model_dir, ignore_errors=True)
+        save_tiny_classifier(model_dir, SENTIMENT_LABELS)
+        overrides = override_settings(
+            EMOTION_LOCAL_MODEL_PATHS={EmotionAnalyzer.SENTIMENT_MODEL_ID: model_dir},
+            EMOTION_LOCAL_USE_ONNX=False,
+            EMOTION_LOCAL_BATCH_SIZE=2,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_classifies_a_batch_in_the_api_format(self):
+        backend = LocalTransformersBackend()
+        texts = ['hoy estoy muy triste', 'estoy feliz', 'examen']
+
+        results = backend.classify(EmotionAnalyzer.SENTIMENT_MODEL_ID, texts)
+
+        self.assertEqual(len(results), len(texts))
+        for scores in results:
+            self.assertEqual({item['label'] for item in scores}, set(SENTIMENT_LABELS))
+            self.assertTrue(all(isinstance(item['score'], float) for item in scores))
+            self.assertAlmostEqual(sum(item['score'] for item in scores), 1.0, places=4)
+
+    def test_pipeline_is_loaded_once(self):
+        backend = LocalTransformersBackend()
+        backend.warm_up([EmotionAnalyzer.SENTIMENT_MODEL_ID])
+        classifier = backend._pipelines[EmotionAnalyzer.SENTIMENT_MODEL_ID]
+
+        backend.classify(EmotionAnalyzer.SENTIMENT_MODEL_ID, ['estoy feliz'])
+
+        self.assertIs(backend._pipelines[EmotionAnalyzer.SENTIMENT_MODEL_ID], classifier)
+
+    def test_missing_model_raises_inference_error(self):
+        backend = LocalTransformersBackend()
+        missing = os.path.join(tempfile.gettempdir(), 'modelo-que-no-existe')
+
+        backend.model_paths = {'modelo/inexistente': missing}
+
+        with self.assertRaises(InferenceError):
+            backend.classify('modelo/inexistente', ['hola'])
@@ -0,0 +1,240 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.emotion_analyzer import EmotionAnalyzer
+from chat.llm_fakes import DEFAULT_REPLY
+from chat.models import AnalysisJob, Message
+
+from .utils import FakeBackendsMixin, make_user
+
+CHAT_URL = '/api/v1/chat/'
+
+
+def run_worker():
+    call_command('process_analysis_jobs', '--once', stdout=StringIO())
+
+
+class MessageAnalysisJobTests(FakeBackendsMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # FakeBackendsMixin fija CHAT_ASYNC_ANALYSIS=False; esta clase prueba el modo asíncrono
+        overrides = override_settings(CHAT_ASYNC_ANALYSIS=True, ANALYSIS_QUEUE_MAX_ATTEMPTS=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.student = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def send(self, text):
+        response = self.client.post(CHAT_URL, {'text': text}, format='json')
+        self.assertEqual(response.status_code, 202)
+        return Message.objects.get(pk=response.data['user_message_id'])
+
+    def make_available(self, job):
+        AnalysisJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+
+    def test_turn_queues_the_analysis(self):
+        message = self.send('Estoy preocupado por mañana')
+
+        self.assertEqual(message.analysis_status, Message.ANALYSIS_PENDING)
+        job = AnalysisJob.objects.get(message=message, kind=AnalysisJob.KIND_MESSAGE_ANALYSIS)
+        self.assertEqual(job.kind, AnalysisJob.KIND_MESSAGE_ANALYSIS)
+        self.assertEqual(job.status, AnalysisJob.STATUS_QUEUED)
+
+        run_worker()
+
+        job.refresh_from_db()
+        message.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(message.analysis_status, Message.ANALYSIS_COMPLETE)
+        self.assertIsNotNone(message.primary_emotion)
+
+    def test_fallback_analysis_is_retried_with_backoff(self):
+        message = self.send('No sé qué hacer')
+        job = AnalysisJob.objects.get(message=message, kind=AnalysisJob.KIND_MESSAGE_ANALYSIS)
+        self.inference.failing.add(EmotionAnalyzer.SENTIMENT_MODEL_ID)
+
+        run_worker()
+
+        job.refresh_from_db()
+        message.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('RetryableJobError', job.last_error)
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertEqual(message.analysis_status, Message.ANALYSIS_PENDING)
+
+        # Con backoff pendiente el worker no lo toma
+        run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+
+        # El modelo se recupera: el reintento completa el análisis
+        self.inference.failing.clear()
+        self.make_available(job)
+        run_worker()
+
+        job.refresh_from_db()
+        message.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(message.analysis_status, Message.ANALYSIS_COMPLETE)
+
+    def test_last_attempt_keeps_the_fallback_analysis(self):
+        message = self.send('No sé qué hacer')
+        job = AnalysisJob.objects.get(message=message, kind=AnalysisJob.KIND_MESSAGE_ANALYSIS)
+        self.inference.failing.add(EmotionAnalyzer.SENTIMENT_MODEL_ID)
+
+        run_worker()
+        self.make_available(job)
+        run_worker()
+
+        job.refresh_from_db()
+        message.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(message.sentiment, 'NEU')
+        self.assertIsNotNone(message.primary_emotion)
+
+    def test_handler_errors_fail_the_job_after_max_attempts(self):
+        message = self.send('Hola')
+        job = AnalysisJob.objects.get(message=message, kind=AnalysisJob.KIND_MESSAGE_ANALYSIS)
+        AnalysisJob.objects.filter(pk=job.pk).update(kind='unknown')
+
+        run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_FAILED)
+        self.assertIn('Sin manejador', job.last_error)
+
+
+class AsyncChatReplyTests(FakeBackendsMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        overrides = override_settings(CHAT_ASYNC_ANALYSIS=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.student = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def status_of(self, message_id):
+        response = self.client.get(f'/api/v1/chat/messages/{message_id}/analysis/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_post_returns_before_generating_the_reply(self):
+        from chat import llm_client
+        with mock.patch.object(llm_client, 'generate') as generate:
+            response = self.client.post(CHAT_URL, {'text': 'Estoy cansado'}, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        generate.assert_not_called()
+        self.assertIsNone(response.data['bot_response'])
+        self.assertEqual(response.data['reply_status'], 'pending')
+        message_id = response.data['user_message_id']
+        self.assertEqual(
+            set(AnalysisJob.objects.filter(message_id=message_id).values_list('kind', flat=True)),
+            {AnalysisJob.KIND_CHAT_REPLY, AnalysisJob.KIND_MESSAGE_ANALYSIS},
+        )
+        self.assertFalse(Message.objects.filter(sender='bot').exists())
+
+        pending = self.status_of(message_id)
+        self.assertEqual(pending['reply_status'], 'pending')
+        self.assertIsNone(pending['bot_response'])
+        self.assertEqual(pending['emotional_insight']['analysis_status'], Message.ANALYSIS_PENDING)
+
+        run_worker()
+
+        done = self.status_of(message_id)
+        self.assertEqual(done['reply_status'], 'complete')
+        self.assertEqual(done['bot_response'], DEFAULT_REPLY)
+        self.assertEqual(done['emotional_insight']['analysis_status'], Message.ANALYSIS_COMPLETE)
+        conversation = Message.objects.get(pk=message_id).conversation
+        self.assertEqual(
+            list(conversation.messages.order_by('id').values_list('sender', flat=True)), ['user', 'bot']
+        )
+        self.assertEqual(conversation.message_count, 2)
+
+    def test_reply_job_does_not_answer_twice(self):
+        response = self.client.post(CHAT_URL, {'text': 'Hola'}, format='json')
+        run_worker()
+        job = AnalysisJob.objects.get(kind=AnalysisJob.KIND_CHAT_REPLY)
+        AnalysisJob.objects.filter(pk=job.pk).update(status=AnalysisJob.STATUS_QUEUED)
+
+        run_worker()
+
+        self.assertEqual(Message.objects.filter(sender='bot').count(), 1)
+        self.assertEqual(self.status_of(response.data['user_message_id'])['reply_status'], 'complete')
+
+    def test_gemini_errors_are_retried_before_the_fallback(self):
+        from chat import llm_client
+        from chat.views import ChatAPIView
+        response = self.client.post(CHAT_URL, {'text': 'Hola'}, format='json')
+        message_id = response.data['user_message_id']
+        job = AnalysisJob.objects.get(kind=AnalysisJob.KIND_CHAT_REPLY)
+
+        with mock.patch.object(llm_client, 'generate', side_effect=RuntimeError('Gemini caído')):
+            run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_QUEUED)
+        self.assertFalse(Message.objects.filter(sender='bot').exists())
+        self.assertEqual(self.status_of(message_id)['reply_status'], 'pending')
+
+        # Último intento: queda la respuesta de respaldo
+        AnalysisJob.objects.filter(pk=job.pk).update(available_at=timezone.now(), attempts=job.max_attempts - 1)
+        with mock.patch.object(llm_client, 'generate', side_effect=RuntimeError('Gemini caído')):
+            run_worker()
+        done = self.status_of(message_id)
+        self.assertEqual(done['reply_status'], 'complete')
+        self.assertEqual(done['bot_response'], ChatAPIView.GEMINI_FALLBACK_TEXT)
+
+    def test_reply_recovers_after_a_transient_error(self):
+        from chat import llm_client
+        response = self.client.post(CHAT_URL, {'text': 'Hola'}, format='json')
+        with mock.patch.object(llm_client, 'generate', side_effect=RuntimeError('Gemini caído')):
+            run_worker()
+        AnalysisJob.objects.filter(kind=AnalysisJob.KIND_CHAT_REPLY).update(available_at=timezone.now())
+
+        run_worker()
+
+        done = self.status_of(response.data['user_message_id'])
+        self.assertEqual(done['reply_status'], 'complete')
+        self.assertEqual(done['bot_response'], DEFAULT_REPLY)
+        self.assertEqual(Message.objects.filter(sender='bot').count(), 1)
+
+    def test_reply_prompt_uses_the_model_analysis(self):
+        from chat import llm_client
+        self.inference.scores = {
+            EmotionAnalyzer.EMOTION_MODEL_ID: [('sadness', 0.95), ('others', 0.05)],
+            EmotionAnalyzer.GOEMOTIONS_MODEL_ID: [('sadness', 0.9), ('neutral', 0.1)],
+            EmotionAnalyzer.SENTIMENT_MODEL_ID: [('NEG', 0.9), ('NEU', 0.1)],
+        }
+        response = self.client.post(CHAT_URL, {'text': 'Hola'}, format='json')
+        self.assertEqual(self.status_of(response.data['user_message_id'])['emotional_insight']['analysis_status'],
+                         Message.ANALYSIS_PENDING)
+
+        with mock.patch.object(llm_client, 'generate', wraps=llm_client.generate) as generate:
+            run_worker()
+
+        prompt, = [call.args[1] for call in generate.call_args_list if call.args[0] == llm_client.PURPOSE_CHAT]
+        self.assertIn('Emoción percibida: tristeza', prompt)
+        self.assertIn('Tono general: negativo', prompt)
+
+    def test_sync_replies_are_reported_as_complete(self):
+        with self.settings(CHAT_ASYNC_ANALYSIS=False):
+            response = self.client.post(CHAT_URL, {'text': 'Hola'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['reply_status'], 'complete')
+        status = self.status_of(response.data['user_message_id'])
+        self.assertEqual(status['reply_status'], 'complete')
+        self.assertEqual(status['bot_response'], response.data['bot_response'])
@@ -0,0 +1,115 @@
+import shutil
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from chat import llm_admission
+from chat.llm_admission import LLMAdmissionRejected, acquire_slot
+
+
+class AdmissionQueueTests(SimpleTestCase):
+
+    def setUp(self):
+        lock_dir = tempfile.mkdtemp(prefix='llm-admission-')
+        self.addCleanup(shutil.rmtree, lock_dir, ignore_errors=True)
+        overrides = override_settings(
+            LLM_ADMISSION_ENABLED=True,
+            LLM_ADMISSION_LOCK_DIR=lock_dir,
+            LLM_MAX_CONCURRENT_CALLS=1,
+            LLM_PRIORITY_RESERVED_SLOTS=0,
+            LLM_ADMISSION_PER_USER_LIMIT=1,
+            LLM_ADMISSION_QUEUE_SIZE=2,
+            LLM_ADMISSION_MAX_WAIT_SECONDS=5,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # Rechazos de los hilos que esperan, {nombre: LLMAdmissionRejected}
+        self.rejected = {}
+
+    def wait_for_waiters(self, count):
+        deadline = time.monotonic() + 5
+        while len(llm_admission._waiters()) < count:
+            self.assertLess(time.monotonic(), deadline, 'la cola no llegó al tamaño esperado')
+            time.sleep(0.01)
+
+    def start_waiter(self, name, admitted, **kwargs):
+        def run():
+            try:
+                with acquire_slot('test', **kwargs):
+                    admitted.append(name)
+                    time.sleep(0.05)
+            except LLMAdmissionRejected as exc:
+                self.rejected[name] = exc
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+        return thread
+
+    def test_waiters_are_admitted_in_arrival_order(self):
+        admitted = []
+        slot = acquire_slot('test')
+        # El segundo llega después que el primero ya está en la cola
+        first = self.start_waiter('first', admitted)
+        self.wait_for_waiters(1)
+        second = self.start_waiter('second', admitted)
+        self.wait_for_waiters(2)
+
+        slot.release()
+        first.join()
+        second.join()
+
+        self.assertEqual(admitted, ['first', 'second'])
+        self.assertEqual(self.rejected, {})
+        self.assertEqual(llm_admission._waiters(), [])
+
+    def test_priority_waiters_go_first(self):
+        admitted = []
+        slot = acquire_slot('test')
+        normal = self.start_waiter('normal', admitted)
+        self.wait_for_waiters(1)
+        urgent = self.start_waiter('priority', admitted, priority=True)
+        self.wait_for_waiters(2)
+
+        slot.release()
+        normal.join()
+        urgent.join()
+
+        self.assertEqual(admitted, ['priority', 'normal'])
+        self.assertEqual(self.rejected, {})
+
+    def test_full_queue_rejects_without_waiting(self):
+        admitted = []
+        slot = acquire_slot('test')
+        self.addCleanup(slot.release)
+        waiters = [
+            self.start_waiter('first', admitted, max_wait=0.5),
+            self.start_waiter('second', admitted, max_wait=0.5),
+        ]
+        self.wait_for_waiters(2)
+
+        self.assertTrue(llm_admission.queue_full())
+        with self.assertRaises(LLMAdmissionRejected) as rejected:
+            acquire_slot('test')
+        self.assertEqual(rejected.exception.reason, 'cola llena')
+
+        # El cupo sigue tomado: los que esperaban se rinden al agotar su espera
+        for thread in waiters:
+            thread.join()
+        self.assertEqual(admitted, [])
+        self.assertEqual(
+            {name: exc.reason for name, exc in self.rejected.items()},
+            {'first': 'tiempo de espera agotado', 'second': 'tiempo de espera agotado'},
+        )
+
+    def test_student_limit_does_not_take_a_queue_place(self):
+        slot = acquire_slot('test', user_id=7)
+        self.addCleanup(slot.release)
+
+        with self.assertRaises(LLMAdmissionRejected) as rejected:
+            acquire_slot('test', user_id=7, max_wait=0.1)
+
+        self.assertEqual(rejected.exception.reason, 'límite por estudiante')
+        self.assertEqual(llm_admission._waiters(), [])
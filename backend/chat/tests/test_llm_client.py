@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from chat import llm_client, prompts
+
+from .utils import FakeBackendsMixin, make_user
+
+CHAT_URL = '/api/v1/chat/'
+
+
+class SystemInstructionTests(FakeBackendsMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        usage = mock.patch.dict(llm_client._usage, clear=True)
+        usage.start()
+        self.addCleanup(usage.stop)
+        self.student = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_every_purpose_registers_its_static_instruction(self):
+        for purpose, instruction in llm_client.SYSTEM_INSTRUCTIONS.items():
+            model = llm_client.get_model(purpose)
+            self.assertEqual(model.system_instruction, instruction)
+            self.assertIs(llm_client.get_model(purpose), model)
+
+    def test_chat_turn_sends_only_the_dynamic_prompt(self):
+        response = self.client.post(CHAT_URL, {'text': 'Estoy nervioso por la exposición'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        contents = llm_client.get_model(llm_client.PURPOSE_CHAT).last_contents
+        self.assertIn('Estoy nervioso por la exposición', contents)
+        static_lines = [line for line in prompts.CHAT_SYSTEM_INSTRUCTION.splitlines() if len(line.strip()) > 30]
+        self.assertTrue(static_lines)
+        for line in static_lines:
+            self.assertNotIn(line.strip(), contents)
+
+    def test_instruction_tokens_count_as_cached_after_the_first_call(self):
+        for text in ('Hola', 'Hoy estuve mejor'):
+            response = self.client.post(CHAT_URL, {'text': text}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        stats = llm_client.usage_stats()[llm_client.PURPOSE_CHAT]
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['cached_tokens'], stats['instruction_tokens_estimated'])
+        self.assertGreater(stats['cached_ratio'], 0)
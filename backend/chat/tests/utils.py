@@ -0,0 +1,103 @@
+# backend/chat/tests/utils.py
+"""
+Utilidades comunes de las pruebas del chat: todo corre con los backends falsos
+(chat.llm_fakes y FakeInferenceBackend), sin red ni latencia simulada.
+"""
+from itertools import count
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import override_settings
+
+from chat import llm_client
+from chat.circuit_breaker import CircuitBreaker
+from chat.inference_backends import FakeInferenceBackend, InferenceError
+
+FAKE_BACKEND_SETTINGS = {
+    'LLM_BACKEND': llm_client.BACKEND_FAKE,
+    'GEMINI_FAKE_FIRST_TOKEN_SECONDS': 0,
+    'GEMINI_FAKE_TOKEN_SECONDS': 0,
+    'LLM_FAKE_FAILURE_RATE': 0,
+    'LLM_FAKE_SLOW_RATE': 0,
+    'LLM_FAKE_LATENCY_JITTER': 0,
+    'EMOTION_INFERENCE_BACKEND': 'fake',
+    'EMOTION_FAKE_LATENCY_SECONDS': 0,
+    'EMOTION_CACHE_SHARED': False,
+    'CHAT_LATENCY_BUDGET_SECONDS': 0,
+    'CHAT_ASYNC_ANALYSIS': False,
+    'CHAT_SUMMARY_ENABLED': False,
+    'LLM_ADMISSION_ENABLED': False,
+    'SUPPORT_RESOURCES_PERSONALIZE': False,
+}
+
+_usernames = count()
+
+
+def make_user(role='student', **extra):
+    n = next(_usernames)
+    user, _ = get_user_model().objects.get_or_create(
+        username=f'{role}-{n}',
+        defaults={'role': role, 'email': f'{role}-{n}@example.com', **extra},
+    )
+    return user
+
+
+def identity_translation(text):
+    return text
+
+
+class ScriptedInferenceBackend(FakeInferenceBackend):
+    """Backend falso con puntajes fijos por modelo (el resto sale del hash del texto)"""
+
+    def __init__(self, scores=None, failing=()):
+        super().__init__()
+        self.scores = scores or {}
+        self.failing = set(failing)
+        self.calls = []
+
+    def classify(self, model_id, texts, timeout=10):
+        self.calls.append(model_id)
+        if model_id in self.failing:
+            raise InferenceError("Modelo no disponible", status_code=503)
+        return super().classify(model_id, texts, timeout=timeout)
+
+    def _scores(self, model_id, text):
+        if model_id in self.scores:
+            return [{'label': label, 'score': score} for label, score in self.scores[model_id]]
+        return super()._scores(model_id, text)
+
+
+class FakeBackendsMixin:
+    """
+    Aplica FAKE_BACKEND_SETTINGS, descarta los modelos generativos ya creados y pone el
+    backend de inferencia falso (self.inference) en el analizador de las vistas, con
+    circuit breakers propios de la prueba.
+    """
+
+    def setUp(self):
+        super().setUp()
+        overrides = override_settings(**FAKE_BACKEND_SETTINGS)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        models = mock.patch.dict(llm_client._models, clear=True)
+        models.start()
+        self.addCleanup(models.stop)
+
+        from chat.views import emotion_analyzer
+        self.analyzer = emotion_analyzer
+        self.inference = ScriptedInferenceBackend()
+        breakers = {name: CircuitBreaker(f'test:{name}') for name in emotion_analyzer.breakers}
+        for patcher in (
+            mock.patch.object(emotion_analyzer, 'backend', self.inference),
+            mock.patch.object(emotion_analyzer, 'breakers', breakers),
+            mock.patch.object(emotion_analyzer.translator, 'translate', identity_translation),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        emotion_analyzer.cache.clear()
+        self.addCleanup(emotion_analyzer.cache.clear)
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
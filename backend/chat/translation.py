@@ -0,0 +1,185 @@
+# backend/chat/translation.py
+"""
+Capa de traducción ES→EN para la rama GoEmotions.
+
+- Un único cliente de googletrans por worker (se crea una sola vez, de forma perezosa).
+- Memoización en un LRU acotado en memoria.
+- Respaldo persistente en la tabla TranslationCacheEntry, compartido entre workers y reinicios.
+- Traducción por lotes (translate_many) para backfills.
+
+Si la traducción falla se devuelve el texto original y no se guarda nada.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+
+class TranslationService:
+
+    def __init__(self, src: str = 'es', dest: str = 'en'):
+        self.src = src
+        self.dest = dest
+        self.max_entries = getattr(settings, 'TRANSLATION_CACHE_MAX_ENTRIES', 4096)
+        self.persist = getattr(settings, 'TRANSLATION_CACHE_PERSIST', True)
+
+        self._translator = None
+        self._translator_lock = threading.Lock()
+
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            'memory_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'errors': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Cliente
+    # ------------------------------------------------------------------
+    def _get_translator(self):
+        """Cliente de Google Translate reutilizado por todo el worker"""
+        if self._translator is None:
+            with self._translator_lock:
+                if self._translator is None:
+                    from googletrans import Translator
+                    self._translator = Translator()
+        return self._translator
+
+    def _hash(self, text: str) -> str:
+        return hashlib.sha256(f"{self.src}:{self.dest}:{text}".encode('utf-8')).hexdigest()
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    def translate(self, text: str) -> str:
+        """Traduce un texto; devuelve el original si la traducción falla."""
+        return self.translate_many([text])[0]
+
+    def translate_many(self, texts: List[str]) -> List[str]:
+        """
+        Traduce varios textos con una sola llamada al traductor.
+        Primero resuelve desde memoria y base de datos; solo los faltantes se envían.
+        """
+        cleaned = [(text or '').strip() for text in texts]
+        results: Dict[str, str] = {}
+
+        # 1. Memoria
+        pending = []
+        with self._lock:
+            for text in cleaned:
+                if not text or text in results:
+                    continue
+                key = self._hash(text)
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    results[text] = self._memo[key]
+                    self._counters['memory_hits'] += 1
+                else:
+                    pending.append(text)
+        pending = list(dict.fromkeys(pending))
+
+        # 2. Base de datos
+        if pending and self.persist:
+            stored = self._load_persisted(pending)
+            for text, translated in stored.items():
+                results[text] = translated
+                self._remember(text, translated)
+            with self._lock:
+                self._counters['db_hits'] += len(stored)
+            pending = [text for text in pending if text not in stored]
+
+        # 3. Traductor (un solo request para todos los faltantes)
+        if pending:
+            with self._lock:
+                self._counters['misses'] += len(pending)
+            translated = self._translate_remote(pending)
+            if translated:
+                for text, text_en in translated.items():
+                    results[text] = text_en
+                    self._remember(text, text_en)
+                if self.persist:
+                    self._persist(translated)
+
+        return [results.get(text, text) for text in cleaned]
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _translate_remote(self, texts: List[str]) -> Optional[Dict[str, str]]:
+        try:
+            translator = self._get_translator()
+            batch = translator.translate(texts, src=self.src, dest=self.dest)
+            if not isinstance(batch, list):
+                batch = [batch]
+            translated = {text: item.text for text, item in zip(texts, batch) if item and item.text}
+            for text, text_en in list(translated.items())[:3]:
+                print(f"[Traducción] ES: '{text[:50]}...' → EN: '{text_en[:50]}...'")
+            return translated
+        except ImportError:
+            print("[ERROR] googletrans no instalado. Ejecuta: pip install googletrans==4.0.0-rc1")
+        except Exception as e:
+            print(f"[ERROR] Traducción falló: {e}. Usando texto original.")
+        with self._lock:
+            self._counters['errors'] += 1
+        return None
+
+    def _remember(self, text: str, translated: str):
+        with self._lock:
+            key = self._hash(text)
+            self._memo[key] = translated
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    @staticmethod
+    def _refresh_connection():
+        # Los hilos del pool de análisis viven más que una petición: descartar conexiones caducadas
+        if not connection.in_atomic_block:
+            close_old_connections()
+
+    def _load_persisted(self, texts: List[str]) -> Dict[str, str]:
+        from .models import TranslationCacheEntry
+
+        by_hash = {self._hash(text): text for text in texts}
+        try:
+            self._refresh_connection()
+            rows = TranslationCacheEntry.objects.filter(
+                source_hash__in=list(by_hash.keys())
+            ).values_list('source_hash', 'translated_text')
+            return {by_hash[source_hash]: translated for source_hash, translated in rows}
+        except Exception as e:
+            print(f"[Traducción] Error leyendo caché persistente: {e}")
+            return {}
+
+    def _persist(self, translated: Dict[str, str]):
+        from .models import TranslationCacheEntry
+
+        entries = [
+            TranslationCacheEntry(
+                source_hash=self._hash(text),
+                source_lang=self.src,
+                dest_lang=self.dest,
+                source_text=text,
+                translated_text=text_en,
+            )
+            for text, text_en in translated.items()
+        ]
+        try:
+            self._refresh_connection()
+            TranslationCacheEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        except Exception as e:
+            print(f"[Traducción] Error guardando caché persistente: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'memory_size': len(self._memo),
+                'memory_max_entries': self.max_entries,
+                'persist': self.persist,
+                **self._counters,
+            }
@@ -1,14 +1,22 @@
 from django.urls import path
 from .views import (
     ChatAPIView,
+    ChatStreamAPIView,
     DashboardStatsView,
     ExportDashboardPDFView,
     CourseEmotionRecommendationView,
+    MessageAnalysisView,
+    MessageSearchView,
+    PipelineMetricsView,
 )
 
 urlpatterns = [
     path('', ChatAPIView.as_view(), name='chat-api'),
+    path('stream/', ChatStreamAPIView.as_view(), name='chat-stream'),
+    path('messages/<int:message_id>/analysis/', MessageAnalysisView.as_view(), name='message-analysis'),
+    path('search/', MessageSearchView.as_view(), name='message-search'),
     path('dashboard/', DashboardStatsView.as_view(), name='dashboard-stats'),
     path('dashboard/export-pdf/', ExportDashboardPDFView.as_view(), name='export-dashboard-pdf'),
+    path('metrics/', PipelineMetricsView.as_view(), name='pipeline-metrics'),
     path('courses/<int:course_id>/recommendations/', CourseEmotionRecommendationView.as_view(), name='course-emotion-recommendations'),
 ]
@@ -3,23 +3,46 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
-from .models import Conversation, Message
+from .models import AnalysisJob, Conversation, Message
 from .serializers import ChatResponseSerializer, CourseEmotionRecommendationSerializer
 from .emotion_analyzer import EmotionAnalyzer, EMOTION_MAPPING, SENTIMENT_MAPPING
 from .course_recommendation_service import CourseEmotionRecommendationService
-import google.generativeai as genai
+from .circuit_breaker import CircuitOpenError, breakers_snapshot
+from .job_queue import enqueue, queue_stats
+from .message_analysis import (
+    DeferredAnalysisUpdate,
+    analysis_from_message,
+    infer_emotion_from_text,
+    message_fields_from_analysis,
+    resolve_hybrid_analysis,
+)
+from .latency_stats import get_recorder, latency_snapshot
+from . import conversation_context
+from .prompt_budget import estimate_tokens, fit_history, truncate_to_tokens
+from . import llm_client
+from .llm_admission import LLMAdmissionRejected, acquire_slot, admission_stats, queue_full
+from . import idempotency
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page, parse_limit
+from .conditional import cohort_stamp, conversation_stamp, user_conversations_stamp
+from . import search
+from .dashboard_stats import emotion_summary
+from . import emotion_rollups
+import json
+from contextlib import closing
 import os
-from django.db.models import Count
-from datetime import timedelta, datetime
-from django.utils import timezone
-from django.http import HttpResponse, Http404
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from datetime import datetime
+from django.http import HttpResponse, Http404, StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from users.models import Course
+from users.permissions import IsAdminUser
 
-# Configurar Gemini
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-
-# Crear modelo Gemini 2.5 Flash
-model = genai.GenerativeModel('gemini-2.5-flash')
+# Gemini (o el modelo falso local) se configura una sola vez en chat.llm_client
+if llm_client.backend_name() == llm_client.BACKEND_FAKE:
+    print("[WARNING] LLM_BACKEND=fake - el chat usa respuestas simuladas")
 
 # Crear analizador de emociones (Hugging Face API - pysentimiento)
 emotion_analyzer = EmotionAnalyzer()
@@ -58,7 +81,146 @@ SENTIMENT_TRANSLATIONS = {
     "NEU": "neutral"
 }
 
-class ChatAPIView(APIView):
+# Estado de la respuesta del chat (en modo asíncrono la genera el worker de la cola)
+REPLY_PENDING = 'pending'
+REPLY_COMPLETE = 'complete'
+REPLY_FAILED = 'failed'
+
+class EmotionalInsightMixin:
+    """Formato común del análisis emocional en las respuestas del chat"""
+
+    def _infer_emotion_from_text(self, text: str) -> str:
+        """Heurística simple para inferir emoción cuando el modelo devuelve neutral."""
+        return infer_emotion_from_text(text)
+
+    def _get_micro_tip(self, emotion_es: str) -> str:
+        """Devuelve una micro‑técnica breve y accionable; enfoque educativo, no terapéutico."""
+        tips = {
+            "tristeza": (
+                "Micro‑técnica (3 pasos) para tristeza:\n"
+                "1) Respiración 4‑7‑8: inhala 4s, sostén 7s, exhala 8s (x3).\n"
+                "2) Grounding 5‑4‑3‑2‑1: 5 cosas que ves, 4 que tocas, 3 que oyes, 2 que hueles, 1 que saboreas.\n"
+                "3) Diario: completa ‘Ahora mismo me siento… porque…’."
+            ),
+            "miedo": (
+                "Micro‑técnica para ansiedad/miedo:\n"
+                "1) Respiración cuadrada 4‑4‑4‑4 por 1 min.\n"
+                "2) Pregunta lógica: ¿Qué evidencia real tengo? ¿Qué es lo más probable?\n"
+                "3) Define un paso pequeño (5 min) que puedas hacer ahora."
+            ),
+            "enojo": (
+                "Micro‑técnica para enojo:\n"
+                "1) Pausa 60–90s lejos del estímulo.\n"
+                "2) Nombra la necesidad: ‘Me enojo cuando… porque necesito…’.\n"
+                "3) Canaliza: escribe o camina 5 min antes de responder."
+            ),
+            "alegría": (
+                "Micro‑técnica para alegría:\n"
+                "1) Regístrala: ¿qué la generó?\n"
+                "2) Ancla corporal: 3 respiraciones notando dónde la sientes.\n"
+                "3) Plan: cómo repetir esa condición esta semana."
+            ),
+            "neutral": (
+                "Micro‑técnica general:\n"
+                "1) Escaneo corporal de 1 minuto (cabeza a pies).\n"
+                "2) Dos respiraciones profundas y lentas.\n"
+                "3) Escribe una frase: ‘Lo más importante ahora es…’."
+            ),
+        }
+        return tips.get(emotion_es, tips["neutral"]) + "\nNota: guía educativa; no reemplaza atención psicológica."
+
+    def _build_analysis_payload(self, text, resolved, analysis_status, pending_analyses):
+        """
+        Bloques emotional_insight y user_message_analysis de la respuesta
+        a partir de resolve_hybrid_analysis (o analysis_from_message).
+        """
+        primary_emotion = resolved['primary_emotion']
+        primary_emotion_source = resolved['primary_emotion_source']
+        intensity_level = resolved['intensity']
+        pysentimiento_emotion = resolved['pysentimiento_emotion']
+        emotion_scores = resolved['emotion_scores']
+        goemotions_primary = resolved['goemotions_primary']
+        goemotions_secondary = resolved['goemotions_secondary']
+        sentiment = resolved['sentiment']
+        sentiment_scores = resolved['sentiment_scores']
+
+        # Traducir emoción primaria global
+        primary_emotion_es = EMOTION_MAPPING.get(primary_emotion, primary_emotion)
+        dominant_sentiment_es = SENTIMENT_MAPPING.get(sentiment, sentiment)
+        # Si el modelo devolvió neutral, inferir por texto para entregar un tip útil
+        emotion_for_tip = primary_emotion_es if primary_emotion_es != 'neutral' else self._infer_emotion_from_text(text)
+
+        # Mostrar tip solo si la confianza de alguna emoción es alta (>= 0.85)
+        TIP_THRESHOLD = 0.85
+        pysen_max = 0.0
+        try:
+            pysen_max = max(emotion_scores.values()) if isinstance(emotion_scores, dict) and emotion_scores else 0.0
+        except Exception:
+            pysen_max = 0.0
+        go_max = 0.0
+        try:
+            go_max = max(goemotions_primary.values()) if isinstance(goemotions_primary, dict) and goemotions_primary else 0.0
+        except Exception:
+            go_max = 0.0
+        show_tip = max(pysen_max, go_max) >= TIP_THRESHOLD
+        educational_tip_value = self._get_micro_tip(emotion_for_tip) if show_tip else ""
+        
+        # Emociones secundarias de GoEmotions (>=10%, ordenadas desc)
+        secondary_emotions_list = []
+        try:
+            MIN_SEC_THRESHOLD = 0.10  # 10%
+            secondary_sorted = sorted(
+                (goemotions_secondary or {}).items(),
+                key=lambda x: x[1],
+                reverse=True
+            )
+            for label, score in secondary_sorted:
+                if score and score >= MIN_SEC_THRESHOLD:
+                    secondary_emotions_list.append({
+                        'emotion': EMOTION_MAPPING.get(label, label),
+                        'score': round(score * 100, 1)  # porcentaje
+                    })
+        except Exception:
+            secondary_emotions_list = []
+        
+        return {
+            "emotional_insight": {
+                "primary_emotion": primary_emotion_es,
+                "primary_emotion_source": primary_emotion_source,
+                "intensity": intensity_level,
+                "educational_tip": educational_tip_value,
+                "secondary_emotions_detected": secondary_emotions_list,
+                "analysis_status": analysis_status,
+                "pending_analyses": pending_analyses
+            },
+            "user_message_analysis": {
+                "text": text,
+                "sentiment": {
+                    "dominant": dominant_sentiment_es,
+                    "Positivo": round(sentiment_scores.get('POS', 0) * 100, 1),
+                    "Negativo": round(sentiment_scores.get('NEG', 0) * 100, 1),
+                    "Neutral": round(sentiment_scores.get('NEU', 0) * 100, 1),
+                },
+                "emotions_primary": {
+                    "source": "pysentimiento",
+                    "dominant": EMOTION_MAPPING.get(pysentimiento_emotion['dominant_emotion'], pysentimiento_emotion['dominant_emotion']),
+                    "Alegria": round(emotion_scores.get('joy', 0) * 100, 1),
+                    "Tristeza": round(emotion_scores.get('sadness', 0) * 100, 1),
+                    "Enojo": round(emotion_scores.get('anger', 0) * 100, 1),
+                    "Miedo": round(emotion_scores.get('fear', 0) * 100, 1),
+                    "Disgusto": round(emotion_scores.get('disgust', 0) * 100, 1),
+                    "Sorpresa": round(emotion_scores.get('surprise', 0) * 100, 1),
+                    "Otros": round(emotion_scores.get('others', 0) * 100, 1),
+                },
+                "emotions_goemotions_primary": {
+                    "Gratitud": round(goemotions_primary.get('gratitude', 0) * 100, 1),
+                    "Orgullo": round(goemotions_primary.get('pride', 0) * 100, 1),
+                }
+            }
+        }
+
+
+class ChatAPIView(EmotionalInsightMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def _get_emotion_tip(self, emotion):
@@ -126,74 +288,43 @@ class ChatAPIView(APIView):
         
         return tips.get(emotion, default_tip)
 
-    def _infer_emotion_from_text(self, text: str) -> str:
-        """Heurística simple para inferir emoción cuando el modelo devuelve neutral."""
-        t = (text or "").lower()
-        if any(w in t for w in ["triste", "soledad", "solo", "llorar", "deprim"]):
-            return "tristeza"
-        if any(w in t for w in ["ansio", "miedo", "preocup", "nervios"]):
-            return "miedo"
-        if any(w in t for w in ["enojo", "rabia", "furia", "molest"]):
-            return "enojo"
-        if any(w in t for w in ["feliz", "content", "alegr", "gracia"]):
-            return "alegría"
-        return "neutral"
-
-    def _get_micro_tip(self, emotion_es: str) -> str:
-        """Devuelve una micro‑técnica breve y accionable; enfoque educativo, no terapéutico."""
-        tips = {
-            "tristeza": (
-                "Micro‑técnica (3 pasos) para tristeza:\n"
-                "1) Respiración 4‑7‑8: inhala 4s, sostén 7s, exhala 8s (x3).\n"
-                "2) Grounding 5‑4‑3‑2‑1: 5 cosas que ves, 4 que tocas, 3 que oyes, 2 que hueles, 1 que saboreas.\n"
-                "3) Diario: completa ‘Ahora mismo me siento… porque…’."
-            ),
-            "miedo": (
-                "Micro‑técnica para ansiedad/miedo:\n"
-                "1) Respiración cuadrada 4‑4‑4‑4 por 1 min.\n"
-                "2) Pregunta lógica: ¿Qué evidencia real tengo? ¿Qué es lo más probable?\n"
-                "3) Define un paso pequeño (5 min) que puedas hacer ahora."
-            ),
-            "enojo": (
-                "Micro‑técnica para enojo:\n"
-                "1) Pausa 60–90s lejos del estímulo.\n"
-                "2) Nombra la necesidad: ‘Me enojo cuando… porque necesito…’.\n"
-                "3) Canaliza: escribe o camina 5 min antes de responder."
-            ),
-            "alegría": (
-                "Micro‑técnica para alegría:\n"
-                "1) Regístrala: ¿qué la generó?\n"
-                "2) Ancla corporal: 3 respiraciones notando dónde la sientes.\n"
-                "3) Plan: cómo repetir esa condición esta semana."
-            ),
-            "neutral": (
-                "Micro‑técnica general:\n"
-                "1) Escaneo corporal de 1 minuto (cabeza a pies).\n"
-                "2) Dos respiraciones profundas y lentas.\n"
-                "3) Escribe una frase: ‘Lo más importante ahora es…’."
-            ),
-        }
-        return tips.get(emotion_es, tips["neutral"]) + "\nNota: guía educativa; no reemplaza atención psicológica."
-
-    def _build_context_prompt(self, conversation, current_text, emotion_es, sentiment_es):
-        """Construye el prompt educativo con contexto emocional para Gemini"""
+    def _build_context_prompt(self, context, current_text, emotion_es, sentiment_es):
+        """
+        Construye la parte dinámica del prompt para Gemini. Las instrucciones educativas son
+        fijas y van como system_instruction del modelo (prompts.CHAT_SYSTEM_INSTRUCTION).
+        """
         
-        # Obtener historial reciente (últimos 7 mensajes)
-        recent_messages = conversation.messages.order_by('-timestamp')[:7]
+        # Historial reciente desde el contexto cacheado de la conversación, dentro del
+        # presupuesto de tokens: los mensajes largos se recortan y los más antiguos se descartan
+        # (lo anterior a la ventana llega por el resumen). El contexto se leyó antes de guardar
+        # el mensaje actual, que va aparte
+        current_text = truncate_to_tokens(current_text, getattr(settings, 'CHAT_PROMPT_MAX_CURRENT_TOKENS', 400))
+        turns = fit_history(
+            context['turns'],
+            budget_tokens=getattr(settings, 'CHAT_PROMPT_HISTORY_TOKEN_BUDGET', 600),
+            max_message_tokens=getattr(settings, 'CHAT_PROMPT_MAX_MESSAGE_TOKENS', 150)
+        )
         history = []
+        if context['summary']:
+            history.append(f"Resumen de lo conversado antes: {context['summary']}\n")
         
-        for msg in reversed(recent_messages):
-            role = "Estudiante" if msg.sender == 'user' else "Tú"
-            history.append(f"{role}: {msg.text}")
+        for msg in turns:
+            role = "Estudiante" if msg['sender'] == 'user' else "Tú"
+            history.append(f"{role}: {msg['text']}")
+        history.append(f"Estudiante: {current_text}")
         
-        context = "\n".join(history) if history else "Esta es la primera interacción."
+        emotional_state = conversation_context.emotional_state(context)
+        trend = ""
+        if emotional_state['recent']:
+            recent_es = " → ".join(EMOTION_MAPPING.get(e, e) for e in emotional_state['recent'])
+            trend = f"\n- Emociones recientes en la conversación: {recent_es}"
+            if emotional_state['negative_streak'] >= 3:
+                trend += f" (tono negativo en los últimos {emotional_state['negative_streak']} mensajes)"
+        
+        context = "\n".join(history) if len(history) > 1 else "Esta es la primera interacción."
         
         # Construir prompt educativo
-        prompt = f"""Eres un asistente educativo de inteligencia emocional para estudiantes de 12 a 18 años. Tu objetivo es ayudarles a IDENTIFICAR, NOMBRAR y COMPRENDER sus emociones mediante diálogos reflexivos.
-
-IMPORTANTE: No eres un psicólogo ni terapeuta. Eres una herramienta educativa complementaria para el autoconocimiento emocional. No das terapia, enseñas a reconocer emociones.
-
-CONTEXTO DE LA CONVERSACIÓN:
+        prompt = f"""CONTEXTO DE LA CONVERSACIÓN:
 {context}
 
 MENSAJE ACTUAL DEL ESTUDIANTE:
@@ -201,308 +332,463 @@ MENSAJE ACTUAL DEL ESTUDIANTE:
 
 ANÁLISIS EMOCIONAL DETECTADO:
 - Emoción percibida: {emotion_es}
-- Tono general: {sentiment_es}
-
-TU ENFOQUE EDUCATIVO:
-1. **Validar y nombrar emociones**: Ayuda al estudiante a identificar lo que siente ("Percibo que podría haber tristeza en lo que compartes...")
-2. **Preguntas reflexivas**: Haz preguntas que los ayuden a explorar sus emociones:
-   - "¿En qué parte de tu cuerpo sientes eso?"
-   - "¿Cuándo empezaste a sentirte así?"
-   - "¿Qué situación específica disparó esta emoción?"
-   - "Si tuvieras que ponerle un color a lo que sientes, ¿cuál sería?"
-3. **Educación emocional**: Explica brevemente por qué es normal sentir ciertas emociones
-4. **Promover autoconocimiento**: No des soluciones directas, guía al estudiante a sus propias conclusiones
-5. **Lenguaje apropiado**: Usa lenguaje cercano y auténtico para adolescentes, sin ser condescendiente
-6. **Brevedad**: Máximo 3-4 oraciones por respuesta
-7. **Normalizar emociones**: Todas las emociones son válidas, incluso las incómodas
-
-EJEMPLOS DE RESPUESTAS EDUCATIVAS:
-- "Percibo preocupación en tu mensaje. Es totalmente normal sentir ansiedad antes de un examen, especialmente si es importante para ti. ¿Qué parte del examen te genera más inquietud?"
-- "Veo alegría en lo que compartes, ¿qué crees que provocó ese sentimiento? Reconocer qué nos hace felices es parte del autoconocimiento."
-- "Hay frustración en tu mensaje. Es natural sentirse así cuando algo no sale como esperabas. ¿Cómo se manifiesta físicamente esa frustración en ti?"
-- "Noto tristeza. Esa emoción nos ayuda a procesar decepciones. ¿Desde cuándo te sientes así? ¿Hay algo específico que la desencadenó?"
-
-NO HAGAS:
-- No minimices las emociones ("no es para tanto", "otros están peor")
-- No des consejos directos no solicitados
-- No uses frases como "deberías" o "tienes que"
-- No actúes como terapeuta ni des diagnósticos
+- Tono general: {sentiment_es}{trend}
 
 Responde al estudiante de forma educativa, reflexiva y validando sus emociones:"""
         
+        print(f"[PROMPT] ~{estimate_tokens(prompt)} tokens ({len(turns)} mensajes de historial)")
         return prompt
 
-    def _generate_gemini_response(self, prompt):
-        """Genera respuesta usando Gemini con manejo de errores"""
+    def _latency_deadlines(self, started_at):
+        """
+        Instantes límite (time.monotonic()) de la petición completa y del análisis emocional.
+        Devuelve (None, None) si CHAT_LATENCY_BUDGET_SECONDS es 0.
+        """
+        budget = getattr(settings, 'CHAT_LATENCY_BUDGET_SECONDS', 0)
+        if not budget:
+            return None, None
+        request_deadline = started_at + budget
+        # El análisis deja siempre a Gemini su tiempo mínimo
+        analysis_budget = min(
+            getattr(settings, 'CHAT_ANALYSIS_BUDGET_SECONDS', budget),
+            budget - getattr(settings, 'CHAT_MIN_GEMINI_SECONDS', 5)
+        )
+        return request_deadline, started_at + max(0.0, analysis_budget)
+
+    def _gemini_timeout(self, request_deadline):
+        """Lo que queda del presupuesto para Gemini (nunca menos que CHAT_MIN_GEMINI_SECONDS)"""
+        if request_deadline is None:
+            return None
+        remaining = request_deadline - time.monotonic()
+        return max(remaining, getattr(settings, 'CHAT_MIN_GEMINI_SECONDS', 5))
+
+    GEMINI_FALLBACK_TEXT = "Disculpa, estoy teniendo dificultades para responder en este momento. ¿Podrías reformular tu mensaje?"
+
+    def _generate_gemini_response(self, prompt, timeout=None):
+        """Genera respuesta usando Gemini con manejo de errores (protegido por circuit breaker)"""
         try:
-            response = model.generate_content(prompt)
-            return response.text
+            return llm_client.generate(llm_client.PURPOSE_CHAT, prompt, timeout=timeout).text
+        except CircuitOpenError:
+            print("[Gemini] Circuito abierto, usando respuesta de respaldo")
         except Exception as e:
             print(f"Error con Gemini: {e}")
-            return "Disculpa, estoy teniendo dificultades para responder en este momento. ¿Podrías reformular tu mensaje?"
+        return self.GEMINI_FALLBACK_TEXT
+
+    def _busy_response(self, retry_after, turn=None):
+        """
+        429 cuando no hay cupo para llamar al modelo (ver chat.llm_admission). Si el mensaje del
+        estudiante ya se guardó se informa su id: queda en la conversación sin respuesta.
+        """
+        retry_after = max(1, int(retry_after))
+        data = {
+            "error": "El asistente está atendiendo a muchos estudiantes en este momento. Intenta de nuevo en unos segundos.",
+            "retry_after": retry_after
+        }
+        if turn is not None:
+            data["conversation_id"] = turn['conversation'].id
+            data["user_message_id"] = turn['user_message'].id
+        response = Response(data, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(retry_after)
+        return response
+
+    def _admit_turn(self, turn):
+        """Cupo para la llamada del chat; la espera no supera el tiempo que le queda a Gemini"""
+        max_wait = getattr(settings, 'LLM_ADMISSION_MAX_WAIT_SECONDS', 10)
+        gemini_timeout = self._gemini_timeout(turn['request_deadline'])
+        if gemini_timeout is not None:
+            max_wait = min(max_wait, gemini_timeout)
+        return acquire_slot(
+            llm_client.PURPOSE_CHAT,
+            user_id=turn['user_id'],
+            priority=turn['support_future'] is not None,
+            max_wait=max_wait
+        )
 
     def post(self, request, *args, **kwargs):
+        """
+        Turno de chat. Con la cabecera Idempotency-Key los reintentos del mismo mensaje reciben
+        la respuesta ya calculada (o esperan la que está en curso) en lugar de repetir el turno.
+        """
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key:
+            return self._run_turn(request)
+
+        if len(idempotency_key) > idempotency.MAX_KEY_LENGTH:
+            return Response({
+                "error": f"Idempotency-Key must be at most {idempotency.MAX_KEY_LENGTH} characters."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        key = idempotency.cache_key(request.user.id, idempotency_key)
+        request_fingerprint = idempotency.fingerprint(request.data)
+        wait_deadline = time.monotonic() + getattr(settings, 'CHAT_IDEMPOTENCY_WAIT_SECONDS', 30)
+
+        while not idempotency.claim(key, request_fingerprint):
+            entry = idempotency.wait_for_result(
+                key, request_fingerprint, max(0, wait_deadline - time.monotonic())
+            )
+            if entry is None:
+                # El intento anterior falló y liberó la clave: este intento la toma
+                continue
+            if entry['fingerprint'] != request_fingerprint:
+                return Response({
+                    "error": "Idempotency-Key was already used with a different request."
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if entry['state'] == idempotency.STATE_PENDING:
+                response = Response({
+                    "error": "A request with this Idempotency-Key is still in progress."
+                }, status=status.HTTP_409_CONFLICT)
+                response['Retry-After'] = '1'
+                return response
+
+            print(f"[IDEMPOTENCY] Reintento respondido desde caché (status {entry['status']})")
+            response = Response(entry['data'], status=entry['status'])
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        # Un intento anterior que falló pudo dejar guardado el mensaje del estudiante
+        saved_message_id = idempotency.saved_message_id(key)
+        try:
+            with idempotency.PendingRefresher(key):
+                response = self._run_turn(request, saved_message_id)
+        except Exception:
+            idempotency.release(key, self.user_message_id)
+            raise
+
+        # 429 y 5xx no se guardan: el reintento debe volver a intentarlo
+        if response.status_code >= 500 or response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            idempotency.release(key, self.user_message_id)
+        else:
+            idempotency.store(key, request_fingerprint, response.status_code, response.data)
+        return response
+
+    def _run_turn(self, request, saved_message_id=None):
+        # Si la cola de espera ya está llena no se gasta el análisis en un turno que no va a entrar
+        # (en modo asíncrono no se llama al modelo en la petición)
+        if not getattr(settings, 'CHAT_ASYNC_ANALYSIS', False) and queue_full():
+            return self._busy_response(getattr(settings, 'LLM_ADMISSION_MAX_WAIT_SECONDS', 10))
+
+        turn, error_response = self._prepare_turn(request, saved_message_id)
+        if error_response is not None:
+            return error_response
+
+        if turn['async_analysis']:
+            # 202: la respuesta y el análisis enriquecido los genera el worker de la cola;
+            # el cliente los consulta en GET messages/<id>/analysis/
+            self._enqueue_turn_jobs(turn, reply=True)
+            return Response(self._finish_turn(turn, None), status=status.HTTP_202_ACCEPTED)
+
+        try:
+            slot = self._admit_turn(turn)
+        except LLMAdmissionRejected as e:
+            # El mensaje del estudiante ya está guardado: se completa su análisis y se responde 429
+            self._save_analysis(turn)
+            return self._busy_response(e.retry_after, turn)
+
+        with slot:
+            bot_text = self._generate_gemini_response(
+                turn['prompt'],
+                timeout=self._gemini_timeout(turn['request_deadline'])
+            )
+        print(f"Respuesta generada ({time.monotonic() - turn['started_at']:.1f}s desde el inicio)")
+
+        return Response(self._finish_turn(turn, bot_text), status=status.HTTP_200_OK)
+
+    # Id del mensaje del estudiante guardado en esta petición (para la clave de idempotencia)
+    user_message_id = None
+
+    def _prepare_turn(self, request, saved_message_id=None):
+        """
+        Valida la petición, guarda el mensaje del estudiante, lo analiza y arma el prompt.
+        saved_message_id: mensaje que guardó un intento anterior con la misma Idempotency-Key;
+        se usa ese en lugar de insertar otro.
+        Devuelve (turno, None) o (None, Response de error).
+        """
         text = request.data.get('text')
         conversation_id = request.data.get('conversation_id')
 
         if not text:
-            return Response({
+            return None, Response({
                 "error": "text is required."
             }, status=status.HTTP_400_BAD_REQUEST)
 
         user = request.user
 
         if not user.is_student:
-            return Response({
+            return None, Response({
                 "error": "Solo los estudiantes pueden usar el chat."
             }, status=status.HTTP_403_FORBIDDEN)
 
+        saved_message = None
+        if saved_message_id is not None:
+            saved_message = Message.objects.select_related('conversation').filter(
+                pk=saved_message_id, sender='user', conversation__user=user
+            ).first()
+
         # Encontrar o crear conversación
-        if conversation_id:
+        if saved_message is not None:
+            # Si la petición no traía conversación, el intento anterior ya la creó
+            conversation = saved_message.conversation
+        elif conversation_id:
             try:
                 conversation = Conversation.objects.get(
                     id=conversation_id, 
                     user=user
                 )
             except Conversation.DoesNotExist:
-                return Response({
+                return None, Response({
                     "error": "Conversation not found or does not belong to the user."
                 }, status=status.HTTP_404_NOT_FOUND)
         else:
             conversation = Conversation.objects.create(user=user)
+        # Historial y estado emocional de la conversación (caché, sin consultas si está al día).
+        # Se lee antes de guardar el mensaje actual, que va aparte en el prompt
+        if saved_message is not None:
+            context = conversation_context.before_message(
+                conversation_context.get_context(conversation), saved_message.id
+            )
+        else:
+            context = conversation_context.get_context(conversation, new_conversation=not conversation_id)
 
-        # Guardar mensaje del usuario
-        user_message = Message.objects.create(
-            conversation=conversation,
-            text=text,
-            sender='user'
-        )
+        # ===== PRESUPUESTO DE LATENCIA =====
+        started_at = time.monotonic()
+        request_deadline, analysis_deadline = self._latency_deadlines(started_at)
+
+        # ===== MENSAJE DEL ESTUDIANTE =====
+        # Se guarda antes de analizar y de llamar a Gemini, con el análisis provisional: si algo
+        # falla o se agota el tiempo más adelante el mensaje no se pierde.
+        # En modo asíncrono los trabajos de la cola se encolan al final (_enqueue_turn_jobs)
+        async_analysis = getattr(settings, 'CHAT_ASYNC_ANALYSIS', False)
+        pending_result = emotion_analyzer.pending_result(text)
+        provisional = resolve_hybrid_analysis(text, pending_result)
+        if saved_message is not None:
+            user_message = saved_message
+            print(f"[IDEMPOTENCY] Reintento con el mensaje {user_message.id} ya guardado")
+        else:
+            user_message = self._save_user_message(conversation, text, provisional)
+        self.user_message_id = user_message.id
 
         # ===== ANÁLISIS HÍBRIDO: PYSENTIMIENTO + GOEMOTIONS =====
-        print(f"\n[CHAT] Iniciando análisis híbrido del mensaje...")
-        hf_analysis = emotion_analyzer.analyze_complete_hybrid(text)
-        
-        # Extraer resultados del análisis híbrido
-        pysentimiento_emotion = hf_analysis['pysentimiento_emotion']
-        pysentimiento_sentiment = hf_analysis['pysentimiento_sentiment']
-        goemotions_primary = hf_analysis['goemotions_primary']
-        goemotions_secondary = hf_analysis['goemotions_secondary']
+        # En modo asíncrono el análisis (y los recursos de apoyo) los hace el worker de la cola
+        deferred_update = None
+        message_fields = {}
+        if async_analysis:
+            print("\n[CHAT] Análisis encolado, respuesta provisional")
+            hf_analysis = pending_result
+            resolved = provisional
+        else:
+            print(f"\n[CHAT] Iniciando análisis híbrido del mensaje...")
+            deferred_update = DeferredAnalysisUpdate(text)
+            hf_analysis = emotion_analyzer.analyze_complete_hybrid(
+                text,
+                deadline=analysis_deadline,
+                on_complete=deferred_update
+            )
+            # Extraer resultados del análisis híbrido (incluye el fallback heurístico).
+            # Se escriben en el mensaje al final del turno (_persist_turn)
+            resolved = resolve_hybrid_analysis(text, hf_analysis)
+            message_fields = message_fields_from_analysis(resolved)
+            for field, value in message_fields.items():
+                setattr(user_message, field, value)
         
-        # Emoción primaria global (puede ser de pysentimiento o goemotions)
-        primary_emotion = hf_analysis['primary_emotion']
-        primary_emotion_source = hf_analysis['primary_emotion_source']
-        intensity_level = hf_analysis['intensity']
-
-        # Puntajes base de Pysentimiento
-        emotion_scores = pysentimiento_emotion.get('emotions', {})
-
-        # Fallback heurístico si Pysentimiento devolvió todos 0 y 'others':1.0
-        try:
-            non_others_sum = sum(v for k, v in emotion_scores.items() if k != 'others')
-            others_val = emotion_scores.get('others', 0)
-        except Exception:
-            non_others_sum = 0
-            others_val = 0
-
-        if others_val >= 0.99 and non_others_sum == 0:
-            guessed_es = self._infer_emotion_from_text(text)
-            mapping_rev = {
-                'tristeza': 'sadness',
-                'miedo': 'fear',
-                'enojo': 'anger',
-                'alegría': 'joy',
-                'alegria': 'joy',
-            }
-            guessed = mapping_rev.get(guessed_es, 'others')
-            if guessed != 'others':
-                print(f"[FALLBACK] Ajustando emoción a '{guessed}' por heurística de texto")
-                emotion_scores = {
-                    'joy': 0.0,
-                    'sadness': 0.0,
-                    'anger': 0.0,
-                    'fear': 0.0,
-                    'surprise': 0.0,
-                    'disgust': 0.0,
-                    'others': 0.1,
-                }
-                emotion_scores[guessed] = 0.9
-                pysentimiento_emotion['emotions'] = emotion_scores
-                pysentimiento_emotion['dominant_emotion'] = guessed
-                pysentimiento_emotion['confidence'] = 0.6
-                # Si la primaria venía como 'others', usa la inferida
-                if primary_emotion == 'others' or not primary_emotion:
-                    primary_emotion = guessed
-                    primary_emotion_source = 'heuristic'
+        # Emoción primaria global (puede ser de pysentimiento, goemotions o heurística)
+        primary_emotion = resolved['primary_emotion']
+        primary_emotion_source = resolved['primary_emotion_source']
+        intensity_level = resolved['intensity']
 
         # Para compatibilidad con el prompt (usar la emoción primaria global)
         emotion = primary_emotion
-        
-        sentiment = pysentimiento_sentiment['sentiment']
-        sentiment_scores = pysentimiento_sentiment['scores']
+        sentiment = resolved['sentiment']
         
         print(f"[CHAT] Análisis completado: Primaria={primary_emotion} ({primary_emotion_source}), Intensidad={intensity_level}")
-        
-        # ===== GUARDAR ANÁLISIS EN LA BASE DE DATOS =====
-        # Pysentimiento (7 emociones)
-        user_message.dominant_emotion = pysentimiento_emotion['dominant_emotion']
-        user_message.emotion_joy_score = emotion_scores.get('joy', 0.0)
-        user_message.emotion_sadness_score = emotion_scores.get('sadness', 0.0)
-        user_message.emotion_anger_score = emotion_scores.get('anger', 0.0)
-        user_message.emotion_fear_score = emotion_scores.get('fear', 0.0)
-        user_message.emotion_disgust_score = emotion_scores.get('disgust', 0.0)
-        user_message.emotion_surprise_score = emotion_scores.get('surprise', 0.0)
-        user_message.emotion_others_score = emotion_scores.get('others', 0.0)
-        
-        # GoEmotions primarias (2 emociones)
-        user_message.emotion_gratitude_score = goemotions_primary.get('gratitude', 0.0)
-        user_message.emotion_pride_score = goemotions_primary.get('pride', 0.0)
-        
-        # GoEmotions secundarias (JSON)
-        user_message.secondary_emotions = goemotions_secondary if goemotions_secondary else {}
-        
-        # Emoción primaria global
-        user_message.primary_emotion = primary_emotion
-        user_message.primary_emotion_source = primary_emotion_source
-        
-        # Actualizar sentimiento
-        user_message.sentiment = sentiment
-        user_message.sentiment_pos_score = sentiment_scores.get('POS', 0.0)
-        user_message.sentiment_neg_score = sentiment_scores.get('NEG', 0.0)
-        user_message.sentiment_neu_score = sentiment_scores.get('NEU', 0.0)
-        
-        user_message.save()
-        print(f"Análisis guardado en base de datos")
 
         # Traducir resultados a español
         dominant_emotion_es = EMOTION_MAPPING.get(emotion, emotion)
         dominant_sentiment_es = SENTIMENT_MAPPING.get(sentiment, sentiment)
 
+        # ===== RECURSOS DE APOYO =====
+        # Solo dependen del análisis: se generan en paralelo a la respuesta del chat
+        support_future = None
+        if not async_analysis and SUPPORT_ENABLED and support_generator.requires_support(hf_analysis):
+            print(f"[SUPPORT] Se detectaron emociones negativas intensas, generando recursos en paralelo...")
+            support_future = support_generator.start_support_resources(
+                text=text,
+                emotion=EMOTION_MAPPING.get(primary_emotion, primary_emotion),
+                intensity=intensity_level,
+                sentiment=SENTIMENT_MAPPING.get(sentiment, sentiment),
+                user_id=user.id
+            )
+
         # ===== GENERAR RESPUESTA EMPÁTICA CON GEMINI =====
         print(f"Generando respuesta con Gemini...")
         prompt = self._build_context_prompt(
-            conversation=conversation,
+            context=context,
             current_text=text,
             emotion_es=dominant_emotion_es,
             sentiment_es=dominant_sentiment_es
         )
-        
-        bot_text = self._generate_gemini_response(prompt)
-        print(f"Respuesta generada")
-        
-        # Guardar respuesta del bot
-        Message.objects.create(
+
+        return {
+            'text': text,
+            'conversation': conversation,
+            'user_message': user_message,
+            'hf_analysis': hf_analysis,
+            'resolved': resolved,
+            'message_fields': message_fields,
+            'async_analysis': async_analysis,
+            'deferred_update': deferred_update,
+            'context': context,
+            'context_last_message_id': context['last_message_id'],
+            'prompt': prompt,
+            'support_future': support_future,
+            'user_id': user.id,
+            'started_at': started_at,
+            'request_deadline': request_deadline,
+        }, None
+
+    def _save_user_message(self, conversation, text, provisional):
+        """Inserta el mensaje del estudiante con el análisis provisional (heurístico, sin modelos)"""
+        user_message = Message(
             conversation=conversation,
-            text=bot_text,
-            sender='bot'
+            text=text,
+            sender='user',
+            **message_fields_from_analysis(provisional)
         )
+        with transaction.atomic():
+            user_message.save()
+            Conversation.register_messages(conversation.id, [user_message])
+            emotion_rollups.record_messages([user_message])
+        return user_message
+
+    def _enqueue_turn_jobs(self, turn, reply):
+        """
+        Modo asíncrono: encola el análisis del mensaje y, si reply, la respuesta del chat (va
+        primero en la cola: es lo que el estudiante espera). La respuesta lleva el contexto que se
+        leyó en esta petición; el worker arma el prompt con el análisis de los modelos.
+        """
+        user_message = turn['user_message']
+        # Un reintento con el mensaje ya guardado no repite los trabajos que alcanzó a encolar
+        queued = set(AnalysisJob.objects.filter(message=user_message).values_list('kind', flat=True))
+        with transaction.atomic():
+            if reply and AnalysisJob.KIND_CHAT_REPLY not in queued:
+                enqueue(AnalysisJob.KIND_CHAT_REPLY, message=user_message, payload={
+                    'context': turn['context'],
+                    'context_last_message_id': turn['context_last_message_id'],
+                })
+            if AnalysisJob.KIND_MESSAGE_ANALYSIS not in queued:
+                enqueue(AnalysisJob.KIND_MESSAGE_ANALYSIS, message=user_message)
 
-        # ===== VERIFICAR SI SE NECESITAN RECURSOS DE APOYO =====
+    def _finish_turn(self, turn, bot_text):
+        """
+        Recoge los recursos de apoyo si aplica, guarda el turno y arma la respuesta.
+        bot_text None: la respuesta queda en la cola (modo asíncrono) y no hay nada más que guardar.
+        """
+        text = turn['text']
+        conversation = turn['conversation']
+        user_message = turn['user_message']
+        resolved = turn['resolved']
+
+        # ===== RECURSOS DE APOYO (lanzados en paralelo en _prepare_turn) =====
         support_resources_data = None
-        if SUPPORT_ENABLED and support_generator.requires_support(hf_analysis):
-            print(f"[SUPPORT] Se detectaron emociones negativas intensas, generando recursos...")
-            
+        if turn['support_future'] is not None:
             try:
-                # Generar recursos con IA
-                support_resources_raw = support_generator.generate_support_resources(
-                    text=text,
-                    emotion=EMOTION_MAPPING.get(primary_emotion, primary_emotion),
-                    intensity=intensity_level,
-                    sentiment=SENTIMENT_MAPPING.get(sentiment, sentiment)
-                )
+                support_resources_raw = support_generator.collect_support_resources(turn['support_future'])
                 
                 # Formatear para respuesta
                 support_resources_data = support_generator.format_resources_for_response(support_resources_raw)
                 
-                # Guardar en el mensaje del usuario
-                user_message.support_resources_offered = True
-                user_message.support_resources = support_resources_raw
-                user_message.save()
+                # Se guardan con el análisis del mensaje del usuario
+                turn['message_fields'].update(
+                    support_resources_offered=True,
+                    support_resources=support_resources_raw
+                )
                 
-                print(f"[SUPPORT] Recursos generados y guardados")
+                print(f"[SUPPORT] Recursos generados")
             except Exception as e:
                 print(f"[SUPPORT] Error generando recursos: {e}")
         
-        # ===== PREPARAR RESPUESTA PARA EL FRONTEND =====
-        # Traducir emoción primaria global
-        primary_emotion_es = EMOTION_MAPPING.get(primary_emotion, primary_emotion)
-        dominant_sentiment_es = SENTIMENT_MAPPING.get(sentiment, sentiment)
-        # Si el modelo devolvió neutral, inferir por texto para entregar un tip útil
-        emotion_for_tip = primary_emotion_es if primary_emotion_es != 'neutral' else self._infer_emotion_from_text(text)
+        if bot_text is not None:
+            self._persist_turn(turn, bot_text)
 
-        # Mostrar tip solo si la confianza de alguna emoción es alta (>= 0.85)
-        TIP_THRESHOLD = 0.85
-        pysen_max = 0.0
-        try:
-            pysen_max = max(emotion_scores.values()) if isinstance(emotion_scores, dict) and emotion_scores else 0.0
-        except Exception:
-            pysen_max = 0.0
-        go_max = 0.0
-        try:
-            go_max = max(goemotions_primary.values()) if isinstance(goemotions_primary, dict) and goemotions_primary else 0.0
-        except Exception:
-            go_max = 0.0
-        show_tip = max(pysen_max, go_max) >= TIP_THRESHOLD
-        educational_tip_value = self._get_micro_tip(emotion_for_tip) if show_tip else ""
-        
-        # Emociones secundarias de GoEmotions (>=10%, ordenadas desc)
-        secondary_emotions_list = []
-        try:
-            MIN_SEC_THRESHOLD = 0.10  # 10%
-            secondary_sorted = sorted(
-                (goemotions_secondary or {}).items(),
-                key=lambda x: x[1],
-                reverse=True
-            )
-            for label, score in secondary_sorted:
-                if score and score >= MIN_SEC_THRESHOLD:
-                    secondary_emotions_list.append({
-                        'emotion': EMOTION_MAPPING.get(label, label),
-                        'score': round(score * 100, 1)  # porcentaje
-                    })
-        except Exception:
-            secondary_emotions_list = []
-        
         response_data = {
             "bot_response": bot_text,
+            "reply_status": REPLY_PENDING if bot_text is None else REPLY_COMPLETE,
             "conversation_id": conversation.id,
-            "emotional_insight": {
-                "primary_emotion": primary_emotion_es,
-                "primary_emotion_source": primary_emotion_source,
-                "intensity": intensity_level,
-                "educational_tip": educational_tip_value,
-                "secondary_emotions_detected": secondary_emotions_list
-            },
+            "user_message_id": user_message.id,
             "support_resources": support_resources_data,  # Recursos de apoyo si aplica
-            "user_message_analysis": {
-                "text": text,
-                "sentiment": {
-                    "dominant": dominant_sentiment_es,
-                    "Positivo": round(sentiment_scores.get('POS', 0) * 100, 1),
-                    "Negativo": round(sentiment_scores.get('NEG', 0) * 100, 1),
-                    "Neutral": round(sentiment_scores.get('NEU', 0) * 100, 1),
-                },
-                "emotions_primary": {
-                    "source": "pysentimiento",
-                    "dominant": EMOTION_MAPPING.get(pysentimiento_emotion['dominant_emotion'], pysentimiento_emotion['dominant_emotion']),
-                    "Alegria": round(emotion_scores.get('joy', 0) * 100, 1),
-                    "Tristeza": round(emotion_scores.get('sadness', 0) * 100, 1),
-                    "Enojo": round(emotion_scores.get('anger', 0) * 100, 1),
-                    "Miedo": round(emotion_scores.get('fear', 0) * 100, 1),
-                    "Disgusto": round(emotion_scores.get('disgust', 0) * 100, 1),
-                    "Sorpresa": round(emotion_scores.get('surprise', 0) * 100, 1),
-                    "Otros": round(emotion_scores.get('others', 0) * 100, 1),
-                },
-                "emotions_goemotions_primary": {
-                    "Gratitud": round(goemotions_primary.get('gratitude', 0) * 100, 1),
-                    "Orgullo": round(goemotions_primary.get('pride', 0) * 100, 1),
-                }
-            }
+            **self._build_analysis_payload(
+                text,
+                resolved,
+                analysis_status=user_message.analysis_status,
+                pending_analyses=turn['hf_analysis'].get('pending_analyses', [])
+            )
         }
         
         serializer = ChatResponseSerializer(data=response_data)
         serializer.is_valid(raise_exception=True)
+        return serializer.data
+
+    def _persist_turn(self, turn, bot_text):
+        """
+        Completa el turno en una sola transacción: el análisis (y recursos de apoyo) del mensaje
+        del estudiante, ya guardado en _prepare_turn, y la respuesta del bot.
+        """
+        user_message = turn['user_message']
+        bot_message = Message(
+            conversation=turn['conversation'],
+            text=bot_text,
+            sender='bot'
+        )
+        with transaction.atomic():
+            self._save_analysis(turn)
+            bot_message.save()
+            Conversation.register_messages(turn['conversation'].id, [bot_message])
+            transaction.on_commit(lambda: self.update_context(
+                turn['conversation'].id, turn['context_last_message_id'], [user_message, bot_message]
+            ))
+        print(f"Turno guardado en base de datos (análisis {user_message.analysis_status})")
+
+    def _save_analysis(self, turn):
+        """
+        Escribe el análisis del turno en el mensaje del estudiante (y corrige el resumen diario).
+        Después, el análisis diferido (si lo hay) puede actualizar el mensaje por su cuenta.
+        """
+        if turn['message_fields']:
+            emotion_rollups.update_analysis(turn['user_message'].pk, turn['message_fields'])
+        if turn['deferred_update'] is not None:
+            transaction.on_commit(lambda: turn['deferred_update'].bind(turn['user_message']))
+
+    @staticmethod
+    def update_context(conversation_id, previous_last_id, messages):
+        """
+        Tras el commit: agrega el turno al contexto y pide un resumen cada N turnos.
+        También lo usa el worker al guardar una respuesta asíncrona (chat.job_handlers).
+
+        El contexto en caché solo descarta rápido los turnos sin nada que resumir: antes de
+        encolar se cuenta desde Conversation.summary_through_message_id, porque el resumen lo
+        guarda el worker y la caché de este proceso puede no haberlo visto todavía.
+        """
+        context = conversation_context.append_turn(conversation_id, previous_last_id, messages)
+        if not getattr(settings, 'CHAT_SUMMARY_ENABLED', False):
+            return
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        threshold = 2 * getattr(settings, 'CHAT_SUMMARY_EVERY_TURNS', 5)
+        if context is not None and context['unsummarized'] < threshold:
+            return
+        summary_through_id = (
+            Conversation.objects.filter(pk=conversation_id)
+            .values_list('summary_through_message_id', flat=True)
+            .first()
+        )
+        if conversation_context.count_unsummarized(conversation_id, summary_through_id) < threshold:
+            return
+        already_queued = AnalysisJob.objects.filter(
+            kind=AnalysisJob.KIND_CONVERSATION_SUMMARY,
+            payload__conversation_id=conversation_id,
+            status__in=[AnalysisJob.STATUS_QUEUED, AnalysisJob.STATUS_RUNNING],
+        ).exists()
+        if not already_queued:
+            enqueue(AnalysisJob.KIND_CONVERSATION_SUMMARY, payload={'conversation_id': conversation_id})
+            print(f"[SUMMARY] Resumen encolado para la conversación {conversation_id}")
 
     def get(self, request, *args, **kwargs):
         """Obtener historial de conversaciones"""
@@ -516,70 +802,378 @@ Responde al estudiante de forma educativa, reflexiva y validando sus emociones:"
         conversation_id = request.query_params.get('conversation_id')
         
         if conversation_id:
-            try:
-                conversation = Conversation.objects.get(id=conversation_id, user=user)
-                messages = conversation.messages.all().order_by('timestamp')
-                
-                messages_data = []
-                for message in messages:
-                    message_data = {
-                        'id': message.id,
-                        'text': message.text,
-                        'sender': message.sender,
-                        'timestamp': message.timestamp,
-                    }
-                    
-                    if message.sender == 'user':
-                        message_data['analysis'] = {
-                            'dominant_emotion': EMOTION_MAPPING.get(message.dominant_emotion, message.dominant_emotion),
-                            'sentiment': SENTIMENT_MAPPING.get(message.sentiment, message.sentiment),
-                            'emotions': {
-                                'joy': round(message.emotion_joy_score * 100, 1) if message.emotion_joy_score else 0,
-                                'sadness': round(message.emotion_sadness_score * 100, 1) if message.emotion_sadness_score else 0,
-                                'anger': round(message.emotion_anger_score * 100, 1) if message.emotion_anger_score else 0,
-                                'fear': round(message.emotion_fear_score * 100, 1) if message.emotion_fear_score else 0,
-                                'disgust': round(message.emotion_disgust_score * 100, 1) if message.emotion_disgust_score else 0,
-                                'surprise': round(message.emotion_surprise_score * 100, 1) if message.emotion_surprise_score else 0,
-                                'others': round(message.emotion_others_score * 100, 1) if message.emotion_others_score else 0,
-                            },
-                            'sentiments': {
-                                'positive': round(message.sentiment_pos_score * 100, 1) if message.sentiment_pos_score else 0,
-                                'negative': round(message.sentiment_neg_score * 100, 1) if message.sentiment_neg_score else 0,
-                                'neutral': round(message.sentiment_neu_score * 100, 1) if message.sentiment_neu_score else 0,
-                            }
-                        }
-                    
-                    messages_data.append(message_data)
-                
-                return Response({
-                    'conversation_id': conversation.id,
-                    'start_time': conversation.start_time,
-                    'messages': messages_data
-                }, status=status.HTTP_200_OK)
-                
-            except Conversation.DoesNotExist:
-                return Response({
-                    "error": "Conversación no encontrada."
-                }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Listar conversaciones
-        conversations = Conversation.objects.filter(user=user).order_by('-start_time')
-        
-        conversations_data = []
-        for conv in conversations:
-            last_message = conv.messages.last()
-            conversations_data.append({
-                'id': conv.id,
-                'start_time': conv.start_time,
-                'messages_count': conv.messages.count(),
-                'last_message': last_message.text if last_message else None,
-                'last_message_time': last_message.timestamp if last_message else None
-            })
+            return self._conversation_history(request, user, conversation_id)
+
+        # Sin cambios desde la última visita: 304 sin armar el listado
+        stamp = user_conversations_stamp(user.id)
+        not_modified = stamp.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        # Listar conversaciones: una consulta por página (datos del listado desnormalizados en
+        # Conversation) con paginación por cursor sobre (start_time, id). Sin limit ni cursor
+        # se devuelven todas, como espera el cliente web
+        paginated = bool(request.query_params.get('limit') or request.query_params.get('cursor'))
+        try:
+            limit = parse_limit(request.query_params.get('limit')) if paginated else None
+            conversations, next_cursor = keyset_page(
+                Conversation.objects.filter(user=user).values(
+                    'id', 'start_time', 'message_count', 'last_message_at', 'last_message_preview'
+                ),
+                'start_time',
+                request.query_params.get('cursor'),
+                limit
+            )
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        conversations_data = [
+            {
+                'id': conv['id'],
+                'start_time': conv['start_time'],
+                'messages_count': conv['message_count'],
+                'last_message': conv['last_message_preview'] or None,
+                'last_message_time': conv['last_message_at'],
+            }
+            for conv in conversations
+        ]
+
+        return stamp.apply(Response({
+            'conversations': conversations_data,
+            'next_cursor': next_cursor,
+        }, status=status.HTTP_200_OK))
+
+    # Columnas del historial que usa el cliente (proyección con .values())
+    HISTORY_FIELDS = (
+        'id', 'text', 'sender', 'timestamp', 'dominant_emotion', 'sentiment',
+        'emotion_joy_score', 'emotion_sadness_score', 'emotion_anger_score', 'emotion_fear_score',
+        'emotion_disgust_score', 'emotion_surprise_score', 'emotion_others_score',
+        'sentiment_pos_score', 'sentiment_neg_score', 'sentiment_neu_score',
+    )
+    HISTORY_PAGE_SIZE = 50
+
+    def _conversation_history(self, request, user, conversation_id):
+        """
+        Mensajes de una conversación, paginados por cursor sobre (timestamp, id):
+        - Sin parámetros: todos los mensajes (en orden cronológico), como espera el cliente web.
+        - ?limit=: los últimos `limit` mensajes. next_cursor pide la página anterior (?cursor=).
+        - sync_cursor (en las respuestas sin ?cursor=) sirve para sincronizar después.
+        - ?since=<sync_cursor>: solo los mensajes nuevos desde ese punto. Si next_cursor no
+          es null quedan más: se pide de nuevo con ?since=<next_cursor>. En updated_messages
+          van los mensajes que el cliente ya tenía y cuyo análisis llegó después.
+        """
+        conversation = (
+            Conversation.objects.filter(id=conversation_id, user=user)
+            .values('id', 'start_time', 'message_count', 'updated_at')
+            .first()
+        )
+        if conversation is None:
+            return Response({
+                "error": "Conversación no encontrada."
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        stamp = conversation_stamp(conversation)
+        not_modified = stamp.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        since = request.query_params.get('since')
+        cursor = request.query_params.get('cursor')
+        messages = Message.objects.filter(conversation_id=conversation['id']).values(*self.HISTORY_FIELDS)
+        paginated = bool(request.query_params.get('limit') or cursor or since)
+        try:
+            limit = parse_limit(request.query_params.get('limit'), default=self.HISTORY_PAGE_SIZE) if paginated else None
+            if since:
+                rows, next_cursor = keyset_page(messages, 'timestamp', since, limit, descending=False)
+                updated_rows = self._analysis_updated_since(messages, since)
+            else:
+                rows, next_cursor = keyset_page(messages, 'timestamp', cursor, limit)
+                rows.reverse()
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        sync_cursor = None
+        if since or not cursor:
+            # El más nuevo de la respuesta (o el mismo since si no llegó nada)
+            sync_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id']) if rows else since
+
+        data = {
+            'conversation_id': conversation['id'],
+            'start_time': conversation['start_time'],
+            'messages': [self._history_message(row) for row in rows],
+            'next_cursor': next_cursor,
+            'sync_cursor': sync_cursor,
+        }
+        if since:
+            data['updated_messages'] = [self._history_message(row) for row in updated_rows]
+        return stamp.apply(Response(data, status=status.HTTP_200_OK))
+
+    @staticmethod
+    def _analysis_updated_since(messages, since):
+        """
+        Mensajes hasta el cursor since cuyo análisis se escribió después de la fecha del cursor
+        (la del mensaje más nuevo que tenía el cliente). Todo análisis que llegó después de la
+        sincronización cae aquí; puede repetirse alguno que ya tenía, y el cliente lo reemplaza.
+        """
+        timestamp, pk = decode_cursor(since)
+        return list(
+            messages.filter(analysis_updated_at__gt=timestamp)
+            .filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lte=pk))
+            .order_by('timestamp', 'id')
+        )
+
+    @staticmethod
+    def _history_message(row):
+        message_data = {
+            'id': row['id'],
+            'text': row['text'],
+            'sender': row['sender'],
+            'timestamp': row['timestamp'],
+        }
+        if row['sender'] == 'user':
+            percent = ChatAPIView._percent
+            message_data['analysis'] = {
+                'dominant_emotion': EMOTION_MAPPING.get(row['dominant_emotion'], row['dominant_emotion']),
+                'sentiment': SENTIMENT_MAPPING.get(row['sentiment'], row['sentiment']),
+                'emotions': {
+                    emotion: percent(row[f'emotion_{emotion}_score'])
+                    for emotion in ('joy', 'sadness', 'anger', 'fear', 'disgust', 'surprise', 'others')
+                },
+                'sentiments': {
+                    'positive': percent(row['sentiment_pos_score']),
+                    'negative': percent(row['sentiment_neg_score']),
+                    'neutral': percent(row['sentiment_neu_score']),
+                }
+            }
+        return message_data
+
+    @staticmethod
+    def _percent(score):
+        return round(score * 100, 1) if score else 0
+    
+class EventStreamRenderer(BaseRenderer):
+    """Permite negociar text/event-stream; las respuestas de error salen como evento 'error'"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f"event: error\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
 
+class ChatStreamAPIView(ChatAPIView):
+    """
+    Variante en streaming del chat (Server-Sent Events):
+    - event: start    → id de la conversación
+    - event: token    → fragmentos de la respuesta de Gemini a medida que se generan
+    - event: insight  → el mismo payload que devuelve POST /chat/ (el turno ya está guardado)
+    - event: done     → tiempos (time-to-first-token y total)
+    """
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    http_method_names = ['post', 'options']
+
+    def post(self, request, *args, **kwargs):
+        if queue_full():
+            return self._busy_response(getattr(settings, 'LLM_ADMISSION_MAX_WAIT_SECONDS', 10))
+
+        turn, error_response = self._prepare_turn(request)
+        if error_response is not None:
+            return error_response
+        if turn['async_analysis']:
+            # La respuesta sale en el stream; solo el análisis va a la cola
+            self._enqueue_turn_jobs(turn, reply=False)
+
+        # El cupo se toma antes de abrir el stream para poder responder 429 normal
+        try:
+            slot = self._admit_turn(turn)
+        except LLMAdmissionRejected as e:
+            self._save_analysis(turn)
+            return self._busy_response(e.retry_after, turn)
+
+        response = StreamingHttpResponse(self._event_stream(turn, slot), content_type='text/event-stream; charset=utf-8')
+        response['Cache-Control'] = 'no-cache'
+        # Evita que nginx acumule el stream antes de enviarlo
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def _sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def _event_stream(self, turn, slot):
+        started_at = turn['started_at']
+        chunks = []
+        ttft = None
+        try:
+            with slot:
+                # El mensaje del estudiante ya está guardado; la respuesta se guarda al terminar el stream
+                yield self._sse('start', {
+                    'conversation_id': turn['conversation'].id,
+                    'user_message_id': turn['user_message'].id,
+                })
+
+                for piece in self._stream_gemini_response(
+                    turn['prompt'],
+                    timeout=self._gemini_timeout(turn['request_deadline'])
+                ):
+                    if ttft is None:
+                        ttft = time.monotonic() - started_at
+                        get_recorder('chat_stream_ttft').record(ttft)
+                    chunks.append(piece)
+                    yield self._sse('token', {'text': piece})
+        except GeneratorExit:
+            # El cliente cortó el stream (el generador se cierra en un yield): el turno se guarda
+            # igual, con lo que alcanzó a generarse, para no dejar el mensaje sin análisis ni respuesta
+            print(f"[STREAM] El cliente cerró el stream tras {len(chunks)} fragmentos, se guarda la respuesta parcial")
+            self._finish_turn(turn, ''.join(chunks) or self.GEMINI_FALLBACK_TEXT)
+            raise
+
+        # El mensaje del bot se guarda una vez completado el stream
+        response_data = self._finish_turn(turn, ''.join(chunks))
+        total = time.monotonic() - started_at
+        get_recorder('chat_stream_total').record(total)
+        print(f"[STREAM] Primer fragmento en {ttft or 0:.2f}s, total {total:.2f}s")
+
+        yield self._sse('insight', response_data)
+        yield self._sse('done', {
+            'ttft_ms': round((ttft or 0) * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+        })
+
+    def _stream_gemini_response(self, prompt, timeout=None):
+        """Genera la respuesta en fragmentos (generate_content con stream=True), bajo el circuit breaker"""
+        produced = False
+        try:
+            # closing: si el cliente corta el stream, el de Gemini se cierra en el acto
+            with closing(llm_client.stream(llm_client.PURPOSE_CHAT, prompt, timeout=timeout)) as pieces:
+                for piece in pieces:
+                    produced = True
+                    yield piece
+        except CircuitOpenError:
+            print("[Gemini] Circuito abierto, usando respuesta de respaldo")
+        except Exception as e:
+            print(f"Error con Gemini (streaming): {e}")
+        if not produced:
+            yield self.GEMINI_FALLBACK_TEXT
+
+
+class MessageAnalysisView(EmotionalInsightMixin, APIView):
+    """
+    Análisis emocional de un mensaje del estudiante y la respuesta del chat a ese mensaje.
+    En modo asíncrono (CHAT_ASYNC_ANALYSIS) el cliente consulta aquí hasta que reply_status
+    y analysis_status sean 'complete'.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, message_id, *args, **kwargs):
+        try:
+            message = Message.objects.select_related('conversation').get(
+                pk=message_id,
+                sender='user',
+                conversation__user=request.user
+            )
+        except Message.DoesNotExist:
+            return Response({
+                "error": "Message not found or does not belong to the user."
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        support_resources_data = None
+        if SUPPORT_ENABLED and message.support_resources_offered and message.support_resources:
+            support_resources_data = support_generator.format_resources_for_response(message.support_resources)
+
+        reply_status, bot_response = self._reply(message)
         return Response({
-            'conversations': conversations_data
+            "message_id": message.id,
+            "conversation_id": message.conversation_id,
+            "reply_status": reply_status,
+            "bot_response": bot_response,
+            "support_resources": support_resources_data,
+            **self._build_analysis_payload(
+                message.text,
+                analysis_from_message(message),
+                analysis_status=message.analysis_status,
+                pending_analyses=[]
+            )
         }, status=status.HTTP_200_OK)
-    
+
+
+    @staticmethod
+    def _reply(message):
+        """
+        (reply_status, texto). Las respuestas asíncronas se siguen por su trabajo en la cola;
+        las síncronas son el mensaje del bot que sigue al del estudiante.
+        """
+        job = AnalysisJob.objects.filter(
+            message=message, kind=AnalysisJob.KIND_CHAT_REPLY
+        ).values('status', 'payload').first()
+        if job is not None:
+            if job['status'] == AnalysisJob.STATUS_FAILED:
+                return REPLY_FAILED, None
+            bot_message_id = job['payload'].get('bot_message_id')
+            if bot_message_id is None:
+                return REPLY_PENDING, None
+            return REPLY_COMPLETE, Message.objects.filter(pk=bot_message_id).values_list('text', flat=True).first()
+
+        bot_text = message.conversation.messages.filter(
+            sender='bot', id__gt=message.id
+        ).order_by('id').values_list('text', flat=True).first()
+        return (REPLY_COMPLETE if bot_text is not None else REPLY_PENDING), bot_text
+
+
+class MessageSearchView(APIView):
+    """
+    Búsqueda de texto completo en las entradas de los estudiantes (ver chat/search.py).
+    - Estudiantes: sus propios mensajes
+    - Profesores: los mensajes de sus estudiantes asignados (opcionalmente ?student_id=)
+    Parámetros: q (obligatorio), limit y cursor (next_cursor de la página anterior).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        query = (request.query_params.get('q') or '').strip()
+        if not search.MIN_QUERY_LENGTH <= len(query) <= search.MAX_QUERY_LENGTH:
+            return Response({
+                "error": f"q must be between {search.MIN_QUERY_LENGTH} and {search.MAX_QUERY_LENGTH} characters."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        messages = Message.objects.filter(sender='user')
+        if user.is_student:
+            messages = messages.filter(conversation__user=user)
+        elif user.is_teacher:
+            student_id = request.query_params.get('student_id')
+            if student_id:
+                if not student_id.isdigit() or not user.students.filter(id=student_id).exists():
+                    return Response({
+                        "error": "Student not found or not assigned to the teacher."
+                    }, status=status.HTTP_404_NOT_FOUND)
+                messages = messages.filter(conversation__user_id=student_id)
+            else:
+                messages = messages.filter(conversation__user__in=user.students.all())
+        else:
+            return Response({
+                "error": "Only students and teachers can search entries."
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+            results, next_cursor = search.search_messages(
+                messages, query, request.query_params.get('cursor'), limit
+            )
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        for result in results:
+            result['dominant_emotion'] = EMOTION_MAPPING.get(result['dominant_emotion'], result['dominant_emotion'])
+
+        return Response({
+            'query': query,
+            'full_text': search.full_text_available(),
+            'results': results,
+            'next_cursor': next_cursor,
+        }, status=status.HTTP_200_OK)
+
+
 class DashboardStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -588,72 +1182,39 @@ class DashboardStatsView(APIView):
         Endpoint para obtener estadísticas del dashboard.
         - Estudiantes: ven sus propias estadísticas
         - Profesores: ven estadísticas agregadas de sus estudiantes asignados
+        Si nada cambió desde la última visita (ETag / Last-Modified) responde 304 sin agregar.
         """
         user = request.user
+        if user.is_student:
+            stamp = user_conversations_stamp(user.id, scope='dashboard', rolling_window=True)
+        elif user.is_teacher:
+            stamp = cohort_stamp(user.id, user.students.values_list('id', flat=True))
+        else:
+            return self._stats(request)
+
+        not_modified = stamp.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        return stamp.apply(self._stats(request))
+
+    def _stats(self, request):
+        user = request.user
         
         if user.is_student:
             # Estadísticas del estudiante
-            conversations = Conversation.objects.filter(user=user)
-            user_messages = Message.objects.filter(
-                conversation__in=conversations,
-                sender='user'
-            )
-            
-            total_entries = user_messages.count()
-            
-            # Mensajes de la última semana
-            one_week_ago = timezone.now() - timedelta(days=7)
-            entries_last_week = user_messages.filter(timestamp__gte=one_week_ago).count()
-            
-            # Distribución de sentimientos
-            sentiment_counts = user_messages.values('sentiment').annotate(
-                count=Count('sentiment')
-            ).order_by('-count')
-            
-            sentiment_distribution = []
-            for item in sentiment_counts:
-                if item['sentiment']:
-                    sentiment_es = SENTIMENT_MAPPING.get(item['sentiment'], item['sentiment'])
-                    sentiment_distribution.append({
-                        'sentiment': sentiment_es,
-                        'count': item['count'],
-                        'percentage': round((item['count'] / total_entries * 100) if total_entries > 0 else 0, 1)
-                    })
-            
-            # Sentimiento más común
-            most_common_sentiment = sentiment_distribution[0]['sentiment'] if sentiment_distribution else 'neutral'
-            most_common_sentiment_percentage = sentiment_distribution[0]['percentage'] if sentiment_distribution else 0
-            
-            # Top 5 emociones
-            emotion_counts = user_messages.values('dominant_emotion').annotate(
-                count=Count('dominant_emotion')
-            ).order_by('-count')[:5]
-            
-            top_emotions = []
-            for item in emotion_counts:
-                if item['dominant_emotion']:
-                    emotion_es = EMOTION_MAPPING.get(item['dominant_emotion'], item['dominant_emotion'])
-                    top_emotions.append({
-                        'emotion': emotion_es,
-                        'count': item['count']
-                    })
+            summary = emotion_summary([user.id])
             
             return Response({
                 'total_users': 1,
-                'total_entries': total_entries,
-                'most_common_sentiment': most_common_sentiment,
-                'most_common_sentiment_percentage': most_common_sentiment_percentage,
-                'entries_last_week': entries_last_week,
-                'sentiment_distribution': sentiment_distribution,
-                'top_emotions': top_emotions,
+                **self._summary_fields(summary),
                 'users_stats': []
             }, status=status.HTTP_200_OK)
         
         elif user.is_teacher:
             # Estadísticas de estudiantes asignados
-            assigned_students = user.students.all()
+            assigned_students = list(user.students.order_by('id').values('id', 'username', 'email'))
             
-            if assigned_students.count() == 0:
+            if not assigned_students:
                 return Response({
                     'total_users': 0,
                     'total_entries': 0,
@@ -665,96 +1226,21 @@ class DashboardStatsView(APIView):
                     'users_stats': []
                 }, status=status.HTTP_200_OK)
             
-            # Obtener todas las conversaciones de los estudiantes asignados
-            student_conversations = Conversation.objects.filter(user__in=assigned_students)
-            all_student_messages = Message.objects.filter(
-                conversation__in=student_conversations,
-                sender='user'
-            )
-            
-            total_entries = all_student_messages.count()
-            
-            # Mensajes de la última semana
-            one_week_ago = timezone.now() - timedelta(days=7)
-            entries_last_week = all_student_messages.filter(timestamp__gte=one_week_ago).count()
-            
-            # Distribución de sentimientos (agregada)
-            sentiment_counts = all_student_messages.values('sentiment').annotate(
-                count=Count('sentiment')
-            ).order_by('-count')
-            
-            sentiment_distribution = []
-            for item in sentiment_counts:
-                if item['sentiment']:
-                    sentiment_es = SENTIMENT_MAPPING.get(item['sentiment'], item['sentiment'])
-                    sentiment_distribution.append({
-                        'sentiment': sentiment_es,
-                        'count': item['count'],
-                        'percentage': round((item['count'] / total_entries * 100) if total_entries > 0 else 0, 1)
-                    })
-            
-            # Sentimiento más común
-            most_common_sentiment = sentiment_distribution[0]['sentiment'] if sentiment_distribution else 'neutral'
-            most_common_sentiment_percentage = sentiment_distribution[0]['percentage'] if sentiment_distribution else 0
-            
-            # Top 5 emociones
-            emotion_counts = all_student_messages.values('dominant_emotion').annotate(
-                count=Count('dominant_emotion')
-            ).order_by('-count')[:5]
-            
-            top_emotions = []
-            for item in emotion_counts:
-                if item['dominant_emotion']:
-                    emotion_es = EMOTION_MAPPING.get(item['dominant_emotion'], item['dominant_emotion'])
-                    top_emotions.append({
-                        'emotion': emotion_es,
-                        'count': item['count']
-                    })
-            
-            # Estadísticas por estudiante individual
-            users_stats = []
-            for student in assigned_students:
-                student_convs = Conversation.objects.filter(user=student)
-                student_msgs = Message.objects.filter(
-                    conversation__in=student_convs,
-                    sender='user'
-                )
-                
-                entries_count = student_msgs.count()
-                
-                # Sentimiento dominante del estudiante
-                student_sentiment = student_msgs.values('sentiment').annotate(
-                    count=Count('sentiment')
-                ).order_by('-count').first()
-                
-                dominant_sentiment = student_sentiment['sentiment'] if student_sentiment and student_sentiment['sentiment'] else 'NEU'
-                dominant_sentiment_es = SENTIMENT_MAPPING.get(dominant_sentiment, dominant_sentiment)
-                
-                # Emoción dominante del estudiante
-                student_emotion = student_msgs.values('dominant_emotion').annotate(
-                    count=Count('dominant_emotion')
-                ).order_by('-count').first()
-                
-                dominant_emotion = student_emotion['dominant_emotion'] if student_emotion and student_emotion['dominant_emotion'] else 'others'
-                dominant_emotion_es = EMOTION_MAPPING.get(dominant_emotion, dominant_emotion)
-                
-                users_stats.append({
-                    'user_id': student.id,
-                    'username': student.username,
-                    'email': student.email,
-                    'entries_count': entries_count,
-                    'dominant_sentiment': dominant_sentiment_es,
-                    'dominant_emotion': dominant_emotion_es
-                })
+            # Dos consultas agrupadas para todo el grupo (ver chat/dashboard_stats.py)
+            summary = emotion_summary(student['id'] for student in assigned_students)
+            users_stats = [
+                {
+                    'user_id': student['id'],
+                    'username': student['username'],
+                    'email': student['email'],
+                    **summary['per_student'][student['id']]
+                }
+                for student in assigned_students
+            ]
             
             return Response({
-                'total_users': assigned_students.count(),
-                'total_entries': total_entries,
-                'most_common_sentiment': most_common_sentiment,
-                'most_common_sentiment_percentage': most_common_sentiment_percentage,
-                'entries_last_week': entries_last_week,
-                'sentiment_distribution': sentiment_distribution,
-                'top_emotions': top_emotions,
+                'total_users': len(assigned_students),
+                **self._summary_fields(summary),
                 'users_stats': users_stats
             }, status=status.HTTP_200_OK)
         
@@ -763,6 +1249,10 @@ class DashboardStatsView(APIView):
                 'error': 'Tipo de usuario no reconocido'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+    @staticmethod
+    def _summary_fields(summary):
+        return {key: value for key, value in summary.items() if key != 'per_student'}
+
 
 class ExportDashboardPDFView(APIView):
     permission_classes = [IsAuthenticated]
@@ -785,104 +1275,30 @@ class ExportDashboardPDFView(APIView):
                 'error': 'Solo los profesores pueden exportar reportes'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Obtener estadísticas (reutilizando lógica de DashboardStatsView)
-        assigned_students = user.students.all()
+        # Obtener estadísticas (mismas consultas agrupadas que DashboardStatsView)
+        student_ids = list(user.students.order_by('id').values_list('id', flat=True))
         
-        if assigned_students.count() == 0:
+        if not student_ids:
             return Response({
                 'error': 'No tienes estudiantes asignados para generar el reporte'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Obtener todas las conversaciones de los estudiantes asignados
-        student_conversations = Conversation.objects.filter(user__in=assigned_students)
-        all_student_messages = Message.objects.filter(
-            conversation__in=student_conversations,
-            sender='user'
-        )
-        
-        total_entries = all_student_messages.count()
-        
-        # Mensajes de la última semana
-        one_week_ago = timezone.now() - timedelta(days=7)
-        entries_last_week = all_student_messages.filter(timestamp__gte=one_week_ago).count()
-        
-        # Distribución de sentimientos (agregada)
-        sentiment_counts = all_student_messages.values('sentiment').annotate(
-            count=Count('sentiment')
-        ).order_by('-count')
-        
-        sentiment_distribution = []
-        for item in sentiment_counts:
-            if item['sentiment']:
-                sentiment_es = SENTIMENT_MAPPING.get(item['sentiment'], item['sentiment'])
-                sentiment_distribution.append({
-                    'sentiment': sentiment_es,
-                    'count': item['count'],
-                    'percentage': round((item['count'] / total_entries * 100) if total_entries > 0 else 0, 1)
-                })
-        
-        # Sentimiento más común
-        most_common_sentiment = sentiment_distribution[0]['sentiment'] if sentiment_distribution else 'neutral'
-        most_common_sentiment_percentage = sentiment_distribution[0]['percentage'] if sentiment_distribution else 0
-        
-        # Top 5 emociones
-        emotion_counts = all_student_messages.values('dominant_emotion').annotate(
-            count=Count('dominant_emotion')
-        ).order_by('-count')[:5]
-        
-        top_emotions = []
-        for item in emotion_counts:
-            if item['dominant_emotion']:
-                emotion_es = EMOTION_MAPPING.get(item['dominant_emotion'], item['dominant_emotion'])
-                top_emotions.append({
-                    'emotion': emotion_es,
-                    'count': item['count']
-                })
+        summary = emotion_summary(student_ids)
         
         # Estadísticas por estudiante individual (ANÓNIMO para PDF)
-        users_stats = []
-        for idx, student in enumerate(assigned_students, start=1):
-            student_convs = Conversation.objects.filter(user=student)
-            student_msgs = Message.objects.filter(
-                conversation__in=student_convs,
-                sender='user'
-            )
-            
-            entries_count = student_msgs.count()
-            
-            # Sentimiento dominante del estudiante
-            student_sentiment = student_msgs.values('sentiment').annotate(
-                count=Count('sentiment')
-            ).order_by('-count').first()
-            
-            dominant_sentiment = student_sentiment['sentiment'] if student_sentiment and student_sentiment['sentiment'] else 'NEU'
-            dominant_sentiment_es = SENTIMENT_MAPPING.get(dominant_sentiment, dominant_sentiment)
-            
-            # Emoción dominante del estudiante
-            student_emotion = student_msgs.values('dominant_emotion').annotate(
-                count=Count('dominant_emotion')
-            ).order_by('-count').first()
-            
-            dominant_emotion = student_emotion['dominant_emotion'] if student_emotion and student_emotion['dominant_emotion'] else 'others'
-            dominant_emotion_es = EMOTION_MAPPING.get(dominant_emotion, dominant_emotion)
-            
-            users_stats.append({
+        users_stats = [
+            {
                 # Mantener anonimato: no incluir username ni email
                 'display_name': f'Estudiante #{idx}',
-                'entries_count': entries_count,
-                'dominant_sentiment': dominant_sentiment_es,
-                'dominant_emotion': dominant_emotion_es
-            })
+                **summary['per_student'][student_id]
+            }
+            for idx, student_id in enumerate(student_ids, start=1)
+        ]
         
         # Preparar datos para el PDF
         stats_data = {
-            'total_users': assigned_students.count(),
-            'total_entries': total_entries,
-            'most_common_sentiment': most_common_sentiment,
-            'most_common_sentiment_percentage': most_common_sentiment_percentage,
-            'entries_last_week': entries_last_week,
-            'sentiment_distribution': sentiment_distribution,
-            'top_emotions': top_emotions,
+            'total_users': len(student_ids),
+            **DashboardStatsView._summary_fields(summary),
             'users_stats': users_stats
         }
         
@@ -971,3 +1387,28 @@ class CourseEmotionRecommendationView(APIView):
         if user.is_teacher and course.teacher_id == user.id:
             return
         raise PermissionDenied("Solo el profesor asignado o un administrador pueden consultar estas recomendaciones.")
+
+
+class PipelineMetricsView(APIView):
+    """
+    Métricas operativas del pipeline de chat del worker que atiende la petición.
+    Solo administradores.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'worker_pid': os.getpid(),
+            'emotion_analysis_cache': emotion_analyzer.cache.stats(),
+            'translation_cache': emotion_analyzer.translator.stats(),
+            'emotion_cascade': emotion_analyzer.cascade_stats(),
+            'conversation_context': conversation_context.context_stats(),
+            'llm_usage': llm_client.usage_stats(),
+            'llm_admission': admission_stats(),
+            'chat_idempotency': idempotency.idempotency_stats(),
+            'support_resources_pool': support_generator.pool_stats() if SUPPORT_ENABLED else None,
+            'circuit_breakers': breakers_snapshot(),
+            'analysis_queue': queue_stats(),
+            'latency': latency_snapshot(),
+        }, status=status.HTTP_200_OK)
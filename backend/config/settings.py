@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 from dotenv import load_dotenv
 import dj_database_url
@@ -153,6 +154,19 @@ else:
     }
 
 
+# Caché de Django
+# La comparten los workers de gunicorn y el de process_analysis_jobs (claves de idempotencia,
+# contexto del chat), por eso por defecto es la tabla django_cache (`python manage.py
+# createcachetable`, lo corren entrypoint.sh y build.sh). Redis o Memcached también sirven;
+# LocMemCache solo es correcta con un único proceso.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'django_cache'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -196,6 +210,147 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Análisis emocional híbrido
+# Ejecuta en paralelo las llamadas a pysentimiento (emoción/sentimiento) y GoEmotions
+EMOTION_ANALYSIS_CONCURRENT = os.getenv('EMOTION_ANALYSIS_CONCURRENT', 'True') == 'True'
+# Hilos del pool compartido por worker (3 por mensaje en vuelo)
+EMOTION_ANALYSIS_MAX_WORKERS = int(os.getenv('EMOTION_ANALYSIS_MAX_WORKERS', '6'))
+
+# Cascada: GoEmotions (traducción + tercer modelo) solo se ejecuta cuando puede cambiar la emoción primaria
+EMOTION_CASCADE_ENABLED = os.getenv('EMOTION_CASCADE_ENABLED', 'False') == 'True'
+# Confianza de pysentimiento a partir de la cual se omite GoEmotions
+EMOTION_CASCADE_MIN_CONFIDENCE = float(os.getenv('EMOTION_CASCADE_MIN_CONFIDENCE', '0.80'))
+# Confianza de sentimiento negativo a partir de la cual se omite GoEmotions
+EMOTION_CASCADE_MIN_NEGATIVE_CONFIDENCE = float(os.getenv('EMOTION_CASCADE_MIN_NEGATIVE_CONFIDENCE', '0.70'))
+
+# Backend de inferencia: 'huggingface_api' (remoto), 'local' (transformers/ONNX en proceso)
+# o 'fake' (puntajes deterministas sin red, para pruebas de carga)
+EMOTION_INFERENCE_BACKEND = os.getenv('EMOTION_INFERENCE_BACKEND', 'huggingface_api')
+EMOTION_FAKE_LATENCY_SECONDS = float(os.getenv('EMOTION_FAKE_LATENCY_SECONDS', '0.05'))
+# Motor local: {"finiteautomata/beto-emotion-analysis": "/models/beto-emotion-onnx", ...}
+EMOTION_LOCAL_MODEL_PATHS = json.loads(os.getenv('EMOTION_LOCAL_MODEL_PATHS', '{}') or '{}')
+EMOTION_LOCAL_USE_ONNX = os.getenv('EMOTION_LOCAL_USE_ONNX', 'False') == 'True'
+EMOTION_LOCAL_BATCH_SIZE = int(os.getenv('EMOTION_LOCAL_BATCH_SIZE', '16'))
+
+# Cliente HTTP hacia la API de inferencia de Hugging Face (sesión keep-alive por worker)
+HF_INFERENCE_BASE_URL = os.getenv('HF_INFERENCE_BASE_URL', 'https://api-inference.huggingface.co')
+HF_HTTP_POOL_CONNECTIONS = int(os.getenv('HF_HTTP_POOL_CONNECTIONS', '2'))
+HF_HTTP_POOL_MAXSIZE = int(os.getenv('HF_HTTP_POOL_MAXSIZE', '10'))
+# Reintentos (errores de conexión y 502/503/504) dentro del timeout de cada llamada
+HF_HTTP_RETRIES = int(os.getenv('HF_HTTP_RETRIES', '2'))
+HF_HTTP_BACKOFF_FACTOR = float(os.getenv('HF_HTTP_BACKOFF_FACTOR', '1.5'))
+HF_HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv('HF_HTTP_CONNECT_TIMEOUT_SECONDS', '3.05'))
+# Precalentar conexiones / cargar modelos locales al arrancar cada worker (config/wsgi.py)
+HF_WARMUP_ON_BOOT = os.getenv('HF_WARMUP_ON_BOOT', 'True') == 'True'
+HF_HTTP_WARMUP_CONNECTIONS = int(os.getenv('HF_HTTP_WARMUP_CONNECTIONS', '3'))
+
+# Caché de resultados del análisis híbrido (LRU local + nivel compartido opcional en CACHES)
+EMOTION_CACHE_ENABLED = os.getenv('EMOTION_CACHE_ENABLED', 'True') == 'True'
+EMOTION_CACHE_MAX_ENTRIES = int(os.getenv('EMOTION_CACHE_MAX_ENTRIES', '2048'))
+EMOTION_CACHE_TTL_SECONDS = int(os.getenv('EMOTION_CACHE_TTL_SECONDS', str(24 * 60 * 60)))
+EMOTION_CACHE_SHARED = os.getenv('EMOTION_CACHE_SHARED', 'False') == 'True'
+EMOTION_CACHE_ALIAS = os.getenv('EMOTION_CACHE_ALIAS', 'default')
+
+# Traducción ES→EN para GoEmotions (LRU en memoria + tabla TranslationCacheEntry)
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', '4096'))
+TRANSLATION_CACHE_PERSIST = os.getenv('TRANSLATION_CACHE_PERSIST', 'True') == 'True'
+
+# Circuit breakers para Hugging Face y Gemini (estado por worker)
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv('CIRCUIT_BREAKER_FAILURE_RATE', '0.5'))
+CIRCUIT_BREAKER_SLOW_CALL_RATE = float(os.getenv('CIRCUIT_BREAKER_SLOW_CALL_RATE', '0.5'))
+CIRCUIT_BREAKER_WINDOW_SIZE = int(os.getenv('CIRCUIT_BREAKER_WINDOW_SIZE', '20'))
+CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv('CIRCUIT_BREAKER_MIN_CALLS', '5'))
+CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv('CIRCUIT_BREAKER_OPEN_SECONDS', '30'))
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = int(os.getenv('CIRCUIT_BREAKER_HALF_OPEN_CALLS', '1'))
+# Una llamada más lenta que esto cuenta como "lenta" para el umbral de latencia
+CIRCUIT_BREAKER_HF_SLOW_SECONDS = float(os.getenv('CIRCUIT_BREAKER_HF_SLOW_SECONDS', '8'))
+CIRCUIT_BREAKER_GEMINI_SLOW_SECONDS = float(os.getenv('CIRCUIT_BREAKER_GEMINI_SLOW_SECONDS', '30'))
+
+# Presupuesto de latencia por mensaje de chat (segundos; 0 = sin límite, por defecto).
+# Al agotarse se responde con los análisis terminados y el resto se completa en segundo plano.
+CHAT_LATENCY_BUDGET_SECONDS = float(os.getenv('CHAT_LATENCY_BUDGET_SECONDS', '0'))
+# Parte del presupuesto que puede consumir el análisis emocional antes de llamar a Gemini
+CHAT_ANALYSIS_BUDGET_SECONDS = float(os.getenv('CHAT_ANALYSIS_BUDGET_SECONDS', '8'))
+# Tiempo mínimo que se concede a Gemini aunque el presupuesto esté casi agotado
+CHAT_MIN_GEMINI_SECONDS = float(os.getenv('CHAT_MIN_GEMINI_SECONDS', '5'))
+
+# Chat asíncrono: la petición guarda el mensaje, encola el turno y responde 202 sin esperar a
+# Gemini; la respuesta, el análisis y los recursos de apoyo los procesa
+# `python manage.py process_analysis_jobs` y el cliente los consulta en messages/<id>/analysis/
+# (el endpoint de streaming sigue respondiendo en línea y solo encola el análisis)
+CHAT_ASYNC_ANALYSIS = os.getenv('CHAT_ASYNC_ANALYSIS', 'False') == 'True'
+# Cola persistente (tabla AnalysisJob)
+ANALYSIS_QUEUE_MAX_ATTEMPTS = int(os.getenv('ANALYSIS_QUEUE_MAX_ATTEMPTS', '3'))
+# Un trabajo tomado por un worker que no termina en este tiempo vuelve a estar disponible
+ANALYSIS_QUEUE_VISIBILITY_TIMEOUT_SECONDS = int(os.getenv('ANALYSIS_QUEUE_VISIBILITY_TIMEOUT_SECONDS', '120'))
+# Backoff base de los reintentos (se duplica en cada intento)
+ANALYSIS_QUEUE_RETRY_BACKOFF_SECONDS = float(os.getenv('ANALYSIS_QUEUE_RETRY_BACKOFF_SECONDS', '10'))
+ANALYSIS_QUEUE_POLL_SECONDS = float(os.getenv('ANALYSIS_QUEUE_POLL_SECONDS', '1'))
+
+# Modelo generativo falso local (desarrollo/pruebas de carga sin Gemini, ver chat/llm_fakes.py)
+GEMINI_FAKE = os.getenv('GEMINI_FAKE', 'False') == 'True'
+GEMINI_FAKE_FIRST_TOKEN_SECONDS = float(os.getenv('GEMINI_FAKE_FIRST_TOKEN_SECONDS', '0.3'))
+GEMINI_FAKE_TOKEN_SECONDS = float(os.getenv('GEMINI_FAKE_TOKEN_SECONDS', '0.05'))
+
+# Cliente de modelos generativos (chat/llm_client.py): 'gemini' o 'fake'
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'fake' if GEMINI_FAKE else 'gemini')
+# Timeout por defecto de cada llamada (las del chat usan lo que queda del presupuesto de latencia)
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '30'))
+# Modelo falso: variación de latencia (±fracción), llamadas lentas (x10) y fallas inyectadas
+LLM_FAKE_LATENCY_JITTER = float(os.getenv('LLM_FAKE_LATENCY_JITTER', '0'))
+LLM_FAKE_SLOW_RATE = float(os.getenv('LLM_FAKE_SLOW_RATE', '0'))
+LLM_FAKE_FAILURE_RATE = float(os.getenv('LLM_FAKE_FAILURE_RATE', '0'))
+LLM_FAKE_SEED = int(os.getenv('LLM_FAKE_SEED')) if os.getenv('LLM_FAKE_SEED') else None
+
+# Recursos de apoyo: se generan en paralelo a la respuesta del chat con su propio timeout
+SUPPORT_RESOURCES_TIMEOUT_SECONDS = float(os.getenv('SUPPORT_RESOURCES_TIMEOUT_SECONDS', '15'))
+SUPPORT_RESOURCES_MAX_WORKERS = int(os.getenv('SUPPORT_RESOURCES_MAX_WORKERS', '4'))
+
+# Contexto de cada conversación para el prompt (historial y estado emocional) en la caché
+CHAT_CONTEXT_CACHE_ALIAS = os.getenv('CHAT_CONTEXT_CACHE_ALIAS', 'default')
+CHAT_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv('CHAT_CONTEXT_CACHE_TTL_SECONDS', str(6 * 60 * 60)))
+
+# Presupuesto de tokens del prompt del chat (estimado por caracteres, ver chat.prompt_budget)
+CHAT_PROMPT_CHARS_PER_TOKEN = float(os.getenv('CHAT_PROMPT_CHARS_PER_TOKEN', '3.5'))
+CHAT_PROMPT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_PROMPT_HISTORY_TOKEN_BUDGET', '600'))
+CHAT_PROMPT_MAX_MESSAGE_TOKENS = int(os.getenv('CHAT_PROMPT_MAX_MESSAGE_TOKENS', '150'))
+CHAT_PROMPT_MAX_CURRENT_TOKENS = int(os.getenv('CHAT_PROMPT_MAX_CURRENT_TOKENS', '400'))
+
+# Resumen incremental de conversaciones largas (lo genera el worker de process_analysis_jobs)
+CHAT_SUMMARY_ENABLED = os.getenv('CHAT_SUMMARY_ENABLED', 'False') == 'True'
+CHAT_SUMMARY_EVERY_TURNS = int(os.getenv('CHAT_SUMMARY_EVERY_TURNS', '5'))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv('CHAT_SUMMARY_MAX_TOKENS', '200'))
+
+# Pool pregenerado de recursos de apoyo (python manage.py build_support_resource_pool)
+SUPPORT_RESOURCES_POOL_ENABLED = os.getenv('SUPPORT_RESOURCES_POOL_ENABLED', 'True') == 'True'
+SUPPORT_RESOURCES_POOL_VERSION = int(os.getenv('SUPPORT_RESOURCES_POOL_VERSION', '1'))
+SUPPORT_RESOURCES_POOL_REFRESH_SECONDS = int(os.getenv('SUPPORT_RESOURCES_POOL_REFRESH_SECONDS', '300'))
+# Reescribe solo supportive_message con el texto del estudiante (llamada corta a Gemini)
+SUPPORT_RESOURCES_PERSONALIZE = os.getenv('SUPPORT_RESOURCES_PERSONALIZE', 'False') == 'True'
+SUPPORT_RESOURCES_PERSONALIZE_TIMEOUT_SECONDS = float(os.getenv('SUPPORT_RESOURCES_PERSONALIZE_TIMEOUT_SECONDS', '4'))
+
+# Control de admisión de llamadas a Gemini, compartido por los workers del host (ver chat.llm_admission)
+LLM_ADMISSION_ENABLED = os.getenv('LLM_ADMISSION_ENABLED', 'True') == 'True'
+LLM_ADMISSION_LOCK_DIR = os.getenv('LLM_ADMISSION_LOCK_DIR', '/tmp/host-ai-llm-admission')
+LLM_MAX_CONCURRENT_CALLS = int(os.getenv('LLM_MAX_CONCURRENT_CALLS', '8'))
+LLM_PRIORITY_RESERVED_SLOTS = int(os.getenv('LLM_PRIORITY_RESERVED_SLOTS', '2'))
+LLM_ADMISSION_PER_USER_LIMIT = int(os.getenv('LLM_ADMISSION_PER_USER_LIMIT', '2'))
+LLM_ADMISSION_QUEUE_SIZE = int(os.getenv('LLM_ADMISSION_QUEUE_SIZE', '32'))
+LLM_ADMISSION_MAX_WAIT_SECONDS = float(os.getenv('LLM_ADMISSION_MAX_WAIT_SECONDS', '10'))
+
+# Idempotency-Key en POST /chat/ (respuesta guardada por usuario y clave, ver chat.idempotency)
+CHAT_IDEMPOTENCY_CACHE_ALIAS = os.getenv('CHAT_IDEMPOTENCY_CACHE_ALIAS', 'default')
+CHAT_IDEMPOTENCY_TTL_SECONDS = int(os.getenv('CHAT_IDEMPOTENCY_TTL_SECONDS', str(24 * 60 * 60)))
+# Vida de la marca "en curso". Por defecto cubre un turno: presupuesto de latencia (o el timeout
+# de Gemini si el presupuesto está desactivado) + espera de admisión + margen. Mientras el turno
+# corre se renueva cada tercio de este tiempo, así que solo importa si el proceso muere
+CHAT_IDEMPOTENCY_PENDING_TTL_SECONDS = int(os.getenv(
+    'CHAT_IDEMPOTENCY_PENDING_TTL_SECONDS',
+    str(int((CHAT_LATENCY_BUDGET_SECONDS or LLM_TIMEOUT_SECONDS) + LLM_ADMISSION_MAX_WAIT_SECONDS + 15)),
+))
+# Cuánto espera un reintento duplicado al intento en curso antes de responder 409
+CHAT_IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('CHAT_IDEMPOTENCY_WAIT_SECONDS', '30'))
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = os.getenv(
     'CORS_ALLOWED_ORIGINS', 
@@ -236,9 +391,16 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'access-control-allow-origin',
+    'idempotency-key',
+    'if-none-match',
+    'if-modified-since',
 ]
 
 CORS_EXPOSE_HEADERS = [
     'content-type',
     'authorization',
+    'retry-after',
+    'idempotent-replayed',
+    'etag',
+    'last-modified',
 ]
\ No newline at end of file
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Precalentar el backend de inferencia (conexiones HTTP o modelos locales) al arrancar el worker
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, 'HF_WARMUP_ON_BOOT', False):
+    from chat.views import emotion_analyzer  # noqa: E402
+    emotion_analyzer.warm_up(background=True)
@@ -15,6 +15,7 @@ done
 
 # Ejecutar migraciones
 python manage.py migrate
+python manage.py createcachetable
 
 echo "Migraciones completadas. Iniciando servidor..."
 
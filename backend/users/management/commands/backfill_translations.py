@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from chat.emotion_analyzer import EmotionAnalyzer
+from chat.models import Message
+
+
+class Command(BaseCommand):
+    help = "Precarga la caché de traducciones ES→EN (GoEmotions) con los mensajes existentes de estudiantes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=1000, help='Máximo de mensajes a procesar (más recientes primero)')
+        parser.add_argument('--batch-size', type=int, default=50, help='Textos por llamada al traductor')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        batch_size = max(1, options['batch_size'])
+
+        texts = list(
+            Message.objects.filter(sender='user')
+            .order_by('-timestamp')
+            .values_list('text', flat=True)[:limit]
+        )
+        texts = list(dict.fromkeys(text.strip() for text in texts if text and text.strip()))
+
+        translator = EmotionAnalyzer().translator
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            translator.translate_many(batch)
+            self.stdout.write(f"  • Lote {start // batch_size + 1}: {len(batch)} textos")
+
+        stats = translator.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Traducciones listas: {len(texts)} textos únicos "
+            f"(desde BD: {stats['db_hits']}, enviados al traductor: {stats['misses']}, lotes con error: {stats['errors']})"
+        ))
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.models import SupportResourceTemplate
+from chat.support_resources_generator import SupportResourcesGenerator
+
+# Emociones primarias posibles (pysentimiento + GoEmotions primarias), en español
+DEFAULT_EMOTIONS = ['tristeza', 'miedo', 'enojo', 'disgusto', 'sorpresa', 'neutral', 'alegría', 'gratitud', 'orgullo']
+DEFAULT_INTENSITIES = ['alta', 'media', 'baja']
+DEFAULT_SENTIMENTS = ['negativo', 'neutral', 'positivo']
+
+
+class Command(BaseCommand):
+    help = (
+        "Llena el pool de recursos de apoyo (SupportResourceTemplate) por emoción/intensidad/sentimiento: "
+        "la variante 0 con los recursos base y las siguientes generadas con Gemini."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pool-version',
+            type=int,
+            default=None,
+            help='Versión del pool a llenar (por defecto SUPPORT_RESOURCES_POOL_VERSION)'
+        )
+        parser.add_argument('--variants', type=int, default=2, help='Variantes generadas con Gemini por clave')
+        parser.add_argument('--seed-only', action='store_true', help='Solo los recursos base, sin llamar a Gemini')
+        parser.add_argument('--emotions', default=','.join(DEFAULT_EMOTIONS), help='Emociones separadas por coma')
+        parser.add_argument('--intensities', default=','.join(DEFAULT_INTENSITIES), help='Intensidades separadas por coma')
+        parser.add_argument('--sentiments', default=','.join(DEFAULT_SENTIMENTS), help='Sentimientos separados por coma')
+        parser.add_argument('--timeout', type=float, default=30, help='Timeout de cada llamada a Gemini en segundos')
+
+    def handle(self, *args, **options):
+        version = options['pool_version']
+        if version is None:
+            version = getattr(settings, 'SUPPORT_RESOURCES_POOL_VERSION', 1)
+        variants = 0 if options['seed_only'] else max(0, options['variants'])
+
+        keys = [
+            (emotion, intensity, sentiment)
+            for emotion in self._split(options['emotions'])
+            for intensity in self._split(options['intensities'])
+            for sentiment in self._split(options['sentiments'])
+        ]
+        if not keys:
+            raise CommandError('No hay claves para generar (revisa --emotions, --intensities y --sentiments)')
+
+        generator = SupportResourcesGenerator()
+        self.stdout.write(f"Pool v{version}: {len(keys)} claves, {variants} variantes de Gemini por clave")
+
+        stored = failed = 0
+        for emotion, intensity, sentiment in keys:
+            seed = generator._get_fallback_resources(emotion, intensity)
+            self._store(version, emotion, intensity, sentiment, 0, seed, SupportResourceTemplate.SOURCE_SEED)
+            stored += 1
+
+            for variant in range(1, variants + 1):
+                resources = generator.generate_support_resources(
+                    text=f"(Recurso general, sin un mensaje concreto) El estudiante expresa {emotion}.",
+                    emotion=emotion,
+                    intensity=intensity,
+                    sentiment=sentiment,
+                    timeout=options['timeout'],
+                    use_pool=False,
+                )
+                if resources.get('is_fallback'):
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"  • {emotion}/{intensity}/{sentiment} #{variant}: Gemini no respondió"))
+                    continue
+                self._store(version, emotion, intensity, sentiment, variant, resources, SupportResourceTemplate.SOURCE_GEMINI)
+                stored += 1
+
+        total = SupportResourceTemplate.objects.filter(version=version, is_active=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Pool v{version}: {stored} plantillas guardadas, {failed} fallidas ({total} activas en total)"
+        ))
+
+    @staticmethod
+    def _split(value):
+        return [item.strip().lower() for item in value.split(',') if item.strip()]
+
+    def _store(self, version, emotion, intensity, sentiment, variant, resources, source):
+        SupportResourceTemplate.objects.update_or_create(
+            emotion=emotion,
+            intensity=intensity,
+            sentiment=sentiment,
+            version=version,
+            variant=variant,
+            defaults={
+                'resources': SupportResourcesGenerator.template_resources(resources),
+                'source': source,
+                'is_active': True,
+            },
+        )
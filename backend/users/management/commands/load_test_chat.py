@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chat import llm_client
+from chat.latency_stats import LatencyRecorder
+
+DEFAULT_TEXTS = [
+    'Mañana tengo una prueba de matemáticas y estoy muy nervioso',
+    'Hoy me fue súper bien en la presentación, estoy feliz',
+    'Me peleé con mi mejor amiga y no sé qué hacer',
+    'Siento que nadie me escucha en mi casa',
+    'Estoy cansado de tantas tareas, no me da el tiempo',
+    'Me dio rabia que el profesor no me dejara explicar',
+    'No tengo ganas de ir al colegio mañana',
+    'Gracias por ayudarme la otra vez, me sirvió mucho',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga del chat: envía turnos concurrentes a ChatAPIView (o al endpoint de stream) "
+        "en proceso y reporta throughput, latencias y uso del modelo. Pensada para LLM_BACKEND=fake "
+        "(y EMOTION_INFERENCE_BACKEND=fake para no depender de la red)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Turnos a enviar en total')
+        parser.add_argument('--concurrency', type=int, default=20, help='Turnos en paralelo')
+        parser.add_argument('--users', type=int, default=10, help='Estudiantes de prueba (loadtest-N)')
+        parser.add_argument('--turns-per-conversation', type=int, default=5, help='Turnos antes de abrir otra conversación')
+        parser.add_argument('--stream', action='store_true', help='Usar el endpoint de stream (SSE)')
+        parser.add_argument('--allow-gemini', action='store_true', help='Permitir la prueba contra Gemini real')
+
+    def handle(self, *args, **options):
+        if llm_client.backend_name() != llm_client.BACKEND_FAKE and not options['allow_gemini']:
+            raise CommandError(
+                'LLM_BACKEND no es "fake": la prueba llamaría a Gemini. Usa LLM_BACKEND=fake o --allow-gemini.'
+            )
+        if options['requests'] < 1 or options['concurrency'] < 1 or options['users'] < 1:
+            raise CommandError('--requests, --concurrency y --users deben ser mayores que 0')
+
+        # Las vistas crean sus modelos al importarse: después de validar la configuración
+        from chat.views import ChatAPIView, ChatStreamAPIView
+
+        self.view = (ChatStreamAPIView if options['stream'] else ChatAPIView).as_view()
+        self.path = '/api/v1/chat/stream/' if options['stream'] else '/api/v1/chat/'
+        self.stream = options['stream']
+        self.turns_per_conversation = max(1, options['turns_per_conversation'])
+        self.factory = APIRequestFactory()
+        self.users = self._load_test_users(options['users'])
+        self.conversations = {}
+        self.lock = threading.Lock()
+        self.statuses = Counter()
+        self.latency = LatencyRecorder('load_test', window_size=options['requests'])
+
+        self.stdout.write(
+            f"Backend LLM: {llm_client.backend_name()} | inferencia: "
+            f"{getattr(settings, 'EMOTION_INFERENCE_BACKEND', 'huggingface_api')} | "
+            f"{options['requests']} turnos, concurrencia {options['concurrency']}, {len(self.users)} estudiantes"
+        )
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='load-test') as executor:
+            list(executor.map(self._send_turn, range(options['requests'])))
+        elapsed = time.monotonic() - started
+
+        self._report(options['requests'], elapsed)
+
+    def _load_test_users(self, count):
+        User = get_user_model()
+        users = []
+        for index in range(count):
+            user, created = User.objects.get_or_create(
+                username=f'loadtest-{index}',
+                defaults={'email': f'loadtest-{index}@loadtest.local', 'role': 'student'},
+            )
+            if created:
+                user.set_unusable_password()
+                user.save(update_fields=['password'])
+            users.append(user)
+        return users
+
+    def _send_turn(self, index):
+        user = self.users[index % len(self.users)]
+        with self.lock:
+            conversation_id, turns = self.conversations.get(user.id, (None, 0))
+            if turns >= self.turns_per_conversation:
+                conversation_id, turns = None, 0
+
+        payload = {'text': DEFAULT_TEXTS[index % len(DEFAULT_TEXTS)]}
+        if conversation_id:
+            payload['conversation_id'] = conversation_id
+
+        request = self.factory.post(self.path, payload, format='json')
+        force_authenticate(request, user=user)
+        started = time.monotonic()
+        try:
+            response = self.view(request)
+            if self.stream and response.status_code == 200:
+                body = b''.join(response.streaming_content).decode('utf-8')
+                conversation_id = self._conversation_from_stream(body) or conversation_id
+            elif response.status_code < 300:
+                conversation_id = response.data.get('conversation_id', conversation_id)
+            status_label = str(response.status_code)
+        except Exception as e:
+            status_label = f'error:{type(e).__name__}'
+        finally:
+            close_old_connections()
+        self.latency.record(time.monotonic() - started)
+
+        with self.lock:
+            self.statuses[status_label] += 1
+            self.conversations[user.id] = (conversation_id, turns + 1)
+
+    @staticmethod
+    def _conversation_from_stream(body):
+        for block in body.split('\n\n'):
+            if block.startswith('event: start'):
+                data = block.split('data: ', 1)[1]
+                return json.loads(data).get('conversation_id')
+        return None
+
+    def _report(self, total, elapsed):
+        latency = self.latency.snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} turnos en {elapsed:.1f}s ({total / elapsed:.1f} turnos/s)"
+        ))
+        self.stdout.write(f"Estados HTTP: {dict(self.statuses)}")
+        self.stdout.write(
+            f"Latencia: p50 {latency.get('p50_ms')} ms, p95 {latency.get('p95_ms')} ms, "
+            f"p99 {latency.get('p99_ms')} ms, máx {latency.get('max_ms')} ms"
+        )
+        self.stdout.write(f"Histograma (ms): {latency.get('histogram_ms')}")
+        self.stdout.write(f"Uso del modelo: {json.dumps(llm_client.usage_stats(), ensure_ascii=False)}")
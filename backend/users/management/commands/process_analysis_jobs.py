@@ -0,0 +1,76 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+import chat.job_handlers  # noqa: F401 - registra los manejadores de la cola
+from chat.job_queue import claim_jobs, default_worker_id, queue_stats, run_job
+
+
+class Command(BaseCommand):
+    help = "Worker de la cola persistente de análisis (AnalysisJob). Se pueden lanzar varios en paralelo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5, help='Trabajos tomados por consulta')
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Segundos de espera cuando la cola está vacía (por defecto ANALYSIS_QUEUE_POLL_SECONDS)'
+        )
+        parser.add_argument('--once', action='store_true', help='Drena la cola y termina')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Termina tras procesar N trabajos (0 = sin límite)')
+        parser.add_argument('--worker-id', default=None, help='Identificador del worker (por defecto host:pid)')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        poll_interval = options['poll_interval']
+        if poll_interval is None:
+            poll_interval = getattr(settings, 'ANALYSIS_QUEUE_POLL_SECONDS', 1.0)
+        worker_id = options['worker_id'] or default_worker_id()
+        max_jobs = options['max_jobs']
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        self.stdout.write(f"Worker {worker_id} escuchando la cola de análisis...")
+        processed = succeeded = 0
+        started = time.monotonic()
+
+        while not self._stopping:
+            close_old_connections()
+            jobs = claim_jobs(worker_id, batch_size=batch_size)
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            for job in jobs:
+                job_started = time.monotonic()
+                ok = run_job(job)
+                processed += 1
+                succeeded += int(ok)
+                status_label = 'ok' if ok else 'error'
+                self.stdout.write(
+                    f"  • {job.kind} #{job.pk} (intento {job.attempts}) {status_label} "
+                    f"en {time.monotonic() - job_started:.2f}s"
+                )
+                # Se termina el lote ya tomado para no dejar trabajos bloqueados hasta la visibilidad
+                if max_jobs and processed >= max_jobs:
+                    self._stopping = True
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed * 60 if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Worker {worker_id} detenido: {processed} trabajos ({succeeded} ok) en {elapsed:.1f}s "
+            f"({rate:.1f}/min). Cola: {queue_stats()}"
+        ))
+
+    def _request_stop(self, signum, frame):
+        # Termina el trabajo en curso antes de salir
+        self.stdout.write("Señal recibida, terminando tras el trabajo en curso...")
+        self._stopping = True
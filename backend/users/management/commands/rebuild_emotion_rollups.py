@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat import emotion_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el resumen diario de emociones (DailyEmotionRollup) desde los mensajes y corrige "
+        "las filas que no coinciden. Con --check solo informa las diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, nargs='+', help='Solo estos estudiantes (ids)')
+        parser.add_argument('--since', help='Solo desde esta fecha (YYYY-MM-DD)')
+        parser.add_argument('--check', action='store_true', help='No escribe: informa las filas a corregir')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError as exc:
+                raise CommandError('--since debe tener el formato YYYY-MM-DD') from exc
+
+        stats = emotion_rollups.rebuild(student_ids=options['student'], since=since, dry_run=options['check'])
+        changed = stats.get('created', 0) + stats.get('updated', 0) + stats.get('deleted', 0)
+
+        summary = (
+            f"creadas: {stats.get('created', 0)}, actualizadas: {stats.get('updated', 0)}, "
+            f"borradas: {stats.get('deleted', 0)}, sin cambios: {stats.get('unchanged', 0)}"
+        )
+        if options['check']:
+            if changed:
+                self.stdout.write(self.style.WARNING(f"Filas con diferencias ({summary})"))
+                raise CommandError('El resumen diario no coincide con los mensajes')
+            self.stdout.write(self.style.SUCCESS(f"El resumen diario coincide con los mensajes ({summary})"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Resumen diario reconstruido ({summary})"))
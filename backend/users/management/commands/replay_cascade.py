@@ -0,0 +1,137 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.emotion_analyzer import EmotionAnalyzer
+from chat.models import Message
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproduce la cascada pysentimiento → GoEmotions sobre mensajes ya analizados: "
+        "cuántas veces se omitiría GoEmotions y cuántas cambiaría el resultado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=2000, help='Máximo de mensajes a reproducir (más recientes primero)')
+        parser.add_argument(
+            '--min-confidence',
+            default=None,
+            help='Umbrales de confianza de pysentimiento a comparar, separados por coma (ej. 0.6,0.7,0.8,0.9)'
+        )
+        parser.add_argument(
+            '--min-negative-confidence',
+            type=float,
+            default=None,
+            help='Umbral de sentimiento negativo (por defecto EMOTION_CASCADE_MIN_NEGATIVE_CONFIDENCE)'
+        )
+
+    def handle(self, *args, **options):
+        thresholds = [None]
+        if options['min_confidence']:
+            try:
+                thresholds = [float(value) for value in options['min_confidence'].split(',') if value.strip()]
+            except ValueError:
+                raise CommandError('--min-confidence debe ser una lista de números separados por coma')
+
+        # Solo mensajes con análisis completo en los que GoEmotions sí respondió
+        messages = (
+            Message.objects.filter(sender='user', analysis_status=Message.ANALYSIS_COMPLETE)
+            .exclude(emotion_joy_score__isnull=True)
+            .exclude(secondary_emotions__isnull=True)
+            .exclude(secondary_emotions={})
+            .exclude(primary_emotion_source='heuristic')
+            .order_by('-timestamp')[:options['limit']]
+        )
+        samples = [self._rebuild(message) for message in messages]
+        if not samples:
+            self.stdout.write(self.style.WARNING("No hay mensajes analizados con GoEmotions para reproducir."))
+            return
+
+        self.stdout.write(f"Mensajes reproducidos: {len(samples)}")
+        for threshold in thresholds:
+            self._report(samples, threshold, options['min_negative_confidence'])
+
+    def _rebuild(self, message):
+        """Reconstruye las salidas de los modelos a partir de los campos guardados"""
+        emotions = {
+            'joy': message.emotion_joy_score or 0.0,
+            'sadness': message.emotion_sadness_score or 0.0,
+            'anger': message.emotion_anger_score or 0.0,
+            'fear': message.emotion_fear_score or 0.0,
+            'disgust': message.emotion_disgust_score or 0.0,
+            'surprise': message.emotion_surprise_score or 0.0,
+            'others': message.emotion_others_score or 0.0,
+        }
+        dominant = message.dominant_emotion or max(emotions, key=emotions.get)
+        sentiment_scores = {
+            'POS': message.sentiment_pos_score or 0.0,
+            'NEG': message.sentiment_neg_score or 0.0,
+            'NEU': message.sentiment_neu_score or 0.0,
+        }
+        goemotions_primary = {
+            label: score for label, score in (
+                ('gratitude', message.emotion_gratitude_score or 0.0),
+                ('pride', message.emotion_pride_score or 0.0),
+            ) if score
+        }
+        return {
+            'text': message.text,
+            'emotion': {
+                'dominant_emotion': dominant,
+                'emotions': emotions,
+                'confidence': emotions.get(dominant, 0.0),
+            },
+            'sentiment': {
+                'sentiment': message.sentiment or max(sentiment_scores, key=sentiment_scores.get),
+                'scores': sentiment_scores,
+                'confidence': max(sentiment_scores.values()),
+            },
+            'goemotions': {
+                'primary_emotions': goemotions_primary,
+                'dominant_primary': max(goemotions_primary.items(), key=lambda x: x[1]) if goemotions_primary else None,
+            },
+        }
+
+    def _outcome(self, sample, goemotions):
+        emotion, source = EmotionAnalyzer.select_primary_emotion(sample['emotion'], goemotions)
+        intensity = EmotionAnalyzer._calculate_hybrid_intensity(
+            sample['emotion']['confidence'],
+            sample['sentiment']['confidence'],
+            goemotions['dominant_primary'][1] if goemotions.get('dominant_primary') else 0
+        )
+        return emotion, intensity
+
+    def _report(self, samples, min_confidence, min_negative_confidence):
+        skipped = 0
+        primary_changed = 0
+        intensity_changed = 0
+        reasons = {}
+
+        for sample in samples:
+            run, reason = EmotionAnalyzer.should_run_goemotions(
+                sample['text'],
+                sample['emotion'],
+                sample['sentiment'],
+                min_confidence=min_confidence,
+                min_negative_confidence=min_negative_confidence,
+            )
+            reasons[reason] = reasons.get(reason, 0) + 1
+            if run:
+                continue
+
+            skipped += 1
+            full_emotion, full_intensity = self._outcome(sample, sample['goemotions'])
+            cascade_emotion, cascade_intensity = self._outcome(sample, {'dominant_primary': None})
+            primary_changed += int(full_emotion != cascade_emotion)
+            intensity_changed += int(full_intensity != cascade_intensity)
+
+        total = len(samples)
+        label = min_confidence if min_confidence is not None else 'configurado'
+        self.stdout.write(f"\nUmbral de confianza: {label}")
+        self.stdout.write(f"  • GoEmotions omitido: {skipped}/{total} ({skipped / total * 100:.1f}%)")
+        self.stdout.write(
+            f"  • Emoción primaria distinta: {primary_changed}/{total} ({primary_changed / total * 100:.1f}%)"
+        )
+        self.stdout.write(
+            f"  • Intensidad distinta: {intensity_changed}/{total} ({intensity_changed / total * 100:.1f}%)"
+        )
+        self.stdout.write(f"  • Motivos: {', '.join(f'{k}={v}' for k, v in sorted(reasons.items()))}")
@@ -5,6 +5,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 
 from users.models import CustomUser, Course
+from chat import emotion_rollups
 from chat.models import Conversation, Message
 
 
@@ -185,4 +186,6 @@ class Command(BaseCommand):
         }
         kwargs[emotion_field] = value
 
-        Message.objects.create(**kwargs)
+        message = Message.objects.create(**kwargs)
+        Conversation.register_messages(conversation.id, [message])
+        emotion_rollups.record_messages([message])